@@ -15,6 +15,7 @@ from app.core.security import (
 from app.schemas.schemas import TokenResponse, UserResponse
 from app.models.models import User
 from app.core.oauth_state import store_oauth_state, validate_oauth_state
+from app.services.club_stats import bump_member_club_stats
 
 router = APIRouter()
 security = HTTPBearer()
@@ -67,7 +68,7 @@ async def test_login(
     test_user: TestUserCreate,
     request: Request,
     x_test_secret: Optional[str] = Header(None, alias="X-Test-Secret"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """Create test user and return JWT (TESTING ONLY - Multi-layer protection)"""
     
@@ -110,7 +111,7 @@ async def test_login(
 
 
 @router.post("/auth/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db, scope="function")):
     """Register a new user"""
     # Check if email already exists
     result = await db.execute(select(User).where(User.email == user_data.email))
@@ -142,7 +143,7 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
 
 
 @router.post("/auth/login", response_model=TokenResponse)
-async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
+async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db, scope="function")):
     """Login and get access token"""
     # Find user by email
     result = await db.execute(select(User).where(User.email == credentials.email))
@@ -195,7 +196,7 @@ async def line_callback(
     code: str,
     state: str,
     request: Request,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """LINE OAuth callback - handle LINE login/signup"""
     # Validate OAuth state (one-time token)
@@ -238,6 +239,7 @@ async def line_callback(
         if picture_url and user.picture_url != picture_url:
             user.picture_url = picture_url
             await db.flush()
+            await bump_member_club_stats(db, user.id)
         
         # Existing user - generate tokens
         access_token = create_access_token(data={"sub": user.id, "email": user.email or ""})
@@ -280,7 +282,7 @@ async def line_callback(
 @router.post("/auth/refresh", response_model=TokenResponse)
 async def refresh_token(
     payload: RefreshRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """Refresh access token using refresh token"""
     refresh_token = payload.refresh_token
@@ -315,7 +317,7 @@ async def refresh_token(
 @router.get("/auth/me", response_model=UserResponse)
 async def get_current_user_info(
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """Get current user info"""
     result = await db.execute(select(User).where(User.id == user_id))
@@ -342,7 +344,7 @@ class ProfileUpdateRequest(BaseModel):
 async def update_profile(
     update_data: ProfileUpdateRequest,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """Update user profile (display name, email, etc.)"""
     result = await db.execute(select(User).where(User.id == user_id))
@@ -378,4 +380,5 @@ async def update_profile(
         user.phone = update_data.phone
     
     await db.flush()
+    await bump_member_club_stats(db, user_id)
     return user
@@ -3,7 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_
 from typing import List
 
-from app.core.database import get_db
+from app.core.database import after_commit, get_db
 from app.core.security import get_current_user_id
 from app.core.cache import cache_response, invalidate_cache
 from app.core.redis import cache_delete_pattern
@@ -11,6 +11,8 @@ from app.schemas.schemas import (
     ClubCreate, ClubUpdate, ClubResponse, ClubDetailResponse, ClubMemberResponse
 )
 from app.models.models import Club, ClubMember, Session, User, UserRole, SessionStatus
+from app.services.club_stats import bump_club_stats
+from app.services.leaderboard import update_leaderboard
 
 router = APIRouter()
 
@@ -19,7 +21,7 @@ router = APIRouter()
 async def create_club(
     club_data: ClubCreate,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """Create a new club"""
     import re
@@ -74,7 +76,7 @@ async def create_club(
 @router.get("/clubs", response_model=List[ClubResponse])
 async def list_clubs(
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """List clubs where user is a member"""
     result = await db.execute(
@@ -147,7 +149,7 @@ async def list_clubs(
 @router.get("/clubs/public", response_model=List[ClubResponse])
 async def list_public_clubs(
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """List all public clubs that user is not a member of"""
     # Get user's current club memberships
@@ -228,7 +230,7 @@ async def list_public_clubs(
 async def get_club(
     club_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """Get club details with members"""
     # Check if user is member
@@ -288,7 +290,7 @@ async def update_club(
     club_id: str,
     club_data: ClubUpdate,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """Update club (admin/organizer only)"""
     # Check permissions
@@ -319,6 +321,7 @@ async def update_club(
     update_data = club_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(club, field, value)
+    after_commit(db, bump_club_stats, club_id)
     
     return club
 
@@ -327,7 +330,7 @@ async def update_club(
 async def join_club(
     club_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """Join a club"""
     # Check if already member
@@ -376,6 +379,13 @@ async def join_club(
         role=UserRole.MEMBER
     )
     db.add(new_member)
+    after_commit(
+        db,
+        update_leaderboard,
+        club_id,
+        {user_id: (new_member.rating_in_club, new_member.wins_in_club, new_member.matches_in_club)},
+    )
+    after_commit(db, bump_club_stats, club_id)
     
     return {"message": "Successfully joined club"}
 
@@ -385,7 +395,7 @@ async def invite_member(
     club_id: str,
     invitee_email: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """Invite user to club by email (admin/organizer only)"""
     # Check permissions
@@ -432,5 +442,12 @@ async def invite_member(
         role=UserRole.MEMBER
     )
     db.add(new_member)
+    after_commit(
+        db,
+        update_leaderboard,
+        club_id,
+        {invitee.id: (new_member.rating_in_club, new_member.wins_in_club, new_member.matches_in_club)},
+    )
+    after_commit(db, bump_club_stats, club_id)
     
     return {"message": f"Successfully invited {invitee.full_name}"}
@@ -1,30 +1,93 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func, or_, select
+import base64
+import json
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Dict, List, Optional, Tuple, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import or_, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import after_commit, get_db
 from app.core.security import get_current_user_id
 from app.models.models import (
     ClubMember,
+    Court,
+    CourtStatus,
     Match,
+    MatchPlayer,
     MatchStatus,
+    PreMatch,
     RegistrationStatus,
     Session,
     SessionRegistration,
     User,
     UserRole,
 )
-from app.schemas.schemas import MatchCreate, MatchResponse, MatchUpdateScore, MatchUpdateStatus, PlayerSummary
-from app.services.matchmaking import CandidatePlayer, MatchmakingError, generate_fair_doubles_match
+from app.schemas.schemas import (
+    CourtResponse,
+    CourtUpdate,
+    MatchBulkRequest,
+    MatchCreate,
+    MatchLiveScore,
+    MatchPointCreate,
+    MatchPreviewCandidate,
+    MatchPreviewResponse,
+    MatchResponse,
+    MatchUpdateScore,
+    MatchUpdateStatus,
+    PlayerSummary,
+    PreMatchResponse,
+    SessionLiveResponse,
+    SetScore,
+)
+from app.services.club_stats import bump_club_stats
+from app.services.court_allocator import claim_courts, occupy, open_court, release_courts, sync_courts
+from app.services.leaderboard import update_leaderboard
+from app.services.live_state import (
+    drop_live_matches,
+    load_live_session,
+    mark_live_session_ready,
+    put_live_matches,
+    read_live_matches,
+    set_live_fields,
+)
+from app.services.match_preview import bump_session_state, cache_preview, get_cached_preview, session_state_version
+from app.services.match_players import add_match_players, mark_match_players_completed
+from app.services.match_results import apply_match_results, complete_matches, record_monthly_stats
+from app.services.matchmaking import CandidatePlayer, MatchmakingError, generate_fair_doubles_round
+from app.services.matchmaking_executor import matchmaking_executor
+from app.services.matchmaking_optimizer import (
+    FALLBACK_TOP_N,
+    MATCH_TYPE_DOUBLE,
+    MATCH_TYPE_SINGLE,
+    MatchConstraints,
+    best_match,
+    greedy_match,
+    optimize_match,
+)
+from app.services.pair_stats import record_pair_stats
+from app.services.play_state import PlayState, load_session_candidates, record_match_created, record_match_played
+from app.services.prematch_planner import (
+    LOOKAHEAD_ROUNDS,
+    activate_next,
+    list_queue,
+    refresh_queue,
+    refresh_queue_after_commit,
+)
+from app.services.score_events import discard_point_stream, finalize_points, live_score, load_events, record_point
+from app.services.scoring import POINT, LiveScore, ScoringError
 from app.websocket.socket_manager import socket_manager
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 200
+# Delta-sync tokens lag behind the read by this much so late commits are not missed.
+SYNC_OVERLAP_SECONDS = 5
+
 
 def _can_manage(role: UserRole) -> bool:
     return role in [UserRole.ADMIN, UserRole.ORGANIZER]
@@ -47,7 +110,12 @@ async def _check_member_or_403(db: AsyncSession, club_id: str, user_id: str) ->
 
 
 async def _players_map(db: AsyncSession, user_ids: List[str]) -> Dict[str, User]:
-    rows = (await db.execute(select(User).where(User.id.in_(user_ids)))).scalars().all()
+    # Ratings may have just been rewritten in SQL, so never serve stale identity-map rows.
+    rows = (
+        await db.execute(
+            select(User).where(User.id.in_(user_ids)).execution_options(populate_existing=True)
+        )
+    ).scalars().all()
     return {u.id: u for u in rows}
 
 
@@ -61,18 +129,15 @@ def _to_player_summary(u: User) -> PlayerSummary:
     )
 
 
-async def _serialize_match(db: AsyncSession, match: Match) -> MatchResponse:
-    user_ids = [
-        match.team_a_player_1_id,
-        match.team_b_player_1_id,
+def _player_ids(row: Union[Match, PreMatch]) -> List[str]:
+    return [
+        uid
+        for uid in (row.team_a_player_1_id, row.team_a_player_2_id, row.team_b_player_1_id, row.team_b_player_2_id)
+        if uid
     ]
-    if match.team_a_player_2_id:
-        user_ids.append(match.team_a_player_2_id)
-    if match.team_b_player_2_id:
-        user_ids.append(match.team_b_player_2_id)
 
-    users = await _players_map(db, list(set(user_ids)))
 
+def _to_match_response(match: Match, users: Dict[str, User]) -> MatchResponse:
     if match.team_a_player_1_id not in users or match.team_b_player_1_id not in users:
         raise HTTPException(status_code=500, detail="Match has invalid player references")
 
@@ -85,89 +150,125 @@ async def _serialize_match(db: AsyncSession, match: Match) -> MatchResponse:
         team_b_player_1=_to_player_summary(users[match.team_b_player_1_id]),
         team_b_player_2=_to_player_summary(users[match.team_b_player_2_id]) if match.team_b_player_2_id else None,
         score=match.score,
+        set_scores=match.set_scores,
         winner_team=match.winner_team,
         status=match.status,
         started_at=match.started_at,
         completed_at=match.completed_at,
         created_at=match.created_at,
+        updated_at=match.updated_at,
     )
 
 
-async def _get_partner_history(db: AsyncSession, session_id: str) -> Dict[Tuple[str, str], int]:
-    matches = (await db.execute(select(Match).where(Match.session_id == session_id))).scalars().all()
-    history: Dict[Tuple[str, str], int] = {}
+async def _serialize_matches(db: AsyncSession, matches: List[Match]) -> List[MatchResponse]:
+    """Serialize matches with a single query for all of their players."""
+    if not matches:
+        return []
+    users = await _players_map(db, list({uid for m in matches for uid in _player_ids(m)}))
+    return [_to_match_response(m, users) for m in matches]
 
-    for m in matches:
-        if m.team_a_player_2_id:
-            key = tuple(sorted((m.team_a_player_1_id, m.team_a_player_2_id)))
-            history[key] = history.get(key, 0) + 1
-        if m.team_b_player_2_id:
-            key = tuple(sorted((m.team_b_player_1_id, m.team_b_player_2_id)))
-            history[key] = history.get(key, 0) + 1
 
-    return history
-
-
-async def _build_auto_match(db: AsyncSession, session_id: str) -> MatchCreate:
-    regs = (
-        await db.execute(
-            select(SessionRegistration, User)
-            .join(User, User.id == SessionRegistration.user_id)
-            .where(
-                SessionRegistration.session_id == session_id,
-                SessionRegistration.status.in_([RegistrationStatus.CONFIRMED, RegistrationStatus.ATTENDED]),
+async def _serialize_match(db: AsyncSession, match: Match) -> MatchResponse:
+    return (await _serialize_matches(db, [match]))[0]
+
+
+async def _busy_players(db: AsyncSession, session_id: str) -> set:
+    return set(
+        (
+            await db.execute(
+                select(MatchPlayer.user_id)
+                .join(Match, Match.id == MatchPlayer.match_id)
+                .where(
+                    MatchPlayer.session_id == session_id,
+                    MatchPlayer.completed_at.is_(None),
+                    Match.status.in_([MatchStatus.SCHEDULED, MatchStatus.ONGOING]),
+                )
             )
-        )
-    ).all()
+        ).scalars()
+    )
 
-    if len(regs) < 4:
-        raise HTTPException(status_code=400, detail="Need at least 4 registered players for auto matchmaking")
 
-    matches = (await db.execute(select(Match).where(Match.session_id == session_id))).scalars().all()
-    player_match_count: Dict[str, int] = {}
-    player_last_played_at: Dict[str, datetime] = {}
-
-    for m in matches:
-        participants = [m.team_a_player_1_id, m.team_b_player_1_id]
-        if m.team_a_player_2_id:
-            participants.append(m.team_a_player_2_id)
-        if m.team_b_player_2_id:
-            participants.append(m.team_b_player_2_id)
-        for uid in participants:
-            player_match_count[uid] = player_match_count.get(uid, 0) + 1
-            last_time = m.completed_at or m.started_at or m.created_at
-            if uid not in player_last_played_at or (last_time and last_time > player_last_played_at[uid]):
-                player_last_played_at[uid] = last_time
-
-    candidates = [
-        CandidatePlayer(
-            user_id=user.id,
-            rating=user.rating,
-            matches_played=player_match_count.get(user.id, 0),
-            last_played_at=player_last_played_at.get(user.id),
+async def _serialize_prematches(db: AsyncSession, queue: List[PreMatch]) -> List[PreMatchResponse]:
+    users = await _players_map(db, list({uid for pre in queue for uid in _player_ids(pre)}))
+    return [
+        PreMatchResponse(
+            id=pre.id,
+            session_id=pre.session_id,
+            match_order=pre.match_order,
+            team_a_player_1=_to_player_summary(users[pre.team_a_player_1_id]),
+            team_a_player_2=_to_player_summary(users[pre.team_a_player_2_id]) if pre.team_a_player_2_id else None,
+            team_b_player_1=_to_player_summary(users[pre.team_b_player_1_id]),
+            team_b_player_2=_to_player_summary(users[pre.team_b_player_2_id]) if pre.team_b_player_2_id else None,
+            status=pre.status,
+            created_at=pre.created_at,
         )
-        for _, user in regs
+        for pre in queue
     ]
 
-    partner_history = await _get_partner_history(db, session_id)
 
-    try:
-        result = generate_fair_doubles_match(candidates, partner_history=partner_history)
-    except MatchmakingError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+async def _load_candidates(db: AsyncSession, session_id: str) -> Tuple[List[CandidatePlayer], PlayState]:
+    candidates, state = await load_session_candidates(db, session_id)
+    if len(candidates) < 4:
+        raise HTTPException(status_code=400, detail="Need at least 4 registered players for auto matchmaking")
+    return candidates, state
+
+
+def _match_constraints(payload: Optional[MatchCreate]) -> MatchConstraints:
+    if payload is None:
+        return MatchConstraints()
+    rules = payload.constraints
+    return MatchConstraints(
+        match_type=payload.match_type or MATCH_TYPE_DOUBLE,
+        locked_partners=list(rules.locked_partners) if rules else [],
+        avoid_pairs=list(rules.avoid_pairs) if rules else [],
+        rating_min=rules.rating_min if rules else None,
+        rating_max=rules.rating_max if rules else None,
+        max_rating_spread=rules.max_rating_spread if rules else None,
+    )
+
 
-    team_a = result["team_a"]
-    team_b = result["team_b"]
+async def _build_auto_match(
+    db: AsyncSession, session_id: str, payload: Optional[MatchCreate] = None
+) -> Tuple[MatchCreate, bool]:
+    """The next auto match, and whether it was taken from the pre-match queue."""
+    constraints = _match_constraints(payload)
+    unconstrained = constraints == MatchConstraints()
+
+    # A planned pre-match makes court turnover a dequeue instead of a search.
+    pre = None
+    if unconstrained:
+        pre = await activate_next(db, session_id, busy_players=await _busy_players(db, session_id))
+    if pre:
+        team_a = (pre.team_a_player_1_id, pre.team_a_player_2_id)
+        team_b = (pre.team_b_player_1_id, pre.team_b_player_2_id)
+    else:
+        candidates, state = await _load_candidates(db, session_id)
+
+        try:
+            result = await matchmaking_executor.run(
+                "match",
+                best_match,
+                greedy_match,
+                len(candidates),
+                candidates,
+                constraints,
+                history=state.pair_history(c.user_id for c in candidates),
+            )
+        except MatchmakingError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-    max_court = (await db.execute(select(func.max(Match.court_number)).where(Match.session_id == session_id))).scalar() or 0
+        team_a = result["team_a"]
+        team_b = result["team_b"]
 
-    return MatchCreate(
-        court_number=max_court + 1,
+    match = MatchCreate(
+        court_number=payload.court_number if payload else None,
+        match_type=constraints.match_type,
         team_a_player_1_id=team_a[0],
-        team_a_player_2_id=team_a[1],
+        team_a_player_2_id=team_a[1] if len(team_a) > 1 else None,
         team_b_player_1_id=team_b[0],
-        team_b_player_2_id=team_b[1],
+        team_b_player_2_id=team_b[1] if len(team_b) > 1 else None,
     )
+    return match, pre is not None
 
 
 @router.post("/sessions/{session_id}/matches", response_model=MatchResponse, status_code=status.HTTP_201_CREATED)
@@ -175,16 +276,25 @@ async def create_match(
     session_id: str,
     payload: Optional[MatchCreate] = None,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     session = await _get_session_or_404(db, session_id)
     membership = await _check_member_or_403(db, session.club_id, user_id)
     if not _can_manage(membership.role):
         raise HTTPException(status_code=403, detail="Only admin/organizer can create matches")
 
+    requested_court = payload.court_number if payload else None
+    courts = await claim_courts(db, session, 1, court_number=requested_court, auto_matching=requested_court is None)
+    if not courts and session.number_of_courts is None:
+        courts = await open_court(db, session, requested_court)
+    if not courts:
+        detail = f"Court {requested_court} is not free" if requested_court else "No free court in this session"
+        raise HTTPException(status_code=400, detail=detail)
+
     # Auto-matchmaking when no payload or empty payload (no player_ids specified)
+    from_queue = False
     if payload is None or (payload.team_a_player_1_id is None and payload.team_b_player_1_id is None):
-        payload = await _build_auto_match(db, session_id)
+        payload, from_queue = await _build_auto_match(db, session_id, payload)
 
     players = [
         payload.team_a_player_1_id,
@@ -213,7 +323,8 @@ async def create_match(
 
     match = Match(
         session_id=session_id,
-        court_number=payload.court_number,
+        court_number=courts[0].court_number,
+        match_type=payload.match_type or (MATCH_TYPE_DOUBLE if payload.team_a_player_2_id else MATCH_TYPE_SINGLE),
         team_a_player_1_id=payload.team_a_player_1_id,
         team_a_player_2_id=payload.team_a_player_2_id,
         team_b_player_1_id=payload.team_b_player_1_id,
@@ -222,31 +333,412 @@ async def create_match(
     )
     db.add(match)
     await db.flush()
+    occupy(courts, [match])
+    await add_match_players(db, session.club_id, [match])
+    after_commit(db, record_match_created, match)
+    if from_queue:
+        # Entries behind the activated one may hold its players; re-plan
+        # them once the play state counts the new match.
+        after_commit(db, refresh_queue_after_commit, session_id)
+    after_commit(db, bump_session_state, session_id)
+    after_commit(db, bump_club_stats, session.club_id)
+
+    response = await _serialize_match(db, match)
+    after_commit(db, put_live_matches, [response])
+    return response
+
+
+@router.post(
+    "/sessions/{session_id}/matches/auto-fill",
+    response_model=List[MatchResponse],
+    status_code=status.HTTP_201_CREATED,
+)
+async def auto_fill_courts(
+    session_id: str,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """Create one auto-matched game for every idle court in a single pass.
 
-    return await _serialize_match(db, match)
+    Sessions without a court count open a court for every foursome of idle
+    players that their idle courts cannot seat.
+    """
+    session = await _get_session_or_404(db, session_id)
+    membership = await _check_member_or_403(db, session.club_id, user_id)
+    if not _can_manage(membership.role):
+        raise HTTPException(status_code=403, detail="Only admin/organizer can create matches")
+
+    free_courts = await claim_courts(db, session, session.number_of_courts, auto_matching=True)
+    busy_players = await _busy_players(db, session_id)
+
+    candidates, state = await _load_candidates(db, session_id)
+    candidates = [c for c in candidates if c.user_id not in busy_players]
+
+    if session.number_of_courts is None:
+        for _ in range(len(candidates) // 4 - len(free_courts)):
+            opened = await open_court(db, session)
+            if not opened:
+                break
+            free_courts.extend(opened)
+    if not free_courts:
+        raise HTTPException(status_code=400, detail="No idle courts to fill")
+
+    try:
+        round_matches = await matchmaking_executor.run(
+            "round",
+            generate_fair_doubles_round,
+            partial(generate_fair_doubles_round, max_passes=0),
+            len(candidates),
+            candidates,
+            court_count=len(free_courts),
+            history=state.pair_history(c.user_id for c in candidates),
+        )
+    except MatchmakingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    created: List[Match] = []
+    for court, result in zip(free_courts, round_matches):
+        team_a = result["team_a"]
+        team_b = result["team_b"]
+        match = Match(
+            session_id=session_id,
+            court_number=court.court_number,
+            team_a_player_1_id=team_a[0],
+            team_a_player_2_id=team_a[1],
+            team_b_player_1_id=team_b[0],
+            team_b_player_2_id=team_b[1],
+            match_type=MATCH_TYPE_DOUBLE,
+            status=MatchStatus.SCHEDULED,
+        )
+        db.add(match)
+        created.append(match)
+
+    await db.flush()
+    occupy(free_courts, created)
+    await add_match_players(db, session.club_id, created)
+    for match in created:
+        after_commit(db, record_match_created, match)
+    after_commit(db, bump_session_state, session_id)
+    after_commit(db, bump_club_stats, session.club_id)
+
+    responses = await _serialize_matches(db, created)
+    after_commit(db, put_live_matches, responses)
+    return responses
+
+
+async def _court_board(db: AsyncSession, courts: List[Court]) -> List[CourtResponse]:
+    match_ids = [c.current_match_id for c in courts if c.current_match_id]
+    matches = (await db.execute(select(Match).where(Match.id.in_(match_ids)))).scalars().all() if match_ids else []
+    serialized = {m.id: r for m, r in zip(matches, await _serialize_matches(db, list(matches)))}
+    return [
+        CourtResponse(
+            court_number=c.court_number,
+            status=c.status,
+            auto_matching_enabled=c.auto_matching_enabled,
+            closed_at=c.closed_at,
+            current_match=serialized.get(c.current_match_id),
+        )
+        for c in courts
+    ]
+
+
+@router.get("/sessions/{session_id}/courts", response_model=List[CourtResponse])
+async def get_court_board(
+    session_id: str,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """Every court of a session with the match currently on it."""
+    session = await _get_session_or_404(db, session_id)
+    await _check_member_or_403(db, session.club_id, user_id)
+
+    courts = (
+        await db.execute(select(Court).where(Court.session_id == session_id).order_by(Court.court_number))
+    ).scalars().all()
+    if not courts:
+        courts = await sync_courts(db, session)
+    return await _court_board(db, list(courts))
+
+
+@router.patch("/sessions/{session_id}/courts/{court_number}", response_model=CourtResponse)
+async def update_court(
+    session_id: str,
+    court_number: int,
+    payload: CourtUpdate,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """Open or close a court, or keep automatic matches off it."""
+    session = await _get_session_or_404(db, session_id)
+    membership = await _check_member_or_403(db, session.club_id, user_id)
+    if not _can_manage(membership.role):
+        raise HTTPException(status_code=403, detail="Only admin/organizer can update courts")
+
+    court = (
+        await db.execute(
+            select(Court)
+            .where(Court.session_id == session_id, Court.court_number == court_number)
+            .with_for_update()
+        )
+    ).scalar_one_or_none()
+    if not court and session.number_of_courts and court_number <= session.number_of_courts:
+        court = next(c for c in await sync_courts(db, session) if c.court_number == court_number)
+    if not court:
+        raise HTTPException(status_code=404, detail="Court not found")
+
+    if payload.auto_matching_enabled is not None:
+        court.auto_matching_enabled = payload.auto_matching_enabled
+    if payload.closed is True and not court.closed_at:
+        court.closed_at = datetime.utcnow()
+        if court.status == CourtStatus.AVAILABLE:
+            court.status = CourtStatus.CLOSED
+    elif payload.closed is False and court.closed_at:
+        if session.number_of_courts and court_number > session.number_of_courts:
+            raise HTTPException(status_code=400, detail="Raise the session's number of courts to reopen this court")
+        court.closed_at = None
+        court.status = CourtStatus.OCCUPIED if court.current_match_id else CourtStatus.AVAILABLE
+
+    await db.flush()
+    return (await _court_board(db, [court]))[0]
+
+
+@router.get("/sessions/{session_id}/queue", response_model=List[PreMatchResponse])
+async def get_match_queue(
+    session_id: str,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    session = await _get_session_or_404(db, session_id)
+    await _check_member_or_403(db, session.club_id, user_id)
+
+    return await _serialize_prematches(db, await list_queue(db, session_id))
+
+
+@router.post("/sessions/{session_id}/queue", response_model=List[PreMatchResponse])
+async def plan_match_queue(
+    session_id: str,
+    rounds: int = Query(default=LOOKAHEAD_ROUNDS, ge=1, le=10),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """(Re)plan the next rounds of matches into the session's pre-match queue."""
+    session = await _get_session_or_404(db, session_id)
+    membership = await _check_member_or_403(db, session.club_id, user_id)
+    if not _can_manage(membership.role):
+        raise HTTPException(status_code=403, detail="Only admin/organizer can plan matches")
+
+    queue = await refresh_queue(db, session_id, rounds=rounds)
+    return await _serialize_prematches(db, queue)
+
+
+@router.get("/sessions/{session_id}/matches/preview", response_model=MatchPreviewResponse)
+async def preview_matches(
+    session_id: str,
+    top_k: int = Query(default=3, ge=1, le=10),
+    match_type: str = Query(default=MATCH_TYPE_DOUBLE, pattern=r'^(single|double)$'),
+    rating_min: Optional[float] = None,
+    rating_max: Optional[float] = None,
+    max_rating_spread: Optional[float] = Query(default=None, gt=0),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """Suggest the best next matchups without creating a match.
+
+    Results are cached per session state version, so repeated previews
+    are served from Redis until a registration or match changes.
+    """
+    session = await _get_session_or_404(db, session_id)
+    membership = await _check_member_or_403(db, session.club_id, user_id)
+    if not _can_manage(membership.role):
+        raise HTTPException(status_code=403, detail="Only admin/organizer can preview matches")
+
+    constraints = MatchConstraints(
+        match_type=match_type,
+        rating_min=rating_min,
+        rating_max=rating_max,
+        max_rating_spread=max_rating_spread,
+    )
+    params = {"top_k": top_k, **asdict(constraints)}
+    version = await session_state_version(session_id)
+    cached = await get_cached_preview(session_id, version, params)
+    if cached:
+        return MatchPreviewResponse.model_validate_json(cached).model_copy(update={"cached": True})
+
+    candidates, state = await _load_candidates(db, session_id)
+    try:
+        results = await matchmaking_executor.run(
+            "preview",
+            optimize_match,
+            partial(optimize_match, top_n=FALLBACK_TOP_N),
+            len(candidates),
+            candidates,
+            constraints,
+            history=state.pair_history(c.user_id for c in candidates),
+            top_k=top_k,
+        )
+    except MatchmakingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    users = await _players_map(db, list({uid for r in results for uid in (*r["team_a"], *r["team_b"])}))
+    response = MatchPreviewResponse(
+        session_id=session_id,
+        state_version=version,
+        candidates=[
+            MatchPreviewCandidate(
+                team_a=[_to_player_summary(users[uid]) for uid in r["team_a"]],
+                team_b=[_to_player_summary(users[uid]) for uid in r["team_b"]],
+                balance_gap=r["balance_gap"],
+                score=r["score"],
+                cost=r["cost"],
+            )
+            for r in results
+        ],
+    )
+    await cache_preview(session_id, version, params, response.model_dump_json())
+    return response
+
+
+def _encode_cursor(at: datetime, match_id: str) -> str:
+    raw = json.dumps([at.isoformat(), match_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        at, match_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(at), str(match_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.get("/sessions/{session_id}/matches", response_model=List[MatchResponse])
 async def list_matches(
     session_id: str,
+    response: Response,
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    updated_since: Optional[datetime] = None,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
+    """List a session's matches, newest first.
+
+    With ``limit`` the list is paged; pass the ``X-Next-Cursor`` header
+    back as ``cursor`` for the next page. With ``updated_since`` only
+    matches changed after that time are returned, oldest change first,
+    and ``X-Sync-Token`` holds the value to send on the next poll.
+    """
     session = await _get_session_or_404(db, session_id)
     await _check_member_or_403(db, session.club_id, user_id)
 
-    matches = (
-        await db.execute(select(Match).where(Match.session_id == session_id).order_by(Match.created_at.desc()))
-    ).scalars().all()
+    if updated_since is not None:
+        # Hand back a slightly earlier token so rows committed just after
+        # this read with an older timestamp are picked up next time.
+        sync_token = datetime.utcnow() - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+        if updated_since.tzinfo is not None:
+            updated_since = updated_since.astimezone(timezone.utc).replace(tzinfo=None)
+        matches = (
+            await db.execute(
+                select(Match)
+                .where(Match.session_id == session_id, Match.updated_at > updated_since)
+                .order_by(Match.updated_at.asc(), Match.id.asc())
+            )
+        ).scalars().all()
+        response.headers["X-Sync-Token"] = max(sync_token, updated_since).isoformat()
+        return await _serialize_matches(db, matches)
+
+    query = select(Match).where(Match.session_id == session_id)
+    if cursor:
+        created_at, match_id = _decode_cursor(cursor)
+        query = query.where(tuple_(Match.created_at, Match.id) < tuple_(created_at, match_id))
+    query = query.order_by(Match.created_at.desc(), Match.id.desc())
+    if limit:
+        query = query.limit(limit + 1)
+
+    matches = (await db.execute(query)).scalars().all()
+    if limit and len(matches) > limit:
+        matches = matches[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(matches[-1].created_at, matches[-1].id)
+    response.headers["X-Sync-Token"] = (datetime.utcnow() - timedelta(seconds=SYNC_OVERLAP_SECONDS)).isoformat()
+
+    return await _serialize_matches(db, matches)
+
+
+@router.get("/users/{user_id}/matches", response_model=List[MatchResponse])
+async def list_user_matches(
+    user_id: str,
+    response: Response,
+    club_id: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """A player's completed matches, most recent first.
+
+    ``club_id`` keeps to one club; another player's history only covers
+    the clubs the caller is in. Pass the ``X-Next-Cursor`` header back as
+    ``cursor`` for the next page.
+    """
+    query = select(MatchPlayer.match_id, MatchPlayer.completed_at).where(
+        MatchPlayer.user_id == user_id, MatchPlayer.completed_at.is_not(None)
+    )
+    if club_id:
+        await _check_member_or_403(db, club_id, current_user_id)
+        query = query.where(MatchPlayer.club_id == club_id)
+    elif user_id != current_user_id:
+        query = query.where(
+            MatchPlayer.club_id.in_(select(ClubMember.club_id).where(ClubMember.user_id == current_user_id))
+        )
+    if cursor:
+        completed_at, match_id = _decode_cursor(cursor)
+        query = query.where(tuple_(MatchPlayer.completed_at, MatchPlayer.match_id) < tuple_(completed_at, match_id))
+    query = query.order_by(MatchPlayer.completed_at.desc(), MatchPlayer.match_id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].completed_at, rows[-1].match_id)
+    if not rows:
+        return []
+    matches = {
+        m.id: m for m in (await db.execute(select(Match).where(Match.id.in_([r.match_id for r in rows])))).scalars()
+    }
+    return await _serialize_matches(db, [matches[r.match_id] for r in rows])
+
+
+@router.get("/sessions/{session_id}/live", response_model=SessionLiveResponse)
+async def get_live_matches(
+    session_id: str,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """Scheduled and ongoing matches of a session, served from the live state in Redis."""
+    session = await _get_session_or_404(db, session_id)
+    await _check_member_or_403(db, session.club_id, user_id)
 
-    return [await _serialize_match(db, m) for m in matches]
+    matches = await load_live_session(session_id)
+    if matches is None:
+        active = (
+            await db.execute(
+                select(Match)
+                .where(
+                    Match.session_id == session_id,
+                    Match.status.in_([MatchStatus.SCHEDULED, MatchStatus.ONGOING]),
+                )
+                .order_by(Match.court_number, Match.created_at)
+            )
+        ).scalars().all()
+        matches = await _serialize_matches(db, list(active))
+        await mark_live_session_ready(session_id, matches)
+    return SessionLiveResponse(session_id=session_id, matches=matches)
 
 
 @router.get("/matches/{match_id}", response_model=MatchResponse)
 async def get_match(
     match_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     match = (await db.execute(select(Match).where(Match.id == match_id))).scalar_one_or_none()
     if not match:
@@ -263,17 +755,26 @@ async def update_score(
     match_id: str,
     payload: MatchUpdateScore,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
-    match = (await db.execute(select(Match).where(Match.id == match_id))).scalar_one_or_none()
-    if not match:
-        raise HTTPException(status_code=404, detail="Match not found")
-
-    session = await _get_session_or_404(db, match.session_id)
-    membership = await _check_member_or_403(db, session.club_id, user_id)
-    if not _can_manage(membership.role):
+    access = await _match_access(db, match_id, user_id)
+    if not _can_manage(access.role):
         raise HTTPException(status_code=403, detail="Only admin/organizer can update score")
 
+    # Live matches are scored in Redis; the live-state flusher writes them back.
+    if access.status in (MatchStatus.SCHEDULED, MatchStatus.ONGOING):
+        fields = {"score": payload.score, "winner_team": payload.winner_team, "updated_at": datetime.utcnow()}
+        if not access.started_at:
+            fields["status"] = MatchStatus.ONGOING
+        live = await set_live_fields(match_id, dirty=True, **fields)
+        if live:
+            await socket_manager.broadcast_score_update(
+                session_id=live.session_id,
+                payload={"match_id": live.id, "score": live.score, "winner_team": live.winner_team},
+            )
+            return live
+
+    match = (await db.execute(select(Match).where(Match.id == match_id))).scalar_one()
     match.score = payload.score
     match.winner_team = payload.winner_team
 
@@ -281,13 +782,187 @@ async def update_score(
         match.status = MatchStatus.ONGOING if not match.started_at else match.status
 
     await db.flush()
+    after_commit(db, bump_session_state, match.session_id)
 
     await socket_manager.broadcast_score_update(
         session_id=match.session_id,
         payload={"match_id": match.id, "score": match.score, "winner_team": match.winner_team},
     )
 
-    return await _serialize_match(db, match)
+    response = await _serialize_match(db, match)
+    if match.status in (MatchStatus.SCHEDULED, MatchStatus.ONGOING):
+        after_commit(db, put_live_matches, [response])
+    return response
+
+
+@router.post("/sessions/{session_id}/matches/bulk", response_model=List[MatchResponse])
+async def bulk_update_matches(
+    session_id: str,
+    payload: MatchBulkRequest,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """Start and complete several matches of a session at once.
+
+    All operations succeed or none do. Results of the completed matches are
+    applied in one batch and the session gets one ``matches_updated`` event.
+    """
+    session = await _get_session_or_404(db, session_id)
+    membership = await _check_member_or_403(db, session.club_id, user_id)
+    if not _can_manage(membership.role):
+        raise HTTPException(status_code=403, detail="Only admin/organizer can update matches")
+
+    operations = payload.operations
+    match_ids = [op.match_id for op in operations]
+    if len(set(match_ids)) != len(match_ids):
+        raise HTTPException(status_code=400, detail="Each match may appear only once")
+
+    matches = {
+        m.id: m
+        for m in (
+            await db.execute(select(Match).where(Match.session_id == session_id, Match.id.in_(match_ids)))
+        ).scalars()
+    }
+    missing = [match_id for match_id in match_ids if match_id not in matches]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Match not found: {', '.join(missing)}")
+    if any(matches[match_id].status == MatchStatus.COMPLETED for match_id in match_ids):
+        raise HTTPException(status_code=400, detail="Completed matches cannot be started or completed")
+
+    now = datetime.utcnow()
+    to_start = [matches[op.match_id] for op in operations if op.action == "start"]
+    for match in to_start:
+        match.status = MatchStatus.ONGOING
+        if not match.started_at:
+            match.started_at = now
+    await db.flush()
+
+    winners = {op.match_id: op.winner_team for op in operations if op.action == "complete"}
+    completed = await _complete(db, session.club_id, winners) if winners else []
+    if len(completed) != len(winners):
+        raise HTTPException(status_code=400, detail="Match already completed")
+    matches.update((m.id, m) for m in completed)
+
+    for match in to_start:
+        after_commit(db, record_match_played, match, match.started_at)
+        after_commit(db, set_live_fields, match.id, status=match.status, started_at=match.started_at, updated_at=now)
+    after_commit(db, bump_session_state, session_id)
+    if completed:
+        after_commit(db, refresh_queue_after_commit, session_id)
+        after_commit(db, drop_live_matches, session_id, [m.id for m in completed])
+        for match in completed:
+            after_commit(db, discard_point_stream, match.id)
+
+    await socket_manager.broadcast_matches_updated(
+        session_id=session_id,
+        payload={
+            "matches": [
+                {
+                    "match_id": m.id,
+                    "status": m.status,
+                    "winner_team": m.winner_team,
+                    "started_at": m.started_at.isoformat() if m.started_at else None,
+                    "completed_at": m.completed_at.isoformat() if m.completed_at else None,
+                }
+                for m in (matches[match_id] for match_id in match_ids)
+            ],
+        },
+    )
+
+    return await _serialize_matches(db, [matches[match_id] for match_id in match_ids])
+
+
+async def _match_access(db: AsyncSession, match_id: str, user_id: str):
+    """A match's session, status and players with the user's club role, in one query."""
+    row = (
+        await db.execute(
+            select(
+                Match.session_id,
+                Match.status,
+                Match.started_at,
+                Match.team_a_player_1_id,
+                Match.team_a_player_2_id,
+                Match.team_b_player_1_id,
+                Match.team_b_player_2_id,
+                ClubMember.role,
+            )
+            .join(Session, Session.id == Match.session_id)
+            .outerjoin(ClubMember, (ClubMember.club_id == Session.club_id) & (ClubMember.user_id == user_id))
+            .where(Match.id == match_id)
+        )
+    ).one_or_none()
+    if not row:
+        raise HTTPException(status_code=404, detail="Match not found")
+    if row.role is None:
+        raise HTTPException(status_code=403, detail="Not a member of this club")
+    return row
+
+
+async def _score_keeper_or_403(db: AsyncSession, match_id: str, user_id: str) -> Tuple[str, str]:
+    """Session id and status of a match the user may score: organizers and the match's players."""
+    row = await _match_access(db, match_id, user_id)
+    if not _can_manage(row.role) and user_id not in row[3:7]:
+        raise HTTPException(status_code=403, detail="Only organizers and the match's players can score it")
+    return row.session_id, row.status
+
+
+def _to_live_score(match_id: str, seq: int, score: LiveScore) -> MatchLiveScore:
+    return MatchLiveScore(
+        match_id=match_id,
+        seq=seq,
+        sets=[SetScore(team_a=a, team_b=b) for a, b in score.sets],
+        score=score.score_string(),
+        winner_team=score.winner_team,
+    )
+
+
+@router.post("/matches/{match_id}/points", response_model=MatchLiveScore, status_code=status.HTTP_201_CREATED)
+async def record_match_point(
+    match_id: str,
+    payload: MatchPointCreate,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """Record one rally (or take the last one back) from a court-side client.
+
+    Taps are buffered and written in batches; the match row itself is only
+    updated when the match is completed.
+    """
+    session_id, match_status = await _score_keeper_or_403(db, match_id, user_id)
+    if match_status in (MatchStatus.COMPLETED, MatchStatus.CANCELLED):
+        raise HTTPException(status_code=400, detail=f"Cannot score a {match_status} match")
+    if payload.action == POINT and not payload.team:
+        raise HTTPException(status_code=400, detail="team is required for a point")
+
+    try:
+        seq, score = await record_point(db, match_id, payload.action, payload.team, user_id)
+    except ScoringError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    live = _to_live_score(match_id, seq, score)
+    await set_live_fields(match_id, dirty=True, score=live.score, updated_at=datetime.utcnow())
+    await socket_manager.broadcast_score_update(
+        session_id=session_id,
+        payload={**live.model_dump(), "live": True},
+    )
+    return live
+
+
+@router.get("/matches/{match_id}/points", response_model=MatchLiveScore)
+async def get_live_score(
+    match_id: str,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    match = (await db.execute(select(Match).where(Match.id == match_id))).scalar_one_or_none()
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found")
+
+    session = await _get_session_or_404(db, match.session_id)
+    await _check_member_or_403(db, session.club_id, user_id)
+
+    events = await load_events(db, match_id)
+    return _to_live_score(match_id, events[-1][0] if events else 0, live_score(events))
 
 
 @router.patch("/matches/{match_id}/status", response_model=MatchResponse)
@@ -295,7 +970,7 @@ async def update_status(
     match_id: str,
     payload: MatchUpdateStatus,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     match = (await db.execute(select(Match).where(Match.id == match_id))).scalar_one_or_none()
     if not match:
@@ -307,14 +982,44 @@ async def update_status(
         raise HTTPException(status_code=403, detail="Only admin/organizer can update status")
 
     new_status = payload.status
-    match.status = new_status
-
-    if new_status == MatchStatus.ONGOING and not match.started_at:
-        match.started_at = datetime.utcnow()
-    if new_status == MatchStatus.COMPLETED and not match.completed_at:
-        match.completed_at = datetime.utcnow()
-
-    await db.flush()
+    completed: List[Match] = []
+    if new_status == MatchStatus.COMPLETED and match.status != MatchStatus.COMPLETED:
+        live = (await read_live_matches([match.id])).get(match.id)
+        winner_team = (live["winner_team"] if live else None) or match.winner_team
+        final = None if winner_team else await finalize_points(db, match.id)
+        if winner_team or (final and final.winner_team):
+            # A decided match goes through the same path as /complete, so the
+            # rating replay counts it exactly as it was applied here.
+            completed = await _complete(db, session.club_id, {match.id: winner_team})
+        elif live:
+            # The flusher leaves completed matches alone, so take what it has not written yet.
+            match.score = live["score"] or match.score
+
+    if completed:
+        after_commit(db, refresh_queue_after_commit, match.session_id)
+        after_commit(db, discard_point_stream, match.id)
+    else:
+        # A completion without a winner counts in no stats, here or in the replay.
+        match.status = new_status
+        if new_status == MatchStatus.ONGOING and not match.started_at:
+            match.started_at = datetime.utcnow()
+        if new_status == MatchStatus.COMPLETED and not match.completed_at:
+            match.completed_at = datetime.utcnow()
+        if new_status in (MatchStatus.COMPLETED, MatchStatus.CANCELLED):
+            await release_courts(db, [match.id])
+
+        await db.flush()
+        await mark_match_players_completed(db, [match])
+        played_at = match.completed_at or match.started_at
+        if played_at:
+            after_commit(db, record_match_played, match, played_at)
+    after_commit(db, bump_session_state, match.session_id)
+    if new_status in (MatchStatus.COMPLETED, MatchStatus.CANCELLED):
+        after_commit(db, drop_live_matches, match.session_id, [match.id])
+    else:
+        after_commit(
+            db, set_live_fields, match.id, status=new_status, started_at=match.started_at, updated_at=match.updated_at
+        )
     return await _serialize_match(db, match)
 
 
@@ -322,7 +1027,7 @@ async def update_status(
 async def start_match(
     match_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     match = (await db.execute(select(Match).where(Match.id == match_id))).scalar_one_or_none()
     if not match:
@@ -340,6 +1045,11 @@ async def start_match(
     if not match.started_at:
         match.started_at = datetime.utcnow()
     await db.flush()
+    after_commit(db, record_match_played, match, match.started_at)
+    after_commit(db, bump_session_state, match.session_id)
+    after_commit(
+        db, set_live_fields, match.id, status=match.status, started_at=match.started_at, updated_at=match.updated_at
+    )
 
     await socket_manager.broadcast_match_started(
         session_id=match.session_id,
@@ -349,14 +1059,52 @@ async def start_match(
     return await _serialize_match(db, match)
 
 
+async def _complete(db: AsyncSession, club_id: str, winners: Dict[str, Optional[str]]) -> List[Match]:
+    """Complete matches of one club and apply their results in one batch.
+
+    Recorded points give the set scores, and the winner where none is
+    given. The club leaderboard follows once the results are committed.
+    Returns only the matches this call completed.
+    """
+    finals = {match_id: await finalize_points(db, match_id) for match_id in winners}
+    live = await read_live_matches(winners)
+    resolved = {}
+    for match_id, winner_team in winners.items():
+        final = finals[match_id]
+        resolved[match_id] = winner_team or (final.winner_team if final else None)
+        if not resolved[match_id]:
+            raise HTTPException(status_code=400, detail="winner_team is required until the points decide the match")
+
+    completed = await complete_matches(db, resolved, datetime.utcnow())
+    for match in completed:
+        final = finals[match.id]
+        if final:
+            match.score = final.score_string()
+            match.set_scores = final.set_scores()
+        elif match.id in live and live[match.id]["score"]:
+            # A score kept live in Redis may not have been flushed yet.
+            match.score = live[match.id]["score"]
+
+    standings = await apply_match_results(db, club_id, completed)
+    after_commit(db, update_leaderboard, club_id, standings)
+    after_commit(db, bump_club_stats, club_id)
+    await record_monthly_stats(db, club_id, completed)
+    await record_pair_stats(db, club_id, completed)
+    await mark_match_players_completed(db, completed)
+    await release_courts(db, [match.id for match in completed])
+    for match in completed:
+        after_commit(db, record_match_played, match, match.completed_at)
+    return completed
+
+
 @router.post("/matches/{match_id}/complete", response_model=MatchResponse)
 async def complete_match(
     match_id: str,
-    winner_team: str,
+    winner_team: Optional[str] = None,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
-    if winner_team not in ["A", "B"]:
+    if winner_team not in [None, "A", "B"]:
         raise HTTPException(status_code=400, detail="winner_team must be 'A' or 'B'")
 
     match = (await db.execute(select(Match).where(Match.id == match_id))).scalar_one_or_none()
@@ -371,50 +1119,14 @@ async def complete_match(
     if match.status == MatchStatus.COMPLETED:
         raise HTTPException(status_code=400, detail="Match already completed")
 
-    match.status = MatchStatus.COMPLETED
-    match.winner_team = winner_team
-    if not match.started_at:
-        match.started_at = datetime.utcnow()
-    match.completed_at = datetime.utcnow()
-
-    team_a_ids = [match.team_a_player_1_id] + ([match.team_a_player_2_id] if match.team_a_player_2_id else [])
-    team_b_ids = [match.team_b_player_1_id] + ([match.team_b_player_2_id] if match.team_b_player_2_id else [])
-
-    winner_ids = team_a_ids if winner_team == "A" else team_b_ids
-    loser_ids = team_b_ids if winner_team == "A" else team_a_ids
-
-    all_player_ids = team_a_ids + team_b_ids
-    users = (await db.execute(select(User).where(User.id.in_(all_player_ids)))).scalars().all()
-    by_id = {u.id: u for u in users}
-
-    for uid in winner_ids:
-        if uid in by_id:
-            by_id[uid].wins += 1
-            by_id[uid].total_matches += 1
-            by_id[uid].rating += 5
-    for uid in loser_ids:
-        if uid in by_id:
-            by_id[uid].losses += 1
-            by_id[uid].total_matches += 1
-            by_id[uid].rating = max(100.0, by_id[uid].rating - 3)
-
-    members = (
-        await db.execute(
-            select(ClubMember).where(
-                ClubMember.club_id == session.club_id,
-                ClubMember.user_id.in_(all_player_ids),
-            )
-        )
-    ).scalars().all()
-
-    for cm in members:
-        cm.matches_in_club += 1
-        if cm.user_id in winner_ids:
-            cm.wins_in_club += 1
-            cm.rating_in_club += 5
-        else:
-            cm.rating_in_club = max(100.0, cm.rating_in_club - 3)
+    completed = await _complete(db, session.club_id, {match.id: winner_team})
+    if not completed:
+        raise HTTPException(status_code=400, detail="Match already completed")
+    match = completed[0]
 
-    await db.flush()
+    after_commit(db, refresh_queue_after_commit, match.session_id)
+    after_commit(db, bump_session_state, match.session_id)
+    after_commit(db, discard_point_stream, match.id)
+    after_commit(db, drop_live_matches, match.session_id, [match.id])
 
     return await _serialize_match(db, match)
@@ -14,7 +14,7 @@ async def test_email_notification(
     subject: str = "ทดสอบ Email",
     body: str = "นี่คือการทดสอบการส่ง Email จาก Badminton App 🏸",
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """Test Email notification"""
     from sqlalchemy import select
@@ -47,7 +47,7 @@ async def test_email_notification(
 async def update_notification_settings(
     fcm_token: str = None,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """Update user's notification tokens"""
     from sqlalchemy import select
@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import after_commit, get_db
 from app.core.security import get_current_user_id
 from app.models.models import (
     ClubMember,
@@ -15,6 +15,8 @@ from app.models.models import (
     User,
     UserRole,
 )
+from app.services.match_preview import bump_session_state
+from app.services.prematch_planner import refresh_queue_after_commit
 from app.websocket.socket_manager import socket_manager
 
 router = APIRouter()
@@ -28,7 +30,7 @@ def _can_manage(role: UserRole) -> bool:
 async def register_for_session(
     session_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     session = (await db.execute(select(Session).where(Session.id == session_id))).scalar_one_or_none()
     if not session:
@@ -96,6 +98,8 @@ async def register_for_session(
         db.add(reg)
 
     await db.flush()
+    after_commit(db, refresh_queue_after_commit, session_id)
+    after_commit(db, bump_session_state, session_id)
 
     await socket_manager.broadcast_registration_update(
         session_id=session_id,
@@ -128,7 +132,7 @@ async def register_for_session(
 async def cancel_registration(
     session_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     reg = (
         await db.execute(
@@ -182,6 +186,8 @@ async def cancel_registration(
                 item.waitlist_position = idx
 
     await db.flush()
+    after_commit(db, refresh_queue_after_commit, session_id)
+    after_commit(db, bump_session_state, session_id)
 
     await socket_manager.broadcast_registration_update(
         session_id=session_id,
@@ -208,7 +214,7 @@ async def cancel_registration(
 async def check_in(
     session_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     reg = (
         await db.execute(
@@ -234,7 +240,7 @@ async def check_in(
 async def check_out(
     session_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     reg = (
         await db.execute(
@@ -259,7 +265,7 @@ async def check_out(
 async def list_registrations(
     session_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     session = (await db.execute(select(Session).where(Session.id == session_id))).scalar_one_or_none()
     if not session:
@@ -3,14 +3,16 @@ from typing import List
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func, select
+from sqlalchemy import delete, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import after_commit, get_db
 from app.core.security import get_current_user_id
 from app.models.models import (
     Club,
     ClubMember,
+    Court,
+    PreMatch,
     Session,
     SessionRegistration,
     SessionStatus,
@@ -18,6 +20,8 @@ from app.models.models import (
     RegistrationStatus,
 )
 from app.schemas.schemas import SessionCreate, SessionResponse, SessionUpdate
+from app.services.club_stats import bump_club_stats
+from app.services.court_allocator import sync_courts
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -32,7 +36,7 @@ async def create_session(
     club_id: str,
     payload: SessionCreate,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     try:
         logger.info("Creating session payload=%s", payload.model_dump())
@@ -74,11 +78,14 @@ async def create_session(
             start_time=make_naive(payload.start_time),
             end_time=make_naive(payload.end_time),
             max_participants=payload.max_participants,
+            number_of_courts=payload.number_of_courts,
             status=SessionStatus.DRAFT,
             created_by=user_id,
         )
         db.add(session)
         await db.flush()
+        await sync_courts(db, session)
+        after_commit(db, bump_club_stats, club_id)
         return session
     except HTTPException:
         raise
@@ -91,7 +98,7 @@ async def create_session(
 async def list_sessions(
     club_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     membership = (
         await db.execute(
@@ -138,7 +145,7 @@ async def list_sessions(
 async def get_session(
     session_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     session = (await db.execute(select(Session).where(Session.id == session_id))).scalar_one_or_none()
     if not session:
@@ -180,7 +187,7 @@ async def update_session(
     session_id: str,
     payload: SessionUpdate,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     session = (await db.execute(select(Session).where(Session.id == session_id))).scalar_one_or_none()
     if not session:
@@ -205,6 +212,9 @@ async def update_session(
         setattr(session, k, v)
 
     await db.flush()
+    if "number_of_courts" in updates:
+        await sync_courts(db, session)
+    after_commit(db, bump_club_stats, session.club_id)
 
     data = SessionResponse.model_validate(session)
     return data
@@ -214,7 +224,7 @@ async def update_session(
 async def delete_session(
     session_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     session = (await db.execute(select(Session).where(Session.id == session_id))).scalar_one_or_none()
     if not session:
@@ -228,7 +238,11 @@ async def delete_session(
     if not membership or not _can_manage(membership.role):
         raise HTTPException(status_code=403, detail="Only admin/organizer can delete session")
 
+    # Court rows point at the session and its matches; they and planned matches go first.
+    await db.execute(delete(Court).where(Court.session_id == session_id))
+    await db.execute(delete(PreMatch).where(PreMatch.session_id == session_id))
     await db.delete(session)
+    after_commit(db, bump_club_stats, session.club_id)
     return {"message": "Session deleted"}
 
 
@@ -236,7 +250,7 @@ async def delete_session(
 async def open_registration(
     session_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     session = (await db.execute(select(Session).where(Session.id == session_id))).scalar_one_or_none()
     if not session:
@@ -255,5 +269,6 @@ async def open_registration(
 
     session.status = SessionStatus.OPEN
     await db.flush()
+    after_commit(db, bump_club_stats, session.club_id)
 
     return {"message": "Registration opened", "session_id": session_id}
@@ -1,19 +1,52 @@
 from __future__ import annotations
 
-from app.core.utils import utc_now
-from typing import List
+from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import and_, func, or_, select
+from app.core.utils import month_start, utc_now
+from typing import List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import and_, func, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
 from app.core.database import get_db
 from app.core.security import get_current_user_id
-from app.models.models import Club, ClubMember, Match, MatchStatus, Session, User
-from app.schemas.schemas import ClubStatsResponse, PlayerStatsResponse, SessionResponse
+from app.models.models import (
+    Club,
+    ClubMember,
+    Match,
+    MatchPlayer,
+    PairStats,
+    PlayerMonthlyStats,
+    RatingChange,
+    Session,
+    User,
+)
+from app.schemas.schemas import (
+    ClubStatsResponse,
+    HeadToHeadResponse,
+    LeaderboardEntry,
+    PairingResponse,
+    PairRecord,
+    PairStatsResponse,
+    PlayerStatsResponse,
+    PlayerSummary,
+    RatingHistoryPoint,
+    SessionResponse,
+)
+from app.services.club_stats import club_stats_version, get_club_stats_snapshot, store_club_stats_snapshot
+from app.services.leaderboard import invalidate_leaderboards, leaderboard_range, leaderboard_rank
+from app.services.pair_stats import OPPONENT, PARTNER
+from app.services.rating_history import downsample
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 200
+MAX_AROUND_RADIUS = 25
+DEFAULT_HISTORY_POINTS = 120
+MAX_HISTORY_POINTS = 1000
+
 
 async def _check_member_or_403(db: AsyncSession, club_id: str, user_id: str) -> ClubMember:
     membership = (
@@ -24,14 +57,47 @@ async def _check_member_or_403(db: AsyncSession, club_id: str, user_id: str) ->
     return membership
 
 
+async def _check_can_view_user_or_403(db: AsyncSession, user_id: str, current_user_id: str) -> None:
+    # allow self or club peers (must share at least one club)
+    if user_id != current_user_id:
+        shared = (
+            await db.execute(
+                select(func.count())
+                .where(ClubMember.user_id == current_user_id)
+                .where(ClubMember.club_id.in_(select(ClubMember.club_id).where(ClubMember.user_id == user_id)))
+            )
+        ).scalar() or 0
+        if shared == 0:
+            raise HTTPException(status_code=403, detail="Not allowed to view this user's stats")
+
+
+def _this_month(club_id: str):
+    """Outer join condition attaching each member's rollup for the current month."""
+    return and_(
+        PlayerMonthlyStats.club_id == club_id,
+        PlayerMonthlyStats.user_id == ClubMember.user_id,
+        PlayerMonthlyStats.month == month_start(utc_now()),
+    )
+
+
 @router.get("/clubs/{club_id}/stats", response_model=ClubStatsResponse)
 async def get_club_stats(
     club_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
+    """Club overview, served from a snapshot until something it shows changes.
+
+    Only the caller's membership is checked per request; the snapshot is
+    shared by all members.
+    """
     await _check_member_or_403(db, club_id, user_id)
 
+    version = await club_stats_version(club_id)
+    cached = await get_club_stats_snapshot(club_id, version)
+    if cached:
+        return ClubStatsResponse.model_validate_json(cached)
+
     club = (await db.execute(select(Club).where(Club.id == club_id))).scalar_one_or_none()
     if not club:
         raise HTTPException(status_code=404, detail="Club not found")
@@ -49,8 +115,9 @@ async def get_club_stats(
 
     top_rows = (
         await db.execute(
-            select(ClubMember, User)
+            select(ClubMember, User, PlayerMonthlyStats.matches)
             .join(User, User.id == ClubMember.user_id)
+            .outerjoin(PlayerMonthlyStats, _this_month(club_id))
             .where(ClubMember.club_id == club_id)
             .order_by(ClubMember.rating_in_club.desc(), ClubMember.wins_in_club.desc())
             .limit(5)
@@ -58,7 +125,7 @@ async def get_club_stats(
     ).all()
 
     top_players: List[PlayerStatsResponse] = []
-    for cm, u in top_rows:
+    for cm, u, month_matches in top_rows:
         losses = max(cm.matches_in_club - cm.wins_in_club, 0)
         win_rate = (cm.wins_in_club / cm.matches_in_club * 100.0) if cm.matches_in_club else 0.0
         top_players.append(
@@ -72,7 +139,7 @@ async def get_club_stats(
                 losses=losses,
                 win_rate=round(win_rate, 2),
                 rating=cm.rating_in_club,
-                matches_this_month=0,
+                matches_this_month=month_matches or 0,
             )
         )
 
@@ -82,7 +149,7 @@ async def get_club_stats(
 
     recent_session_responses = [SessionResponse.model_validate(s) for s in recent_sessions]
 
-    return ClubStatsResponse(
+    response = ClubStatsResponse(
         club_id=club.id,
         club_name=club.name,
         total_members=total_members,
@@ -91,80 +158,170 @@ async def get_club_stats(
         top_players=top_players,
         recent_sessions=recent_session_responses,
     )
+    await store_club_stats_snapshot(club_id, version, response.model_dump_json())
+    return response
 
 
-@router.get("/clubs/{club_id}/leaderboard", response_model=List[PlayerStatsResponse])
-async def get_leaderboard(
-    club_id: str,
-    user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
-):
-    await _check_member_or_403(db, club_id, user_id)
+def _leaderboard_entry(rank: int, cm: ClubMember, u: User, month_matches: Optional[int]) -> LeaderboardEntry:
+    return LeaderboardEntry(
+        rank=rank,
+        user_id=u.id,
+        full_name=u.full_name,
+        display_name=u.display_name,
+        avatar_url=u.picture_url,
+        total_matches=cm.matches_in_club,
+        wins=cm.wins_in_club,
+        losses=max(cm.matches_in_club - cm.wins_in_club, 0),
+        win_rate=round((cm.wins_in_club / cm.matches_in_club * 100.0), 2) if cm.matches_in_club else 0.0,
+        rating=cm.rating_in_club,
+        matches_this_month=month_matches or 0,
+    )
 
+
+async def _ranked_entries(db: AsyncSession, club_id: str, user_ids: List[str], first_rank: int) -> List[LeaderboardEntry]:
+    """Leaderboard entries for a run of ranked users, in rank order."""
+    if not user_ids:
+        return []
     rows = (
         await db.execute(
-            select(ClubMember, User)
+            select(ClubMember, User, PlayerMonthlyStats.matches)
             .join(User, User.id == ClubMember.user_id)
-            .where(ClubMember.club_id == club_id)
-            .order_by(ClubMember.rating_in_club.desc(), ClubMember.wins_in_club.desc(), ClubMember.matches_in_club.desc())
+            .outerjoin(PlayerMonthlyStats, _this_month(club_id))
+            .where(ClubMember.club_id == club_id, ClubMember.user_id.in_(user_ids))
         )
     ).all()
-
+    by_user = {row[0].user_id: row for row in rows}
     return [
-        PlayerStatsResponse(
-            user_id=u.id,
-            full_name=u.full_name,
-            display_name=u.display_name,
-            avatar_url=u.picture_url,
-            total_matches=cm.matches_in_club,
-            wins=cm.wins_in_club,
-            losses=max(cm.matches_in_club - cm.wins_in_club, 0),
-            win_rate=round((cm.wins_in_club / cm.matches_in_club * 100.0), 2) if cm.matches_in_club else 0.0,
-            rating=cm.rating_in_club,
-            matches_this_month=0,
-        )
-        for cm, u in rows
+        _leaderboard_entry(first_rank + i, *by_user[uid]) for i, uid in enumerate(user_ids) if uid in by_user
     ]
 
 
+async def _sql_range(db: AsyncSession, club_id: str, offset: int, limit: Optional[int]) -> Tuple[List[str], int]:
+    """Ranked user ids straight from the database, for when Redis is down."""
+    stmt = (
+        select(ClubMember.user_id)
+        .where(ClubMember.club_id == club_id)
+        .order_by(
+            ClubMember.rating_in_club.desc(),
+            ClubMember.wins_in_club.desc(),
+            ClubMember.matches_in_club.desc(),
+            ClubMember.user_id.desc(),
+        )
+        .offset(offset)
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    user_ids = list((await db.execute(stmt)).scalars().all())
+    total = (await db.execute(select(func.count(ClubMember.id)).where(ClubMember.club_id == club_id))).scalar() or 0
+    return user_ids, total
+
+
+async def _sql_rank(db: AsyncSession, club_id: str, cm: ClubMember) -> int:
+    ahead = (
+        await db.execute(
+            select(func.count(ClubMember.id)).where(
+                ClubMember.club_id == club_id,
+                tuple_(
+                    ClubMember.rating_in_club,
+                    ClubMember.wins_in_club,
+                    ClubMember.matches_in_club,
+                    ClubMember.user_id,
+                )
+                > tuple_(cm.rating_in_club, cm.wins_in_club, cm.matches_in_club, cm.user_id),
+            )
+        )
+    ).scalar()
+    return ahead or 0
+
+
+async def _rank_of(db: AsyncSession, club_id: str, membership: ClubMember) -> int:
+    """Zero-based leaderboard rank of a member."""
+    ranked = await leaderboard_rank(db, club_id, membership.user_id)
+    if ranked is not None and ranked[0] is not None:
+        return ranked[0]
+    if ranked is not None:
+        # Joined while Redis was unreachable; have the leaderboard rebuilt.
+        await invalidate_leaderboards(club_id)
+    return await _sql_rank(db, club_id, membership)
+
+
+@router.get("/clubs/{club_id}/leaderboard", response_model=List[LeaderboardEntry])
+async def get_leaderboard(
+    club_id: str,
+    response: Response,
+    offset: int = Query(default=0, ge=0),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """Club members by rating, then wins, then matches played.
+
+    Pass ``limit`` and ``offset`` to page through it; ``X-Total-Count``
+    carries the number of ranked members.
+    """
+    await _check_member_or_403(db, club_id, user_id)
+
+    ranked = await leaderboard_range(db, club_id, offset, limit)
+    user_ids, total = ranked if ranked is not None else await _sql_range(db, club_id, offset, limit)
+    response.headers["X-Total-Count"] = str(total)
+    return await _ranked_entries(db, club_id, user_ids, offset + 1)
+
+
+@router.get("/clubs/{club_id}/leaderboard/me", response_model=LeaderboardEntry)
+async def get_my_leaderboard_rank(
+    club_id: str,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    membership = await _check_member_or_403(db, club_id, user_id)
+
+    rank = await _rank_of(db, club_id, membership)
+    return (await _ranked_entries(db, club_id, [user_id], rank + 1))[0]
+
+
+@router.get("/clubs/{club_id}/leaderboard/around-me", response_model=List[LeaderboardEntry])
+async def get_leaderboard_around_me(
+    club_id: str,
+    radius: int = Query(default=5, ge=0, le=MAX_AROUND_RADIUS),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """The caller's leaderboard entry with up to ``radius`` members either side."""
+    membership = await _check_member_or_403(db, club_id, user_id)
+
+    rank = await _rank_of(db, club_id, membership)
+    offset = max(rank - radius, 0)
+    limit = rank + radius + 1 - offset
+    ranked = await leaderboard_range(db, club_id, offset, limit)
+    user_ids, _ = ranked if ranked is not None else await _sql_range(db, club_id, offset, limit)
+    return await _ranked_entries(db, club_id, user_ids, offset + 1)
+
+
 @router.get("/users/{user_id}/stats", response_model=PlayerStatsResponse)
 async def get_user_stats(
     user_id: str,
     current_user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
-    # allow self or club peers (must share at least one club)
-    if user_id != current_user_id:
-        shared = (
-            await db.execute(
-                select(func.count())
-                .where(ClubMember.user_id == current_user_id)
-                .where(ClubMember.club_id.in_(select(ClubMember.club_id).where(ClubMember.user_id == user_id)))
-            )
-        ).scalar() or 0
-        if shared == 0:
-            raise HTTPException(status_code=403, detail="Not allowed to view this user's stats")
+    await _check_can_view_user_or_403(db, user_id, current_user_id)
 
     user = (await db.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    start_month = utc_now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     matches_this_month = (
         await db.execute(
-            select(func.count(Match.id)).where(
-                Match.status == MatchStatus.COMPLETED,
-                Match.completed_at >= start_month,
-                or_(
-                    Match.team_a_player_1_id == user_id,
-                    Match.team_a_player_2_id == user_id,
-                    Match.team_b_player_1_id == user_id,
-                    Match.team_b_player_2_id == user_id,
-                ),
+            select(func.sum(PlayerMonthlyStats.matches)).where(
+                PlayerMonthlyStats.user_id == user_id,
+                PlayerMonthlyStats.month == month_start(utc_now()),
             )
         )
     ).scalar() or 0
 
+    last_played_at = (
+        await db.execute(select(func.max(MatchPlayer.completed_at)).where(MatchPlayer.user_id == user_id))
+    ).scalar()
+
     win_rate = (user.wins / user.total_matches * 100.0) if user.total_matches else 0.0
 
     return PlayerStatsResponse(
@@ -178,6 +335,7 @@ async def get_user_stats(
         win_rate=round(win_rate, 2),
         rating=user.rating,
         matches_this_month=matches_this_month,
+        last_played_at=last_played_at,
     )
 
 
@@ -186,7 +344,7 @@ async def get_player_club_stats(
     club_id: str,
     user_id: str,
     current_user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     await _check_member_or_403(db, club_id, current_user_id)
 
@@ -203,25 +361,24 @@ async def get_player_club_stats(
 
     cm, u = row
 
-    start_month = utc_now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     matches_this_month = (
         await db.execute(
-            select(func.count(Match.id))
-            .join(Session, Session.id == Match.session_id)
-            .where(
-                Session.club_id == club_id,
-                Match.status == MatchStatus.COMPLETED,
-                Match.completed_at >= start_month,
-                or_(
-                    Match.team_a_player_1_id == user_id,
-                    Match.team_a_player_2_id == user_id,
-                    Match.team_b_player_1_id == user_id,
-                    Match.team_b_player_2_id == user_id,
-                ),
+            select(PlayerMonthlyStats.matches).where(
+                PlayerMonthlyStats.club_id == club_id,
+                PlayerMonthlyStats.user_id == user_id,
+                PlayerMonthlyStats.month == month_start(utc_now()),
             )
         )
     ).scalar() or 0
 
+    last_played_at = (
+        await db.execute(
+            select(func.max(MatchPlayer.completed_at)).where(
+                MatchPlayer.club_id == club_id, MatchPlayer.user_id == user_id
+            )
+        )
+    ).scalar()
+
     losses = max(cm.matches_in_club - cm.wins_in_club, 0)
     win_rate = (cm.wins_in_club / cm.matches_in_club * 100.0) if cm.matches_in_club else 0.0
 
@@ -236,4 +393,191 @@ async def get_player_club_stats(
         win_rate=round(win_rate, 2),
         rating=cm.rating_in_club,
         matches_this_month=matches_this_month,
+        last_played_at=last_played_at,
+    )
+
+
+def _naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    if moment is not None and moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _history_points(samples, bucket: str, max_points: int) -> List[RatingHistoryPoint]:
+    return [
+        RatingHistoryPoint(date=start.isoformat(), rating=round(rating, 2), matches=matches)
+        for start, rating, matches in downsample(samples, bucket, max_points)
+    ]
+
+
+@router.get("/users/{user_id}/rating-history", response_model=List[RatingHistoryPoint])
+async def get_rating_history(
+    user_id: str,
+    bucket: str = Query(default="day", pattern=r"^(day|week)$"),
+    max_points: int = Query(default=DEFAULT_HISTORY_POINTS, ge=2, le=MAX_HISTORY_POINTS),
+    since: Optional[datetime] = None,
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """A player's overall rating over time, one point per day or week.
+
+    Each point has the last rating of its bucket and the matches played in
+    it. Long histories are thinned to ``max_points`` on the server.
+    """
+    await _check_can_view_user_or_403(db, user_id, current_user_id)
+
+    stmt = select(RatingChange.recorded_at, RatingChange.rating).where(RatingChange.user_id == user_id)
+    if since is not None:
+        stmt = stmt.where(RatingChange.recorded_at >= _naive_utc(since))
+    samples = (await db.execute(stmt.order_by(RatingChange.recorded_at))).all()
+    return _history_points(samples, bucket, max_points)
+
+
+@router.get("/clubs/{club_id}/players/{user_id}/rating-history", response_model=List[RatingHistoryPoint])
+async def get_player_club_rating_history(
+    club_id: str,
+    user_id: str,
+    bucket: str = Query(default="day", pattern=r"^(day|week)$"),
+    max_points: int = Query(default=DEFAULT_HISTORY_POINTS, ge=2, le=MAX_HISTORY_POINTS),
+    since: Optional[datetime] = None,
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """A player's club rating over time; see ``get_rating_history``."""
+    await _check_member_or_403(db, club_id, current_user_id)
+
+    stmt = select(RatingChange.recorded_at, RatingChange.club_rating).where(
+        RatingChange.club_id == club_id,
+        RatingChange.user_id == user_id,
+        RatingChange.club_rating.is_not(None),
+    )
+    if since is not None:
+        stmt = stmt.where(RatingChange.recorded_at >= _naive_utc(since))
+    samples = (await db.execute(stmt.order_by(RatingChange.recorded_at))).all()
+    return _history_points(samples, bucket, max_points)
+
+
+def _pair_record(matches: int, wins: int) -> dict:
+    return {
+        "matches": matches,
+        "wins": wins,
+        "losses": max(matches - wins, 0),
+        "win_rate": round(wins / matches * 100.0, 2) if matches else 0.0,
+    }
+
+
+def _player_summary(u: User) -> PlayerSummary:
+    return PlayerSummary(
+        id=u.id,
+        full_name=u.full_name,
+        display_name=u.display_name,
+        avatar_url=u.avatar_url,
+        rating=u.rating,
+    )
+
+
+@router.get("/clubs/{club_id}/players/{user_id}/pairs", response_model=List[PairStatsResponse])
+async def list_player_pairs(
+    club_id: str,
+    user_id: str,
+    response: Response,
+    relation: str = Query(default=PARTNER, pattern=r"^(partner|opponent)$"),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """A player's partners or opponents in a club, most matches together first.
+
+    Records are from the player's side; ``X-Total-Count`` has the number of
+    players they met that way.
+    """
+    await _check_member_or_403(db, club_id, current_user_id)
+
+    where = (PairStats.club_id == club_id, PairStats.user_id == user_id, PairStats.relation == relation)
+    total = (await db.execute(select(func.count(PairStats.id)).where(*where))).scalar() or 0
+    rows = (
+        await db.execute(
+            select(PairStats, User)
+            .join(User, User.id == PairStats.other_id)
+            .where(*where)
+            .order_by(PairStats.matches.desc(), PairStats.other_id.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+    ).all()
+    response.headers["X-Total-Count"] = str(total)
+    return [
+        PairStatsResponse(relation=relation, player=_player_summary(u), **_pair_record(ps.matches, ps.wins))
+        for ps, u in rows
+    ]
+
+
+@router.get("/clubs/{club_id}/players/{user_id}/pairs/{other_id}", response_model=HeadToHeadResponse)
+async def get_head_to_head(
+    club_id: str,
+    user_id: str,
+    other_id: str,
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """A player's record with another as partner and against them, from the first player's side."""
+    await _check_member_or_403(db, club_id, current_user_id)
+
+    records = {
+        relation: _pair_record(matches, wins)
+        for relation, matches, wins in (
+            await db.execute(
+                select(PairStats.relation, PairStats.matches, PairStats.wins).where(
+                    PairStats.club_id == club_id,
+                    PairStats.user_id == user_id,
+                    PairStats.other_id == other_id,
+                )
+            )
+        ).all()
+    }
+    return HeadToHeadResponse(
+        user_id=user_id,
+        other_id=other_id,
+        as_partners=PairRecord(**records.get(PARTNER, {})),
+        as_opponents=PairRecord(**records.get(OPPONENT, {})),
     )
+
+
+@router.get("/clubs/{club_id}/pairings", response_model=List[PairingResponse])
+async def list_club_pairings(
+    club_id: str,
+    relation: str = Query(default=PARTNER, pattern=r"^(partner|opponent)$"),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """The club's most frequent partnerships or rivalries, each pair once."""
+    await _check_member_or_403(db, club_id, user_id)
+
+    first, second = aliased(User), aliased(User)
+    rows = (
+        await db.execute(
+            select(PairStats, first, second)
+            .join(first, first.id == PairStats.user_id)
+            .join(second, second.id == PairStats.other_id)
+            .where(
+                PairStats.club_id == club_id,
+                PairStats.relation == relation,
+                PairStats.user_id < PairStats.other_id,
+            )
+            .order_by(PairStats.matches.desc(), PairStats.id.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+    ).all()
+    return [
+        PairingResponse(
+            relation=relation,
+            player_1=_player_summary(u1),
+            player_2=_player_summary(u2),
+            **_pair_record(ps.matches, ps.wins),
+        )
+        for ps, u1, u2 in rows
+    ]
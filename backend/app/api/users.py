@@ -6,6 +6,8 @@ from typing import Optional
 from app.core.database import get_db
 from app.core.security import get_current_user_id
 from app.models.models import User, Club, ClubMember, ClubModerator, UserRole
+from app.schemas.schemas import UserResponse, UserUpdate
+from app.services.club_stats import bump_member_club_stats
 
 router = APIRouter()
 
@@ -13,7 +15,7 @@ router = APIRouter()
 @router.get("/users/me")
 async def get_current_user(
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """Get current user profile"""
     result = await db.execute(select(User).where(User.id == user_id))
@@ -23,20 +25,37 @@ async def get_current_user(
     return user
 
 
-@router.patch("/users/me")
+@router.patch("/users/me", response_model=UserResponse)
 async def update_current_user(
+    payload: UserUpdate,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
-    """Update current user profile"""
-    return {"message": "Update current user - to be implemented"}
+    """Update current user profile; fields left out stay as they are"""
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    updates = payload.model_dump(exclude_unset=True)
+    if "avatar_url" in updates:
+        updates["picture_url"] = updates.pop("avatar_url")
+    if updates.get("display_name", "") is None:
+        raise HTTPException(status_code=400, detail="display_name cannot be empty")
+    for field, value in updates.items():
+        setattr(user, field, value)
+
+    await db.flush()
+    # Club stats snapshots show member names and avatars.
+    await bump_member_club_stats(db, user_id)
+    return user
 
 
 @router.get("/users/{user_id}")
 async def get_user(
     user_id: str,
     current_user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """Get user by ID"""
     result = await db.execute(select(User).where(User.id == user_id))
@@ -50,7 +69,7 @@ async def get_user(
 async def get_user_club_role(
     club_id: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ) -> dict:
     """Get current user's role in a specific club"""
     # Check if user is the owner
@@ -110,7 +129,7 @@ async def get_user_club_role(
 @router.get("/users/me/is-super-admin")
 async def check_super_admin(
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ) -> dict:
     """Check if current user is a super admin"""
     result = await db.execute(select(User).where(User.id == user_id))
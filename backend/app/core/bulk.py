@@ -0,0 +1,71 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Insert, Table, bindparam, column, insert, update, values
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.sql import ColumnElement, Executable
+from sqlalchemy.types import TypeEngine
+
+BULK_BATCH_SIZE = 5000
+
+
+def bulk_update(
+    dialect: str,
+    table: Table,
+    key: str,
+    types: Dict[str, TypeEngine],
+    rows: List[dict],
+    increment: Iterable[str] = (),
+    batch_size: int = BULK_BATCH_SIZE,
+    where: Optional[ColumnElement] = None,
+) -> Iterator[Tuple[Executable, Optional[List[dict]]]]:
+    """Statements that update many rows of ``table`` by ``key``.
+
+    ``types`` names the key and every column to write, and each row holds
+    a value for all of them. Columns in ``increment`` are added to the
+    stored value instead of replacing it. Rows not matching ``where`` are
+    left alone. On PostgreSQL every batch is one
+    ``UPDATE ... FROM (VALUES ...)``; elsewhere it is an executemany.
+    Yields ``(statement, params)`` pairs for the caller to execute.
+    """
+    names = list(types)
+    increment = set(increment)
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        if dialect == "postgresql":
+            data = values(*(column(n, t) for n, t in types.items()), name="v").data(
+                [tuple(r[n] for n in names) for r in batch]
+            )
+            assignments = {
+                n: (table.c[n] + data.c[n]) if n in increment else data.c[n] for n in names if n != key
+            }
+            stmt = update(table).where(table.c[key] == data.c[key]).values(assignments)
+            yield (stmt if where is None else stmt.where(where)), None
+        else:
+            assignments = {
+                n: (table.c[n] + bindparam(f"b_{n}")) if n in increment else bindparam(f"b_{n}")
+                for n in names
+                if n != key
+            }
+            stmt = update(table).where(table.c[key] == bindparam(f"b_{key}")).values(assignments)
+            yield (stmt if where is None else stmt.where(where)), [{f"b_{n}": r[n] for n in names} for r in batch]
+
+
+def insert_ignore(dialect: str, table: Table, conflict_columns: Iterable[str]) -> Insert:
+    """INSERT into ``table`` that skips rows clashing on ``conflict_columns``."""
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing(index_elements=list(conflict_columns))
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing(index_elements=list(conflict_columns))
+    return insert(table).prefix_with("IGNORE")
+
+
+def insert_increment(dialect: str, table: Table, conflict_columns: Iterable[str], increment: Iterable[str]) -> Insert:
+    """INSERT into ``table`` that adds ``increment`` columns to a row clashing on ``conflict_columns``."""
+    if dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql if dialect == "postgresql" else sqlite).insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=list(conflict_columns),
+            set_={n: table.c[n] + stmt.excluded[n] for n in increment},
+        )
+    stmt = mysql.insert(table)
+    return stmt.on_duplicate_key_update({n: table.c[n] + stmt.inserted[n] for n in increment})
@@ -81,6 +81,25 @@ class Settings(BaseSettings):
     SMTP_USER: Optional[str] = None
     SMTP_PASSWORD: Optional[str] = None
     SMTP_FROM_EMAIL: Optional[str] = None
+
+    # Matchmaking: "inline" runs searches on the event loop, "process" in a worker pool
+    MATCHMAKING_EXECUTOR: str = "inline"
+    MATCHMAKING_WORKERS: int = 2
+    MATCHMAKING_DEADLINE_MS: int = 250
+    # A worker still busy this long after a missed deadline gets its pool replaced
+    MATCHMAKING_GRACE_MS: int = 1000
+    # Smaller candidate pools are always searched inline
+    MATCHMAKING_OFFLOAD_MIN_PLAYERS: int = 24
+
+    # Court-side score taps are buffered in Redis and written to the database this often
+    SCORE_FLUSH_INTERVAL_SECONDS: float = 1.0
+    # Scores of live matches are kept in Redis and written back this often
+    LIVE_FLUSH_INTERVAL_SECONDS: float = 2.0
+
+    # Responses to requests sent with an Idempotency-Key are replayed for this long
+    IDEMPOTENCY_TTL_SECONDS: int = 60 * 60 * 24
+    # How long a retry waits for the original request before giving up with 409
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
     
     class Config:
         env_file = ".env"
@@ -1,3 +1,8 @@
+import asyncio
+import inspect
+from typing import Any, Callable, List, Set, Tuple
+
+import structlog
 from sqlmodel import SQLModel
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
@@ -6,6 +11,7 @@ from sqlalchemy import create_engine
 from app.core.config import get_settings
 
 settings = get_settings()
+logger = structlog.get_logger()
 
 # PostgreSQL-only database URLs
 async_database_url = settings.DATABASE_URL
@@ -34,8 +40,51 @@ sync_engine = create_engine(
 SessionLocal = sessionmaker(bind=sync_engine)
 
 
+_AFTER_COMMIT = "after_commit"
+
+# Tasks running after-commit calls; kept so they are not collected early.
+_after_commit_tasks: Set[asyncio.Task] = set()
+
+
+def after_commit(db: AsyncSession, func: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+    """Call ``func(*args, **kwargs)`` once the request's transaction has committed.
+
+    Calls are dropped if it rolls back. Cache and Redis writes that describe
+    the request's rows go here. They run in order in a task of their own,
+    so they never hold up the response.
+    """
+    db.info.setdefault(_AFTER_COMMIT, []).append((func, args, kwargs))
+
+
+async def _run_calls(calls: List[Tuple[Callable[..., Any], tuple, dict]]) -> None:
+    for func, args, kwargs in calls:
+        try:
+            result = func(*args, **kwargs)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.warning("After-commit call failed", call=getattr(func, "__name__", repr(func)), error=str(e))
+
+
+def run_after_commit(db: AsyncSession) -> None:
+    calls = db.info.pop(_AFTER_COMMIT, [])
+    if calls:
+        task = asyncio.create_task(_run_calls(calls))
+        _after_commit_tasks.add(task)
+        task.add_done_callback(_after_commit_tasks.discard)
+
+
+async def wait_after_commit() -> None:
+    """Wait for the after-commit calls still running, e.g. on shutdown."""
+    await asyncio.gather(*_after_commit_tasks, return_exceptions=True)
+
+
 async def get_db():
-    """Dependency for getting async database sessions"""
+    """Dependency for getting async database sessions.
+
+    Depend on it with ``scope="function"`` so the commit lands before the
+    response goes out and a client's next request sees it.
+    """
     async with AsyncSessionLocal() as session:
         try:
             yield session
@@ -45,9 +94,13 @@ async def get_db():
             raise
         finally:
             await session.close()
+        run_after_commit(session)
 
 
 async def init_db():
-    """Initialize database - create all tables"""
+    """Initialize database - create all tables and upgrade existing ones"""
+    from app.core.migrations import upgrade_schema
+
     async with async_engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
@@ -0,0 +1,199 @@
+"""Replay-safe mutations through the ``Idempotency-Key`` request header.
+
+The first request with a key runs normally and its response is stored in
+Redis. Retries with the same key get that response back without reaching
+the handler, and a retry arriving while the first request still runs
+waits for it. Keys belong to the authenticated user, so requests without
+a valid token, and all requests without Redis, simply run.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+from typing import List, Optional, Tuple
+
+import structlog
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.redis import get_redis
+from app.core.security import decode_token
+
+logger = structlog.get_logger()
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+MAX_KEY_LENGTH = 255
+
+# A crashed request must not block its retries for longer than this.
+LOCK_TTL_SECONDS = 60
+POLL_INTERVAL_SECONDS = 0.05
+
+_RUNNING = "running"
+_DONE = "done"
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app: ASGIApp, ttl_seconds: int = 60 * 60 * 24, wait_seconds: float = 10.0):
+        self.app = app
+        self.ttl_seconds = ttl_seconds
+        self.wait_seconds = wait_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        key = headers.get(IDEMPOTENCY_HEADER, b"").decode("latin-1").strip()
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": "Idempotency-Key is too long"})
+            return
+
+        # Keys are per user, so one user cannot replay another's response,
+        # and a refreshed token still finds the responses of the old one.
+        user_id = _user_id(headers.get(b"authorization", b"").decode("latin-1"))
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        redis_key = f"idempotency:{user_id}:{key}"
+        fingerprint = hashlib.sha256(
+            b"\n".join([scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body])
+        ).hexdigest()
+
+        deadline = asyncio.get_running_loop().time() + self.wait_seconds
+        while True:
+            try:
+                r = await get_redis()
+                acquired = await r.set(
+                    redis_key, json.dumps({"state": _RUNNING, "fingerprint": fingerprint}), nx=True, ex=LOCK_TTL_SECONDS
+                )
+            except Exception as e:
+                logger.warning("Idempotency store unavailable", error=str(e))
+                await self.app(scope, _replay_body(body), send)
+                return
+
+            if acquired:
+                await self._run_and_store(scope, body, send, r, redis_key, fingerprint)
+                return
+
+            record = await self._wait_for_first(r, redis_key, deadline)
+            # The first request failed and left nothing behind: take its place.
+            if record != {}:
+                break
+
+        if record is None:
+            await _send_json(send, 409, {"detail": "A request with this Idempotency-Key is still in progress"})
+        elif record["fingerprint"] != fingerprint:
+            await _send_json(send, 422, {"detail": "Idempotency-Key was already used for a different request"})
+        else:
+            await _send_stored(send, record)
+
+    async def _run_and_store(self, scope: Scope, body: bytes, send: Send, r, redis_key: str, fingerprint: str) -> None:
+        status = 500
+        response_headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+
+        async def capture(message: Message) -> None:
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, _replay_body(body), capture)
+        finally:
+            try:
+                if status < 500:
+                    record = {
+                        "state": _DONE,
+                        "fingerprint": fingerprint,
+                        "status": status,
+                        "headers": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in response_headers],
+                        "body": base64.b64encode(b"".join(chunks)).decode(),
+                    }
+                    await r.set(redis_key, json.dumps(record), ex=self.ttl_seconds)
+                else:
+                    # Server errors are not remembered so the client can retry.
+                    await r.delete(redis_key)
+            except Exception as e:
+                logger.warning("Failed to store idempotent response", error=str(e))
+
+    async def _wait_for_first(self, r, redis_key: str, deadline: float) -> Optional[dict]:
+        """The finished record of the first request.
+
+        Returns None if it did not finish by ``deadline`` and an empty dict
+        if it failed without storing a response.
+        """
+        while True:
+            try:
+                raw = await r.get(redis_key)
+            except Exception as e:
+                logger.warning("Idempotency store unavailable", error=str(e))
+                return None
+            if not raw:
+                return {}
+            record = json.loads(raw)
+            if record["state"] == _DONE:
+                return record
+            if asyncio.get_running_loop().time() >= deadline:
+                return None
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+
+def _user_id(authorization: str) -> Optional[str]:
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = decode_token(token.strip())
+    return payload.get("sub") if payload else None
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _replay_body(body: bytes) -> Receive:
+    sent = False
+
+    async def receive() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Nothing more to read; behave like an idle connection until it closes.
+        await asyncio.Event().wait()
+        return {"type": "http.disconnect"}
+
+    return receive
+
+
+async def _send_stored(send: Send, record: dict) -> None:
+    headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in record["headers"]]
+    headers.append((REPLAYED_HEADER.lower().encode(), b"true"))
+    await send({"type": "http.response.start", "status": record["status"], "headers": headers})
+    await send({"type": "http.response.body", "body": base64.b64decode(record["body"])})
+
+
+async def _send_json(send: Send, status: int, payload: dict) -> None:
+    body = json.dumps(payload).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,135 @@
+"""Schema changes that ``create_all`` cannot make to existing tables.
+
+``create_all`` only creates missing tables, so columns, indexes and
+unique constraints added to tables a deployed database already has are
+added here. Every step checks first and is safe to run on each start;
+``init_db`` and the app startup run it right after ``create_all``.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+import structlog
+from sqlalchemy import UniqueConstraint, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
+from sqlmodel import SQLModel
+
+from app.models import models  # noqa: F401
+
+logger = structlog.get_logger()
+
+# table -> column -> column DDL, with a default that fills existing rows
+ADDED_COLUMNS: Dict[str, Dict[str, str]] = {
+    "users": {
+        "rating_deviation": "FLOAT NOT NULL DEFAULT 350.0",
+        "rating_volatility": "FLOAT NOT NULL DEFAULT 0.06",
+    },
+    "club_members": {
+        "rating_deviation_in_club": "FLOAT NOT NULL DEFAULT 350.0",
+        "rating_volatility_in_club": "FLOAT NOT NULL DEFAULT 0.06",
+    },
+    "clubs": {
+        "rating_engine": "VARCHAR NOT NULL DEFAULT 'elo'",
+    },
+    "matches": {
+        "updated_at": "TIMESTAMP",
+    },
+}
+
+# (table, column) -> statement that fills a column just added
+COLUMN_BACKFILLS: Dict[Tuple[str, str], str] = {
+    ("matches", "updated_at"): "UPDATE matches SET updated_at = COALESCE(completed_at, started_at, created_at)",
+}
+
+# (table, column) -> statement run once a NOT NULL column may be empty
+RELAXED_COLUMNS: Dict[Tuple[str, str], str] = {
+    # Every session had the unused default of one court; empty, they keep
+    # opening courts as their matches need them.
+    ("sessions", "number_of_courts"): "UPDATE sessions SET number_of_courts = NULL",
+}
+
+
+def _add_columns(conn: Connection) -> List[str]:
+    inspector = inspect(conn)
+    # Two instances starting together may both see a column missing.
+    guard = "IF NOT EXISTS " if conn.dialect.name == "postgresql" else ""
+    added = []
+    for table, columns in ADDED_COLUMNS.items():
+        if not inspector.has_table(table):
+            continue  # create_all makes it whole
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        for name, ddl in columns.items():
+            if name not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {guard}{name} {ddl}"))
+                if (table, name) in COLUMN_BACKFILLS:
+                    conn.execute(text(COLUMN_BACKFILLS[(table, name)]))
+                added.append(f"{table}.{name}")
+    return added
+
+
+def _relax_columns(conn: Connection) -> List[str]:
+    # Deployed databases are PostgreSQL; SQLite cannot alter a column.
+    if conn.dialect.name != "postgresql":
+        return []
+    inspector = inspect(conn)
+    relaxed = []
+    for (table, name), follow_up in RELAXED_COLUMNS.items():
+        if not inspector.has_table(table):
+            continue
+        column = next((c for c in inspector.get_columns(table) if c["name"] == name), None)
+        if column and not column["nullable"]:
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {name} DROP NOT NULL"))
+            conn.execute(text(follow_up))
+            relaxed.append(f"{table}.{name}")
+    return relaxed
+
+
+def _create_indexes(conn: Connection) -> List[str]:
+    inspector = inspect(conn)
+    created = []
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name not in existing:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+                created.append(index.name)
+    return created
+
+
+def _create_unique_constraints(conn: Connection) -> List[str]:
+    """Add named unique constraints as unique indexes, unless the columns are unique already."""
+    inspector = inspect(conn)
+    created = []
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {tuple(u["column_names"]) for u in inspector.get_unique_constraints(table.name)}
+        existing |= {tuple(ix["column_names"]) for ix in inspector.get_indexes(table.name) if ix["unique"]}
+        for constraint in sorted(table.constraints, key=lambda c: str(c.name)):
+            if not isinstance(constraint, UniqueConstraint) or not constraint.name:
+                continue
+            columns = tuple(column.name for column in constraint.columns)
+            if columns in existing:
+                continue
+            try:
+                with conn.begin_nested():
+                    conn.execute(
+                        text(
+                            f"CREATE UNIQUE INDEX IF NOT EXISTS {constraint.name} "
+                            f"ON {table.name} ({', '.join(columns)})"
+                        )
+                    )
+            except IntegrityError as e:
+                logger.warning("Duplicate rows block a unique constraint", constraint=constraint.name, error=str(e))
+                continue
+            created.append(constraint.name)
+    return created
+
+
+def upgrade_schema(conn: Connection) -> List[str]:
+    """Bring tables made by an older ``create_all`` up to the models; returns what changed."""
+    return _add_columns(conn) + _relax_columns(conn) + _create_indexes(conn) + _create_unique_constraints(conn)
@@ -1,6 +1,11 @@
-from datetime import datetime
+from datetime import date, datetime
 
 
 def utc_now() -> datetime:
     """Return naive UTC datetime for PostgreSQL compatibility."""
     return datetime.utcnow()
+
+
+def month_start(moment: datetime) -> date:
+    """First day of the month ``moment`` falls in."""
+    return moment.date().replace(day=1)
@@ -1,4 +1,7 @@
-from fastapi import FastAPI
+import asyncio
+from typing import List
+
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import structlog
@@ -7,14 +10,24 @@ from app.core.config import get_settings
 from app.api import auth, users, clubs, sessions, matches, registrations, stats, notifications
 from sqlmodel import SQLModel
 from app.models import models  # noqa: F401
-from app.core.database import async_engine
+from app.core.database import AsyncSessionLocal, async_engine, wait_after_commit
+from app.core.idempotency import REPLAYED_HEADER, IdempotencyMiddleware
+from app.core.migrations import upgrade_schema
 from app.core.redis import get_redis, close_redis
+from app.core.security import get_current_user_id
+from app.services.matchmaking_executor import matchmaking_executor
 from app.services.notifications import notification_service
+from app.services.live_state import flush_live_state, run_live_flusher
+from app.services.match_players import backfill_match_players, needs_backfill
+from app.services.score_events import flush_points, run_point_flusher
 from app.websocket.socket_manager import socket_manager
 
 settings = get_settings()
 logger = structlog.get_logger()
 
+# Write-behind loops; each gets a last flush on shutdown.
+flusher_tasks: List[asyncio.Task] = []
+
 base_app = FastAPI(
     title=settings.APP_NAME,
     description="Badminton Club Management API",
@@ -23,12 +36,18 @@ base_app = FastAPI(
     redoc_url="/redoc",
 )
 
+base_app.add_middleware(
+    IdempotencyMiddleware,
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    wait_seconds=settings.IDEMPOTENCY_WAIT_SECONDS,
+)
 base_app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Sync-Token", "X-Total-Count", REPLAYED_HEADER],
 )
 
 
@@ -67,17 +86,45 @@ async def startup_event():
             cfg.SMTP_FROM_EMAIL,
         )
 
+    matchmaking_executor.configure(
+        mode=cfg.MATCHMAKING_EXECUTOR,
+        workers=cfg.MATCHMAKING_WORKERS,
+        deadline_ms=cfg.MATCHMAKING_DEADLINE_MS,
+        min_players=cfg.MATCHMAKING_OFFLOAD_MIN_PLAYERS,
+        grace_ms=cfg.MATCHMAKING_GRACE_MS,
+    )
+
     async with async_engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
+        upgraded = await conn.run_sync(upgrade_schema)
+        if upgraded:
+            logger.info("Upgraded database schema", changes=upgraded)
+        if await conn.run_sync(needs_backfill):
+            added = await conn.run_sync(backfill_match_players)
+            logger.info("Backfilled match players", rows=added)
+
+    flusher_tasks.append(asyncio.create_task(run_point_flusher(AsyncSessionLocal, cfg.SCORE_FLUSH_INTERVAL_SECONDS)))
+    flusher_tasks.append(asyncio.create_task(run_live_flusher(AsyncSessionLocal, cfg.LIVE_FLUSH_INTERVAL_SECONDS)))
 
 
 @base_app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Badminton API")
+    await wait_after_commit()
+    for task in flusher_tasks:
+        task.cancel()
+    await asyncio.gather(*flusher_tasks, return_exceptions=True)
+    flusher_tasks.clear()
+    for flush in (flush_points, flush_live_state):
+        try:
+            await flush(AsyncSessionLocal)
+        except Exception as e:
+            logger.warning("Final flush failed", flush=flush.__name__, error=str(e))
     try:
         await close_redis()
     except Exception:
         pass  # Redis might not be connected
+    matchmaking_executor.shutdown()
     await async_engine.dispose()
 
 
@@ -102,6 +149,11 @@ async def health_check():
     return {"status": "healthy", "redis": redis_status, "database": "connected"}
 
 
+@base_app.get("/metrics/matchmaking")
+async def matchmaking_metrics(user_id: str = Depends(get_current_user_id)):
+    return matchmaking_executor.metrics()
+
+
 base_app.include_router(auth.router, prefix=settings.API_V1_PREFIX, tags=["Authentication"])
 base_app.include_router(users.router, prefix=settings.API_V1_PREFIX, tags=["Users"])
 base_app.include_router(clubs.router, prefix=settings.API_V1_PREFIX, tags=["Clubs"])
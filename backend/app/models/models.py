@@ -1,9 +1,9 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
 from enum import Enum
 import uuid
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import UniqueConstraint, Column, JSON
+from sqlalchemy import UniqueConstraint, Index, Column, JSON
 
 from app.core.utils import utc_now
 
@@ -40,6 +40,12 @@ class MatchStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
+class CourtStatus(str, Enum):
+    AVAILABLE = "available"
+    OCCUPIED = "occupied"
+    CLOSED = "closed"
+
+
 class RegistrationStatus(str, Enum):
     CONFIRMED = "confirmed"
     WAITLISTED = "waitlisted"
@@ -78,6 +84,8 @@ class ClubMember(SQLModel, table=True):
     matches_in_club: int = Field(default=0)
     wins_in_club: int = Field(default=0)
     rating_in_club: float = Field(default=1000.0)
+    rating_deviation_in_club: float = Field(default=350.0)
+    rating_volatility_in_club: float = Field(default=0.06)
     joined_at: datetime = Field(default_factory=now_utc)
 
     __table_args__ = (
@@ -130,6 +138,8 @@ class User(SQLModel, table=True):
     is_verified: bool = Field(default=False)
 
     rating: float = Field(default=1000.0)
+    rating_deviation: float = Field(default=350.0)
+    rating_volatility: float = Field(default=0.06)
     total_matches: int = Field(default=0)
     wins: int = Field(default=0)
     losses: int = Field(default=0)
@@ -179,6 +189,8 @@ class Club(SQLModel, table=True):
     payment_qr_url: Optional[str] = None
     payment_method_note: Optional[str] = None
 
+    rating_engine: str = Field(default="elo")
+
     created_at: datetime = Field(default_factory=now_utc)
     updated_at: datetime = Field(default_factory=now_utc)
 
@@ -201,7 +213,8 @@ class Session(SQLModel, table=True):
     start_time: datetime
     end_time: Optional[datetime] = None
 
-    number_of_courts: int = Field(default=1)
+    # None: courts are opened as matches need them
+    number_of_courts: Optional[int] = None
     max_participants: int = Field(default=20)
     court_cost_per_hour: Optional[float] = None
     total_court_cost: Optional[float] = None
@@ -249,9 +262,122 @@ class Match(SQLModel, table=True):
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=now_utc)
+    updated_at: datetime = Field(default_factory=now_utc, sa_column_kwargs={"onupdate": now_utc})
 
     session: Optional["Session"] = Relationship(back_populates="matches")
 
+    __table_args__ = (
+        Index("ix_matches_status_completed_at", "status", "completed_at"),
+        Index("ix_matches_session_created_id", "session_id", "created_at", "id"),
+        Index("ix_matches_session_updated", "session_id", "updated_at"),
+    )
+
+
+class MatchPlayer(SQLModel, table=True):
+    """One player of a match, for per-player lookups by index.
+
+    ``completed_at`` stays empty until the match is completed.
+    """
+
+    __tablename__ = "match_players"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    match_id: str = Field(foreign_key="matches.id")
+    user_id: str = Field(foreign_key="users.id")
+    team: str  # A, B
+    session_id: str = Field(foreign_key="sessions.id")
+    club_id: str = Field(foreign_key="clubs.id")
+    completed_at: Optional[datetime] = None
+
+    __table_args__ = (
+        UniqueConstraint("match_id", "user_id", name="uq_match_player"),
+        Index("ix_match_players_user_completed", "user_id", "completed_at", "match_id"),
+        Index("ix_match_players_club_user_completed", "club_id", "user_id", "completed_at", "match_id"),
+        Index("ix_match_players_session_user", "session_id", "user_id"),
+    )
+
+
+class RatingChange(SQLModel, table=True):
+    """A player's ratings right after one completed match.
+
+    ``club_rating`` is empty for players outside the match's club.
+    """
+
+    __tablename__ = "rating_changes"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    match_id: str = Field(foreign_key="matches.id")
+    user_id: str = Field(foreign_key="users.id")
+    club_id: str = Field(foreign_key="clubs.id")
+    recorded_at: datetime
+    rating: float
+    club_rating: Optional[float] = None
+
+    __table_args__ = (
+        UniqueConstraint("match_id", "user_id", name="uq_rating_change"),
+        Index("ix_rating_changes_user_recorded", "user_id", "recorded_at", "rating"),
+        Index("ix_rating_changes_club_user_recorded", "club_id", "user_id", "recorded_at", "club_rating"),
+    )
+
+
+class PairStats(SQLModel, table=True):
+    """Completed matches of a player with another as partner or opponent, in one club.
+
+    Every pair is stored both ways round, with ``wins`` counted for ``user_id``.
+    """
+
+    __tablename__ = "pair_stats"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    club_id: str = Field(foreign_key="clubs.id")
+    user_id: str = Field(foreign_key="users.id")
+    other_id: str = Field(foreign_key="users.id")
+    relation: str  # partner, opponent
+    matches: int = Field(default=0)
+    wins: int = Field(default=0)
+
+    __table_args__ = (
+        UniqueConstraint("club_id", "user_id", "other_id", "relation", name="uq_pair_stats"),
+        Index("ix_pair_stats_user_relation_matches", "club_id", "user_id", "relation", "matches", "other_id"),
+        Index("ix_pair_stats_club_relation_matches", "club_id", "relation", "matches", "id"),
+    )
+
+
+class MatchPoint(SQLModel, table=True):
+    """One court-side score tap. Append-only; ``seq`` orders the taps of a match."""
+
+    __tablename__ = "match_points"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    match_id: str = Field(foreign_key="matches.id")
+    seq: int
+    kind: str = Field(default="point")  # point, undo
+    team: Optional[str] = None
+    recorded_by: Optional[str] = Field(foreign_key="users.id", default=None)
+    created_at: datetime = Field(default_factory=now_utc)
+
+    __table_args__ = (
+        UniqueConstraint("match_id", "seq", name="uq_match_point_seq"),
+    )
+
+
+class PlayerMonthlyStats(SQLModel, table=True):
+    """Completed matches of a player in one club and calendar month (UTC)."""
+
+    __tablename__ = "player_monthly_stats"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    club_id: str = Field(foreign_key="clubs.id")
+    user_id: str = Field(foreign_key="users.id")
+    month: date  # first day of the month
+    matches: int = Field(default=0)
+    wins: int = Field(default=0)
+
+    __table_args__ = (
+        UniqueConstraint("club_id", "user_id", "month", name="uq_player_monthly_stats"),
+        Index("ix_player_monthly_stats_user_month", "user_id", "month"),
+    )
+
 
 # ============= ADDITIONAL TABLES =============
 
@@ -288,6 +414,11 @@ class Court(SQLModel, table=True):
     created_at: datetime = Field(default_factory=now_utc)
     closed_at: Optional[datetime] = None
 
+    __table_args__ = (
+        UniqueConstraint("session_id", "court_number", name="uq_session_court"),
+        Index("ix_courts_session_status_number", "session_id", "status", "court_number"),
+    )
+
 
 class PreMatch(SQLModel, table=True):
     __tablename__ = "pre_matches"
@@ -304,3 +435,7 @@ class PreMatch(SQLModel, table=True):
     status: str = Field(default="queued")
     created_at: datetime = Field(default_factory=now_utc)
     activated_at: Optional[datetime] = None
+
+    __table_args__ = (
+        Index("ix_pre_matches_session_status_order", "session_id", "status", "match_order"),
+    )
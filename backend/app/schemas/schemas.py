@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from pydantic import BaseModel, EmailStr, Field, model_validator, field_validator
 from enum import Enum
 
@@ -104,6 +104,7 @@ class ClubUpdate(BaseModel):
     location: Optional[str] = None
     max_members: Optional[int] = Field(None, ge=1, le=1000)
     is_public: Optional[bool] = None
+    rating_engine: Optional[str] = Field(None, pattern=r'^(elo|glicko2)$')
 
 
 class ClubMemberResponse(BaseModel):
@@ -128,6 +129,7 @@ class ClubResponse(ClubBase):
     is_verified: bool = False
     verified_by: Optional[str] = None
     verified_at: Optional[datetime] = None
+    rating_engine: str = "elo"
     created_at: datetime
     member_count: int = 0
     upcoming_sessions_count: int = 0
@@ -152,6 +154,7 @@ class SessionBase(BaseModel):
     start_time: datetime
     end_time: Optional[datetime] = None
     max_participants: int = Field(default=20, ge=1, le=100)
+    number_of_courts: Optional[int] = Field(default=None, ge=1, le=20)
 
     @field_validator("description", "location", mode="before")
     @classmethod
@@ -189,6 +192,7 @@ class SessionUpdate(BaseModel):
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
     max_participants: Optional[int] = Field(None, ge=1, le=100)
+    number_of_courts: Optional[int] = Field(None, ge=1, le=20)
     status: Optional[SessionStatus] = None
 
 
@@ -236,13 +240,24 @@ class MatchBase(BaseModel):
     team_b_player_2_id: Optional[str] = None
 
 
+class MatchConstraintsInput(BaseModel):
+    """Rules for auto-matchmaking; every field is optional"""
+    locked_partners: List[Tuple[str, str]] = Field(default_factory=list)
+    avoid_pairs: List[Tuple[str, str]] = Field(default_factory=list)
+    rating_min: Optional[float] = None
+    rating_max: Optional[float] = None
+    max_rating_spread: Optional[float] = Field(default=None, gt=0)
+
+
 class MatchCreate(BaseModel):
-    """Match creation schema - omit all fields for auto-matchmaking"""
+    """Match creation schema - omit all player fields for auto-matchmaking"""
     court_number: Optional[int] = Field(default=None, ge=1, le=20)
+    match_type: Optional[str] = Field(default=None, pattern=r'^(single|double)$')
     team_a_player_1_id: Optional[str] = None
     team_a_player_2_id: Optional[str] = None
     team_b_player_1_id: Optional[str] = None
     team_b_player_2_id: Optional[str] = None
+    constraints: Optional[MatchConstraintsInput] = None
 
 
 class MatchUpdateScore(BaseModel):
@@ -254,6 +269,39 @@ class MatchUpdateStatus(BaseModel):
     status: MatchStatus
 
 
+class CourtUpdate(BaseModel):
+    auto_matching_enabled: Optional[bool] = None
+    closed: Optional[bool] = None
+
+
+class MatchBulkOperation(BaseModel):
+    match_id: str
+    action: str = Field(..., pattern=r'^(start|complete)$')
+    winner_team: Optional[str] = Field(default=None, pattern=r'^[AB]$')
+
+
+class MatchBulkRequest(BaseModel):
+    operations: List[MatchBulkOperation] = Field(..., min_length=1, max_length=32)
+
+
+class MatchPointCreate(BaseModel):
+    action: str = Field(default="point", pattern=r'^(point|undo)$')
+    team: Optional[str] = Field(default=None, pattern=r'^[AB]$')
+
+
+class SetScore(BaseModel):
+    team_a: int
+    team_b: int
+
+
+class MatchLiveScore(BaseModel):
+    match_id: str
+    seq: int
+    sets: List[SetScore]
+    score: str
+    winner_team: Optional[str]
+
+
 class PlayerSummary(BaseModel):
     id: str
     full_name: str
@@ -271,16 +319,58 @@ class MatchResponse(BaseModel):
     team_b_player_1: PlayerSummary
     team_b_player_2: Optional[PlayerSummary]
     score: Optional[str]
+    set_scores: Optional[dict] = None
     winner_team: Optional[str]
     status: MatchStatus
     started_at: Optional[datetime]
     completed_at: Optional[datetime]
     created_at: datetime
+    updated_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
 
 
+class SessionLiveResponse(BaseModel):
+    session_id: str
+    matches: List[MatchResponse]
+
+
+class CourtResponse(BaseModel):
+    court_number: int
+    status: str
+    auto_matching_enabled: bool
+    closed_at: Optional[datetime]
+    current_match: Optional[MatchResponse] = None
+
+
+class PreMatchResponse(BaseModel):
+    id: int
+    session_id: str
+    match_order: int
+    team_a_player_1: PlayerSummary
+    team_a_player_2: Optional[PlayerSummary]
+    team_b_player_1: PlayerSummary
+    team_b_player_2: Optional[PlayerSummary]
+    status: str
+    created_at: datetime
+
+
+class MatchPreviewCandidate(BaseModel):
+    team_a: List[PlayerSummary]
+    team_b: List[PlayerSummary]
+    balance_gap: float
+    score: float
+    cost: float
+
+
+class MatchPreviewResponse(BaseModel):
+    session_id: str
+    state_version: Optional[int]
+    cached: bool = False
+    candidates: List[MatchPreviewCandidate]
+
+
 # ============= Registration Schemas =============
 class RegistrationCreate(BaseModel):
     pass  # No fields needed, user_id from token
@@ -312,10 +402,40 @@ class PlayerStatsResponse(BaseModel):
     win_rate: float  # percentage
     rating: float
     matches_this_month: int = 0
+    last_played_at: Optional[datetime] = None
     rating_history: List[RatingHistoryPoint] = []
     matches_per_month: List[MatchesPerMonthPoint] = []
 
 
+class LeaderboardEntry(PlayerStatsResponse):
+    rank: int  # 1 is the top of the club
+
+
+class PairRecord(BaseModel):
+    matches: int = 0
+    wins: int = 0
+    losses: int = 0
+    win_rate: float = 0.0  # percentage
+
+
+class PairStatsResponse(PairRecord):
+    relation: str  # partner, opponent
+    player: PlayerSummary
+
+
+class HeadToHeadResponse(BaseModel):
+    user_id: str
+    other_id: str
+    as_partners: PairRecord
+    as_opponents: PairRecord
+
+
+class PairingResponse(PairRecord):
+    relation: str  # partner, opponent
+    player_1: PlayerSummary  # wins are counted for this player
+    player_2: PlayerSummary
+
+
 class ClubStatsResponse(BaseModel):
     club_id: str
     club_name: str
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import after_commit
+from app.core.redis import cache_get, cache_set, get_redis
+from app.models.models import ClubMember
+
+logger = structlog.get_logger()
+
+# The month rollover is only picked up by expiry.
+SNAPSHOT_TTL_SECONDS = 300
+VERSION_TTL_SECONDS = 60 * 60 * 24
+
+
+def _version_key(club_id: str) -> str:
+    return f"club_stats_version:{club_id}"
+
+
+def _snapshot_key(club_id: str, version: int) -> str:
+    return f"club_stats:{club_id}:{version}"
+
+
+async def club_stats_version(club_id: str) -> Optional[int]:
+    """Counter bumped whenever a club's stats change; None without Redis."""
+    try:
+        r = await get_redis()
+        return int(await r.get(_version_key(club_id)) or 0)
+    except Exception as e:
+        logger.warning("Club stats version unavailable", club_id=club_id, error=str(e))
+        return None
+
+
+async def bump_club_stats(club_id: str) -> None:
+    """Retire a club's stats snapshot. Call after the change is committed.
+
+    Snapshots are keyed by version, so one computed from data read before
+    the bump is stored under the old version and never served.
+    """
+    try:
+        r = await get_redis()
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.incr(_version_key(club_id))
+            pipe.expire(_version_key(club_id), VERSION_TTL_SECONDS)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("Failed to bump club stats version", club_id=club_id, error=str(e))
+
+
+async def bump_member_club_stats(db: AsyncSession, user_id: str) -> None:
+    """Retire the snapshots of every club ``user_id`` is in once ``db`` commits.
+
+    Snapshots hold member names and avatars, so profile changes go stale there.
+    """
+    club_ids = (await db.execute(select(ClubMember.club_id).where(ClubMember.user_id == user_id))).scalars().all()
+    for club_id in club_ids:
+        after_commit(db, bump_club_stats, club_id)
+
+
+async def get_club_stats_snapshot(club_id: str, version: Optional[int]) -> Optional[str]:
+    if version is None:
+        return None
+    try:
+        return await cache_get(_snapshot_key(club_id, version))
+    except Exception:
+        return None
+
+
+async def store_club_stats_snapshot(club_id: str, version: Optional[int], body: str) -> None:
+    if version is None:
+        return
+    try:
+        await cache_set(_snapshot_key(club_id, version), body, expire=SNAPSHOT_TTL_SECONDS)
+    except Exception as e:
+        logger.warning("Failed to cache club stats", club_id=club_id, error=str(e))
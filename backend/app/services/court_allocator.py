@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.bulk import insert_ignore
+from app.models.models import Court, CourtStatus, Match, MatchStatus, Session
+
+
+async def _active_matches(db: AsyncSession, session_id: str) -> Dict[int, str]:
+    """Court number -> id of the unfinished match on it."""
+    return dict(
+        (
+            await db.execute(
+                select(Match.court_number, Match.id).where(
+                    Match.session_id == session_id,
+                    Match.status.in_([MatchStatus.SCHEDULED, MatchStatus.ONGOING]),
+                )
+            )
+        ).all()
+    )
+
+
+async def _add_courts(db: AsyncSession, session_id: str, numbers: Iterable[int], active: Dict[int, str]) -> None:
+    """Create the courts that don't exist yet, occupied when a match already plays on them."""
+    stmt = insert_ignore(db.get_bind().dialect.name, Court.__table__, ("session_id", "court_number"))
+    await db.execute(
+        stmt,
+        [
+            {
+                "session_id": session_id,
+                "court_number": number,
+                "status": CourtStatus.OCCUPIED if number in active else CourtStatus.AVAILABLE,
+                "auto_matching_enabled": True,
+                "current_match_id": active.get(number),
+                "created_at": datetime.utcnow(),
+            }
+            for number in numbers
+        ],
+    )
+
+
+async def sync_courts(db: AsyncSession, session: Session) -> List[Court]:
+    """Make a session's court rows match its ``number_of_courts``.
+
+    Missing courts are created, marked occupied when an unfinished match
+    already plays on them. Courts past the count are closed, the ones in use
+    as soon as their match is over, and closed courts within it reopen.
+    Sessions without a count keep the courts their matches opened.
+    """
+    if session.number_of_courts is not None:
+        active = await _active_matches(db, session.id)
+        await _add_courts(db, session.id, range(1, session.number_of_courts + 1), active)
+
+    courts = (
+        await db.execute(
+            select(Court)
+            .where(Court.session_id == session.id)
+            .order_by(Court.court_number)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+    ).scalars().all()
+    if session.number_of_courts is None:
+        return courts
+    for court in courts:
+        in_range = court.court_number <= session.number_of_courts
+        if not in_range and not court.closed_at:
+            court.closed_at = datetime.utcnow()
+            if court.status == CourtStatus.AVAILABLE:
+                court.status = CourtStatus.CLOSED
+        elif in_range and court.closed_at:
+            court.closed_at = None
+            court.status = CourtStatus.OCCUPIED if court.current_match_id else CourtStatus.AVAILABLE
+    return courts
+
+
+async def _has_courts(db: AsyncSession, session_id: str) -> bool:
+    return (await db.execute(select(Court.id).where(Court.session_id == session_id).limit(1))).first() is not None
+
+
+def _free_courts(session_id: str):
+    # Courts locked by another transaction are skipped, so concurrent match
+    # creation never hands out the same court twice.
+    return (
+        select(Court)
+        .where(Court.session_id == session_id, Court.status == CourtStatus.AVAILABLE)
+        .order_by(Court.court_number)
+        .with_for_update(skip_locked=True)
+    )
+
+
+async def claim_courts(
+    db: AsyncSession,
+    session: Session,
+    count: Optional[int],
+    court_number: Optional[int] = None,
+    auto_matching: bool = False,
+) -> List[Court]:
+    """Lock up to ``count`` free courts of a session, lowest numbers first, or all with None.
+
+    Pass ``court_number`` to ask for one court in particular and
+    ``auto_matching`` to keep to courts open for automatic matches. Claimed
+    courts stay free until ``occupy``.
+    """
+    stmt = _free_courts(session.id).limit(count)
+    if court_number is not None:
+        stmt = stmt.where(Court.court_number == court_number)
+    if auto_matching:
+        stmt = stmt.where(Court.auto_matching_enabled.is_(True))
+
+    courts = (await db.execute(stmt)).scalars().all()
+    if not courts and not await _has_courts(db, session.id):
+        # Sessions from before courts were tracked get their rows on first use.
+        await sync_courts(db, session)
+        courts = (await db.execute(stmt)).scalars().all()
+    return list(courts)
+
+
+async def open_court(db: AsyncSession, session: Session, court_number: Optional[int] = None) -> List[Court]:
+    """Open and lock a new court of a session without a court count.
+
+    Such sessions get a court whenever a match needs one: ``court_number``
+    if asked for and not there yet, else the number after the highest in
+    use. Returns nothing when the asked-for court already exists.
+    """
+    for _ in range(3):
+        active = await _active_matches(db, session.id)
+        number = court_number
+        if number is None:
+            highest = (
+                await db.execute(select(func.max(Court.court_number)).where(Court.session_id == session.id))
+            ).scalar()
+            number = max([highest or 0, *(n for n in active if n)]) + 1
+        await _add_courts(db, session.id, [number], active)
+        courts = (
+            await db.execute(_free_courts(session.id).where(Court.court_number == number))
+        ).scalars().all()
+        if courts or court_number is not None:
+            return list(courts)
+        # Another transaction opened the same number first; try the next one.
+    return []
+
+
+def occupy(courts: Iterable[Court], matches: Iterable[Match]) -> None:
+    """Put each match on its claimed court. The matches must be flushed."""
+    for court, match in zip(courts, matches):
+        court.status = CourtStatus.OCCUPIED
+        court.current_match_id = match.id
+        match.court_number = court.court_number
+
+
+async def release_courts(db: AsyncSession, match_ids: Sequence[str]) -> None:
+    """Free the courts of finished matches; closed courts stay closed."""
+    if not match_ids:
+        return
+    await db.execute(
+        update(Court)
+        .where(Court.current_match_id.in_(list(match_ids)))
+        .values(
+            status=case((Court.closed_at.is_(None), CourtStatus.AVAILABLE), else_=CourtStatus.CLOSED),
+            current_match_id=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
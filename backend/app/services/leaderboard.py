@@ -0,0 +1,173 @@
+"""Per-club leaderboards kept in Redis sorted sets.
+
+Members are ranked by club rating, then wins, then matches played, all
+packed into one sorted-set score. Completed matches update the scores of
+their players; a leaderboard that is missing or expired is rebuilt from
+the club members in the database on its next read. Every read returns
+None when Redis is unavailable so callers can rank in SQL instead.
+"""
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.redis import get_redis
+from app.models.models import ClubMember
+
+logger = structlog.get_logger()
+
+# Rebuilt from the database at least this often, so any drift heals itself.
+LEADERBOARD_TTL_SECONDS = 60 * 60 * 24
+
+# Wins and matches take five decimal digits each below the rating in
+# hundredths; ratings up to 9000 keep the score an exact double.
+_COUNT_SPAN = 100_000
+_MAX_RATING_HUNDREDTHS = 900_000
+
+# Sets new scores unless the leaderboard is not built, in which case the
+# next read rebuilds it anyway. A player's matches only ever go up, so a
+# score computed from fewer matches than the stored one arrived late and
+# is dropped.
+# KEYS: scores, matches seen, ready marker. ARGV: user id, matches, score, ...
+_UPDATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 0 then
+  return 0
+end
+for i = 1, #ARGV, 3 do
+  local seen = tonumber(redis.call('HGET', KEYS[2], ARGV[i]) or '-1')
+  if tonumber(ARGV[i + 1]) >= seen then
+    redis.call('ZADD', KEYS[1], ARGV[i + 2], ARGV[i])
+    redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+  end
+end
+return 1
+"""
+
+
+def _scores_key(club_id: str) -> str:
+    return f"leaderboard:{club_id}"
+
+
+def _matches_key(club_id: str) -> str:
+    return f"leaderboard_matches:{club_id}"
+
+
+def _ready_key(club_id: str) -> str:
+    return f"leaderboard_ready:{club_id}"
+
+
+def leaderboard_score(rating: float, wins: int, matches: int) -> int:
+    """Sort key of a member; higher ranks first.
+
+    Ratings count to the hundredth, so members closer than that are
+    ordered by wins and matches.
+    """
+    hundredths = min(max(int(round(rating * 100)), 0), _MAX_RATING_HUNDREDTHS)
+    wins = min(max(wins, 0), _COUNT_SPAN - 1)
+    matches = min(max(matches, 0), _COUNT_SPAN - 1)
+    return (hundredths * _COUNT_SPAN + wins) * _COUNT_SPAN + matches
+
+
+async def rebuild_leaderboard(db: AsyncSession, club_id: str) -> None:
+    """Replace a club's leaderboard with its members' current standing."""
+    rows = (
+        await db.execute(
+            select(
+                ClubMember.user_id,
+                ClubMember.rating_in_club,
+                ClubMember.wins_in_club,
+                ClubMember.matches_in_club,
+            ).where(ClubMember.club_id == club_id)
+        )
+    ).all()
+    r = await get_redis()
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.delete(_scores_key(club_id), _matches_key(club_id))
+        if rows:
+            pipe.zadd(_scores_key(club_id), {row.user_id: leaderboard_score(*row[1:]) for row in rows})
+            pipe.hset(_matches_key(club_id), mapping={row.user_id: row.matches_in_club for row in rows})
+            pipe.expire(_scores_key(club_id), LEADERBOARD_TTL_SECONDS)
+            pipe.expire(_matches_key(club_id), LEADERBOARD_TTL_SECONDS)
+        pipe.set(_ready_key(club_id), 1, ex=LEADERBOARD_TTL_SECONDS)
+        await pipe.execute()
+
+
+async def _read(db: AsyncSession, club_id: str, commands: Callable) -> Optional[list]:
+    """Run read ``commands`` on a club's leaderboard, building it first if needed."""
+    try:
+        r = await get_redis()
+        for _ in range(2):
+            async with r.pipeline(transaction=False) as pipe:
+                pipe.exists(_ready_key(club_id))
+                commands(pipe)
+                ready, *results = await pipe.execute()
+            if ready:
+                return results
+            await rebuild_leaderboard(db, club_id)
+    except Exception as e:
+        logger.warning("Leaderboard unavailable", club_id=club_id, error=str(e))
+        return None
+    # Expired again right after the rebuild; ranking in SQL is fine for once.
+    return None
+
+
+async def leaderboard_range(
+    db: AsyncSession, club_id: str, offset: int, limit: Optional[int]
+) -> Optional[Tuple[List[str], int]]:
+    """User ids ranked ``offset`` onwards, at most ``limit`` of them, and the member count."""
+    stop = offset + limit - 1 if limit is not None else -1
+
+    def commands(pipe) -> None:
+        pipe.zrevrange(_scores_key(club_id), offset, stop)
+        pipe.zcard(_scores_key(club_id))
+
+    results = await _read(db, club_id, commands)
+    if results is None:
+        return None
+    user_ids, total = results
+    return user_ids, total
+
+
+async def leaderboard_rank(db: AsyncSession, club_id: str, user_id: str) -> Optional[Tuple[Optional[int], int]]:
+    """Zero-based rank of a user, None when unranked, and the member count."""
+
+    def commands(pipe) -> None:
+        pipe.zrevrank(_scores_key(club_id), user_id)
+        pipe.zcard(_scores_key(club_id))
+
+    results = await _read(db, club_id, commands)
+    if results is None:
+        return None
+    rank, total = results
+    return rank, total
+
+
+async def update_leaderboard(club_id: str, standings: Dict[str, Tuple[float, int, int]]) -> None:
+    """Set the rating, wins and matches of members. Call after they are committed."""
+    if not standings:
+        return
+    args = []
+    for user_id, (rating, wins, matches) in standings.items():
+        args.extend((user_id, matches, leaderboard_score(rating, wins, matches)))
+    try:
+        r = await get_redis()
+        await r.eval(_UPDATE_SCRIPT, 3, _scores_key(club_id), _matches_key(club_id), _ready_key(club_id), *args)
+    except Exception as e:
+        logger.warning("Failed to update leaderboard", club_id=club_id, error=str(e))
+
+
+async def invalidate_leaderboards(club_id: Optional[str] = None) -> None:
+    """Have one club's leaderboard, or every club's, rebuilt on its next read."""
+    try:
+        r = await get_redis()
+        if club_id:
+            await r.delete(_ready_key(club_id))
+            return
+        keys = [key async for key in r.scan_iter(match=_ready_key("*"))]
+        if keys:
+            await r.delete(*keys)
+    except Exception as e:
+        logger.warning("Failed to invalidate leaderboards", club_id=club_id, error=str(e))
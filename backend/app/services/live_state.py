@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Callable, Dict, Iterable, List, Optional
+
+import structlog
+from sqlalchemy import DateTime, String
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.bulk import bulk_update
+from app.core.redis import get_redis
+from app.models.models import Match, MatchStatus
+from app.schemas.schemas import MatchResponse
+
+logger = structlog.get_logger()
+
+# Live state only matters while a session is running; let stale keys expire.
+LIVE_STATE_TTL_SECONDS = 60 * 60 * 12
+
+_DIRTY_KEY = "live_matches:dirty"
+_READY = "_ready"
+# Fields that change while a match is live; everything else sits in the
+# serialized MatchResponse stored under "match".
+HOT_FIELDS = ("status", "score", "winner_team", "started_at", "updated_at")
+
+# Creates a live match unless it is already live, so unflushed changes are
+# never replaced by older database state, and lists it under its session.
+# KEYS: match, session. ARGV: ttl, match id, field, value, ...
+_PUT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+  end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('SADD', KEYS[2], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return 1
+"""
+
+# Updates fields of a match that is live and returns all of them; returns
+# nothing when it is not. Changes that must reach the database mark the
+# match dirty for the flusher.
+# KEYS: match, dirty set. ARGV: ttl, "1" when dirty, match id, field, value, ...
+_SET_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return {}
+end
+for i = 4, #ARGV, 2 do
+  redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+if ARGV[2] == '1' then
+  redis.call('SADD', KEYS[2], ARGV[3])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return redis.call('HGETALL', KEYS[1])
+"""
+
+
+def _match_key(match_id: str) -> str:
+    return f"live_match:{match_id}"
+
+
+def _session_key(session_id: str) -> str:
+    return f"live_session:{session_id}"
+
+
+def _encode(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value.value if isinstance(value, Enum) else value)
+
+
+def _fields(response: MatchResponse) -> Dict[str, str]:
+    fields = {"match": response.model_dump_json(), "session_id": response.session_id}
+    for name in HOT_FIELDS:
+        fields[name] = _encode(getattr(response, name))
+    return fields
+
+
+def _to_response(raw: Dict[str, str]) -> MatchResponse:
+    data = json.loads(raw["match"])
+    for name in HOT_FIELDS:
+        if name in raw:
+            data[name] = raw[name] or None
+    return MatchResponse.model_validate(data)
+
+
+def _pairs(fields: Dict[str, object]) -> List[str]:
+    return [item for name, value in fields.items() for item in (name, _encode(value))]
+
+
+async def put_live_matches(responses: Iterable[MatchResponse]) -> None:
+    """Make matches live. Call after they are committed."""
+    try:
+        r = await get_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            for response in responses:
+                pipe.eval(
+                    _PUT_SCRIPT,
+                    2,
+                    _match_key(response.id),
+                    _session_key(response.session_id),
+                    LIVE_STATE_TTL_SECONDS,
+                    response.id,
+                    *_pairs(_fields(response)),
+                )
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("Failed to update live state", error=str(e))
+
+
+async def set_live_fields(match_id: str, dirty: bool = False, **fields) -> Optional[MatchResponse]:
+    """Change hot fields of a live match and return it; None when it is not live.
+
+    With ``dirty`` the change is written to the database by the flusher
+    instead of by the caller.
+    """
+    try:
+        r = await get_redis()
+        flat = await r.eval(
+            _SET_SCRIPT,
+            2,
+            _match_key(match_id),
+            _DIRTY_KEY,
+            LIVE_STATE_TTL_SECONDS,
+            "1" if dirty else "0",
+            match_id,
+            *_pairs(fields),
+        )
+    except Exception as e:
+        logger.warning("Failed to update live state", match_id=match_id, error=str(e))
+        return None
+    if not flat:
+        return None
+    return _to_response(dict(zip(flat[::2], flat[1::2])))
+
+
+async def read_live_matches(match_ids: Iterable[str]) -> Dict[str, Dict[str, str]]:
+    """Raw live state of the given matches that are live."""
+    match_ids = list(match_ids)
+    try:
+        r = await get_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            for match_id in match_ids:
+                pipe.hgetall(_match_key(match_id))
+            found = await pipe.execute()
+    except Exception as e:
+        logger.warning("Live state unavailable", error=str(e))
+        return {}
+    return {match_id: raw for match_id, raw in zip(match_ids, found) if raw}
+
+
+async def drop_live_matches(session_id: str, match_ids: Iterable[str]) -> None:
+    """Take finished matches out of the live state. Call after they are committed."""
+    match_ids = list(match_ids)
+    if not match_ids:
+        return
+    try:
+        r = await get_redis()
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.delete(*(_match_key(match_id) for match_id in match_ids))
+            pipe.srem(_session_key(session_id), *match_ids)
+            pipe.srem(_DIRTY_KEY, *match_ids)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("Failed to drop live matches", session_id=session_id, error=str(e))
+
+
+async def load_live_session(session_id: str) -> Optional[List[MatchResponse]]:
+    """Live matches of a session by court; None when the live state has to be rebuilt."""
+    try:
+        r = await get_redis()
+        members = await r.smembers(_session_key(session_id))
+        if _READY not in members:
+            return None
+        match_ids = sorted(members - {_READY})
+        async with r.pipeline(transaction=False) as pipe:
+            for match_id in match_ids:
+                pipe.hgetall(_match_key(match_id))
+            found = await pipe.execute()
+    except Exception as e:
+        logger.warning("Live state unavailable", session_id=session_id, error=str(e))
+        return None
+
+    matches = [_to_response(raw) for raw in found if raw]
+    return sorted(matches, key=lambda m: (m.court_number, m.created_at))
+
+
+async def mark_live_session_ready(session_id: str, responses: List[MatchResponse]) -> None:
+    """Store a session's live matches as loaded from the database."""
+    await put_live_matches(responses)
+    try:
+        r = await get_redis()
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.sadd(_session_key(session_id), _READY)
+            pipe.expire(_session_key(session_id), LIVE_STATE_TTL_SECONDS)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("Failed to cache live state", session_id=session_id, error=str(e))
+
+
+async def flush_live_state(session_factory: Callable[[], AsyncSession]) -> int:
+    """Write the hot fields of every dirty live match to the database.
+
+    One UPDATE covers all dirty matches; matches finished meanwhile are
+    left alone since completion writes their final state itself.
+    """
+    r = await get_redis()
+    match_ids = sorted(await r.smembers(_DIRTY_KEY))
+    if not match_ids:
+        return 0
+    await r.srem(_DIRTY_KEY, *match_ids)
+
+    try:
+        live = await read_live_matches(match_ids)
+        now = datetime.utcnow()
+        rows = [
+            {
+                "id": match_id,
+                "status": raw["status"],
+                "score": raw["score"] or None,
+                "winner_team": raw["winner_team"] or None,
+                "updated_at": now,
+            }
+            for match_id, raw in live.items()
+        ]
+        types = {"id": String, "score": String, "winner_team": String, "updated_at": DateTime}
+        # A live match may move to ongoing here, never back to scheduled.
+        batches = [
+            ({**types, "status": String}, [row for row in rows if row["status"] == MatchStatus.ONGOING]),
+            (types, [row for row in rows if row["status"] != MatchStatus.ONGOING]),
+        ]
+        if rows:
+            table = Match.__table__
+            async with session_factory() as db:
+                dialect = db.get_bind().dialect.name
+                for batch_types, batch in batches:
+                    for stmt, params in bulk_update(
+                        dialect,
+                        table,
+                        "id",
+                        batch_types,
+                        batch,
+                        where=table.c.status.in_([MatchStatus.SCHEDULED, MatchStatus.ONGOING]),
+                    ):
+                        await db.execute(stmt, params)
+                await db.commit()
+    except Exception:
+        await r.sadd(_DIRTY_KEY, *match_ids)
+        raise
+    return len(rows)
+
+
+async def run_live_flusher(session_factory: Callable[[], AsyncSession], interval_seconds: float) -> None:
+    """Flush dirty live matches every ``interval_seconds`` until cancelled."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await flush_live_state(session_factory)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Failed to flush live state", error=str(e))
@@ -0,0 +1,115 @@
+"""The ``match_players`` table: one row per player of every match.
+
+Rows are written when a match is created and stamped when it completes,
+so per-player questions become index range scans instead of ORs over the
+four player columns of ``matches``. Matches from before the table existed
+are copied in by the backfill, which is safe to run again:
+
+    python -m app.services.match_players
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import case, insert, literal, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.bulk import insert_ignore
+from app.models.models import Match, MatchPlayer, MatchStatus, Session
+
+_SLOTS = (
+    ("A", Match.team_a_player_1_id),
+    ("A", Match.team_a_player_2_id),
+    ("B", Match.team_b_player_1_id),
+    ("B", Match.team_b_player_2_id),
+)
+
+
+def match_player_rows(club_id: str, match: Match) -> List[dict]:
+    return [
+        {
+            "match_id": match.id,
+            "user_id": getattr(match, column.key),
+            "team": team,
+            "session_id": match.session_id,
+            "club_id": club_id,
+            "completed_at": match.completed_at,
+        }
+        for team, column in _SLOTS
+        if getattr(match, column.key)
+    ]
+
+
+async def add_match_players(db: AsyncSession, club_id: str, matches: Sequence[Match]) -> None:
+    """Record the players of new matches. The matches must be flushed."""
+    rows = [row for match in matches for row in match_player_rows(club_id, match)]
+    if rows:
+        await db.execute(insert(MatchPlayer.__table__), rows)
+
+
+async def mark_match_players_completed(db: AsyncSession, matches: Sequence[Match]) -> None:
+    """Copy the completion time of matches to their players, clearing it for matches not completed."""
+    by_time: Dict[Optional[datetime], List[str]] = {}
+    for match in matches:
+        completed_at = match.completed_at if match.status == MatchStatus.COMPLETED else None
+        by_time.setdefault(completed_at, []).append(match.id)
+    for completed_at, match_ids in by_time.items():
+        await db.execute(
+            update(MatchPlayer)
+            .where(MatchPlayer.match_id.in_(match_ids))
+            .values(completed_at=completed_at)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def backfill_match_players(conn: Connection) -> int:
+    """Add the missing player rows of existing matches; returns how many were added."""
+    stmt = insert_ignore(conn.dialect.name, MatchPlayer.__table__, ("match_id", "user_id"))
+    added = 0
+    for team, column in _SLOTS:
+        rows = (
+            select(
+                Match.id,
+                column,
+                literal(team),
+                Match.session_id,
+                Session.club_id,
+                case((Match.status == MatchStatus.COMPLETED, Match.completed_at), else_=None),
+            )
+            .join(Session, Session.id == Match.session_id)
+            .where(column.is_not(None))
+        )
+        result = conn.execute(
+            stmt.from_select(["match_id", "user_id", "team", "session_id", "club_id", "completed_at"], rows)
+        )
+        added += max(result.rowcount, 0)
+    return added
+
+
+def needs_backfill(conn: Connection) -> bool:
+    """Whether there are matches but no player rows yet, as right after the table is created."""
+    has_rows = conn.execute(select(MatchPlayer.id).limit(1)).first() is not None
+    return not has_rows and conn.execute(select(Match.id).limit(1)).first() is not None
+
+
+def run_backfill(engine: Engine) -> int:
+    with engine.begin() as conn:
+        return backfill_match_players(conn)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fill match_players from existing matches.")
+    parser.parse_args(argv)
+
+    from app.core.database import sync_engine
+
+    print(f"added {run_backfill(sync_engine)} match player rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Optional
+
+import structlog
+
+from app.core.redis import cache_get, cache_set, get_redis
+
+logger = structlog.get_logger()
+
+# Rest times keep moving, so even an unchanged session is re-planned now and then.
+PREVIEW_TTL_SECONDS = 30
+STATE_VERSION_TTL_SECONDS = 60 * 60 * 12
+
+
+def _version_key(session_id: str) -> str:
+    return f"session_state_version:{session_id}"
+
+
+def _preview_key(session_id: str, version: int, params: dict) -> str:
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+    return f"match_preview:{session_id}:{version}:{digest}"
+
+
+async def session_state_version(session_id: str) -> Optional[int]:
+    """Counter bumped whenever a session's registrations or matches change; None without Redis."""
+    try:
+        r = await get_redis()
+        return int(await r.get(_version_key(session_id)) or 0)
+    except Exception as e:
+        logger.warning("Session state version unavailable", session_id=session_id, error=str(e))
+        return None
+
+
+async def bump_session_state(session_id: str) -> None:
+    """Mark a session's matchmaking inputs as changed. Pass it to ``after_commit``.
+
+    Previews read the version before the database, so one computed from
+    rows read before the commit is stored under the old version.
+    """
+    try:
+        r = await get_redis()
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.incr(_version_key(session_id))
+            pipe.expire(_version_key(session_id), STATE_VERSION_TTL_SECONDS)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("Failed to bump session state version", session_id=session_id, error=str(e))
+
+
+async def get_cached_preview(session_id: str, version: Optional[int], params: dict) -> Optional[str]:
+    if version is None:
+        return None
+    try:
+        return await cache_get(_preview_key(session_id, version, params))
+    except Exception:
+        return None
+
+
+async def cache_preview(session_id: str, version: Optional[int], params: dict, body: str) -> None:
+    if version is None:
+        return
+    try:
+        await cache_set(_preview_key(session_id, version, params), body, expire=PREVIEW_TTL_SECONDS)
+    except Exception as e:
+        logger.warning("Failed to cache match preview", session_id=session_id, error=str(e))
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Float, Integer, String, case, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.bulk import bulk_update, insert_increment
+from app.core.utils import month_start
+from app.models.models import Club, ClubMember, Match, MatchStatus, PlayerMonthlyStats, RatingChange, User
+from app.services.rating import RatingTable, apply_matches, get_rating_engine
+from app.services.rating_history import rating_change_rows
+
+
+def match_slots(match: Match) -> List[Optional[str]]:
+    """Player ids in rating slot order: A1, A2, B1, B2."""
+    return [
+        match.team_a_player_1_id,
+        match.team_a_player_2_id,
+        match.team_b_player_1_id,
+        match.team_b_player_2_id,
+    ]
+
+
+def monthly_counts(matches: Sequence[Match]) -> Dict[Tuple[str, date], List[int]]:
+    """Matches and wins per player and month of completion.
+
+    Matches without a winner are left out, as the replay leaves them out.
+    """
+    counts: Dict[Tuple[str, date], List[int]] = {}
+    for m in matches:
+        if not m.completed_at or m.winner_team not in ("A", "B"):
+            continue
+        slots = match_slots(m)
+        winners = slots[:2] if m.winner_team == "A" else slots[2:]
+        month = month_start(m.completed_at)
+        for uid in slots:
+            if uid:
+                count = counts.setdefault((uid, month), [0, 0])
+                count[0] += 1
+                count[1] += 1 if uid in winners else 0
+    return counts
+
+
+def _slot_indices(matches: Sequence[Match], index: Dict[str, int]) -> np.ndarray:
+    return np.array(
+        [[index.get(uid, -1) if uid else -1 for uid in match_slots(m)] for m in matches],
+        dtype=np.int64,
+    ).reshape(-1, 4)
+
+
+async def complete_matches(db: AsyncSession, winners: Dict[str, str], completed_at: datetime) -> List[Match]:
+    """Move matches to completed with their winners, skipping ones that already are.
+
+    The status change is a single conditional UPDATE, so when two requests
+    complete the same match only one of them gets it back and applies
+    its result. Returns the matches this call completed.
+    """
+    if not winners:
+        return []
+
+    claimed = (
+        await db.execute(
+            update(Match)
+            .where(Match.id.in_(list(winners)), Match.status != MatchStatus.COMPLETED)
+            .values(
+                status=MatchStatus.COMPLETED,
+                winner_team=case(winners, value=Match.id),
+                started_at=func.coalesce(Match.started_at, completed_at),
+                completed_at=completed_at,
+                updated_at=completed_at,
+            )
+            .returning(Match.id)
+            .execution_options(synchronize_session=False)
+        )
+    ).scalars().all()
+    if not claimed:
+        return []
+
+    return (
+        await db.execute(
+            select(Match).where(Match.id.in_(claimed)).execution_options(populate_existing=True)
+        )
+    ).scalars().all()
+
+
+async def apply_match_results(
+    db: AsyncSession, club_id: str, matches: Sequence[Match]
+) -> Dict[str, Tuple[float, int, int]]:
+    """Apply win/loss counts and rating changes of newly completed matches.
+
+    Every match must already carry its ``winner_team``. Global ratings and
+    club ratings are both computed by the club's rating engine, all matches
+    of the call in one vectorized pass. Counters are incremented in SQL and
+    the rating rows are locked while they are recomputed, so concurrent
+    completions never overwrite each other. Every player's new ratings
+    are also added to their rating history.
+
+    Returns the new club rating, wins and matches of every player who is a
+    club member, by user id.
+    """
+    if not matches:
+        return {}
+
+    engine_name = (await db.execute(select(Club.rating_engine).where(Club.id == club_id))).scalar_one_or_none()
+    engine = get_rating_engine(engine_name)
+    dialect = db.get_bind().dialect.name
+
+    player_ids = sorted({uid for m in matches for uid in match_slots(m) if uid})
+    a_won = np.array([m.winner_team == "A" for m in matches], dtype=bool)
+
+    wins: Dict[str, int] = dict.fromkeys(player_ids, 0)
+    played: Dict[str, int] = dict.fromkeys(player_ids, 0)
+    for m in matches:
+        slots = match_slots(m)
+        winners = slots[:2] if m.winner_team == "A" else slots[2:]
+        for uid in slots:
+            if uid:
+                played[uid] += 1
+                wins[uid] += 1 if uid in winners else 0
+
+    # Rows are locked in id order so concurrent completions cannot deadlock.
+    users = (
+        await db.execute(
+            select(User.id, User.rating, User.rating_deviation, User.rating_volatility)
+            .where(User.id.in_(player_ids))
+            .order_by(User.id)
+            .with_for_update()
+        )
+    ).all()
+    user_index = {row.id: i for i, row in enumerate(users)}
+    user_table = RatingTable.from_rows([tuple(row[1:]) for row in users])
+    _, user_after = apply_matches(engine, user_table, _slot_indices(matches, user_index), a_won)
+
+    for stmt, params in bulk_update(
+        dialect,
+        User.__table__,
+        "id",
+        {
+            "id": String,
+            "rating": Float,
+            "rating_deviation": Float,
+            "rating_volatility": Float,
+            "wins": Integer,
+            "losses": Integer,
+            "total_matches": Integer,
+        },
+        [
+            {
+                "id": row.id,
+                "rating": float(user_table.rating[i]),
+                "rating_deviation": float(user_table.deviation[i]),
+                "rating_volatility": float(user_table.volatility[i]),
+                "wins": wins[row.id],
+                "losses": played[row.id] - wins[row.id],
+                "total_matches": played[row.id],
+            }
+            for i, row in enumerate(users)
+        ],
+        increment=("wins", "losses", "total_matches"),
+    ):
+        await db.execute(stmt, params)
+
+    members = (
+        await db.execute(
+            select(
+                ClubMember.id,
+                ClubMember.user_id,
+                ClubMember.rating_in_club,
+                ClubMember.rating_deviation_in_club,
+                ClubMember.rating_volatility_in_club,
+                ClubMember.wins_in_club,
+                ClubMember.matches_in_club,
+            )
+            .where(ClubMember.club_id == club_id, ClubMember.user_id.in_(player_ids))
+            .order_by(ClubMember.id)
+            .with_for_update()
+        )
+    ).all()
+    member_index = {row.user_id: i for i, row in enumerate(members)}
+    member_table = RatingTable.from_rows([tuple(row[2:5]) for row in members])
+    _, member_after = apply_matches(engine, member_table, _slot_indices(matches, member_index), a_won)
+
+    for stmt, params in bulk_update(
+        dialect,
+        ClubMember.__table__,
+        "id",
+        {
+            "id": Integer,
+            "rating_in_club": Float,
+            "rating_deviation_in_club": Float,
+            "rating_volatility_in_club": Float,
+            "matches_in_club": Integer,
+            "wins_in_club": Integer,
+        },
+        [
+            {
+                "id": row.id,
+                "rating_in_club": float(member_table.rating[i]),
+                "rating_deviation_in_club": float(member_table.deviation[i]),
+                "rating_volatility_in_club": float(member_table.volatility[i]),
+                "matches_in_club": played[row.user_id],
+                "wins_in_club": wins[row.user_id],
+            }
+            for i, row in enumerate(members)
+        ],
+        increment=("matches_in_club", "wins_in_club"),
+    ):
+        await db.execute(stmt, params)
+
+    history = [
+        row
+        for i, m in enumerate(matches)
+        for row in rating_change_rows(m.id, club_id, m.completed_at, match_slots(m), user_after[i], member_after[i])
+    ]
+    if history:
+        await db.execute(insert(RatingChange.__table__), history)
+
+    return {
+        row.user_id: (
+            float(member_table.rating[i]),
+            row.wins_in_club + wins[row.user_id],
+            row.matches_in_club + played[row.user_id],
+        )
+        for i, row in enumerate(members)
+    }
+
+
+async def record_monthly_stats(db: AsyncSession, club_id: str, matches: Sequence[Match]) -> None:
+    """Add newly completed matches to their players' monthly rollups."""
+    counts = monthly_counts(matches)
+    if not counts:
+        return
+    stmt = insert_increment(
+        db.get_bind().dialect.name,
+        PlayerMonthlyStats.__table__,
+        ("club_id", "user_id", "month"),
+        ("matches", "wins"),
+    )
+    # Rows go in key order so concurrent completions lock them in the same order.
+    await db.execute(
+        stmt,
+        [
+            {"club_id": club_id, "user_id": uid, "month": month, "matches": played, "wins": won}
+            for (uid, month), (played, won) in sorted(counts.items())
+        ],
+    )
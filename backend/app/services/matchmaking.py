@@ -5,6 +5,15 @@ from datetime import datetime
 from itertools import combinations
 from typing import Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
+
+# Pool size from which select_fair_players switches to the NumPy scorer.
+VECTORIZED_POOL_THRESHOLD = 64
+
+# Team score cost of each earlier game together, relative to rating points.
+PARTNER_REPEAT_WEIGHT = 200.0
+OPPONENT_REPEAT_WEIGHT = 50.0
+
 
 @dataclass
 class CandidatePlayer:
@@ -34,58 +43,174 @@ def _pair_key(a: str, b: str) -> Tuple[str, str]:
     return tuple(sorted((a, b)))
 
 
+class PairHistory:
+    """Partner and opponent counts between a session's players.
+
+    Players are mapped to dense indices and counts live in two symmetric
+    ``uint16`` matrices, so a 300-player session needs ~350 KB and every
+    lookup is a single array read. Players outside the index count as 0.
+    """
+
+    def __init__(self, player_ids: Iterable[str]):
+        self.index: Dict[str, int] = {uid: i for i, uid in enumerate(dict.fromkeys(player_ids))}
+        size = len(self.index)
+        self.partners = np.zeros((size, size), dtype=np.uint16)
+        self.opponents = np.zeros((size, size), dtype=np.uint16)
+
+    @classmethod
+    def from_counts(
+        cls,
+        player_ids: Iterable[str],
+        partner_counts: Optional[Dict[Tuple[str, str], int]] = None,
+        opponent_counts: Optional[Dict[Tuple[str, str], int]] = None,
+    ) -> "PairHistory":
+        history = cls(player_ids)
+        for (a, b), count in (partner_counts or {}).items():
+            history._add(history.partners, a, b, count)
+        for (a, b), count in (opponent_counts or {}).items():
+            history._add(history.opponents, a, b, count)
+        return history
+
+    def _add(self, matrix: np.ndarray, a: str, b: str, count: int) -> None:
+        i, j = self.index.get(a), self.index.get(b)
+        if i is None or j is None:
+            return
+        matrix[i, j] += count
+        matrix[j, i] = matrix[i, j]
+
+    def add_match(self, team_a: Tuple[str, ...], team_b: Tuple[str, ...]) -> None:
+        for team in (team_a, team_b):
+            if len(team) == 2:
+                self._add(self.partners, team[0], team[1], 1)
+        for a in team_a:
+            for b in team_b:
+                self._add(self.opponents, a, b, 1)
+
+    def _get(self, matrix: np.ndarray, a: str, b: str) -> int:
+        i, j = self.index.get(a), self.index.get(b)
+        if i is None or j is None:
+            return 0
+        return int(matrix[i, j])
+
+    def partner_count(self, a: str, b: str) -> int:
+        return self._get(self.partners, a, b)
+
+    def opponent_count(self, a: str, b: str) -> int:
+        return self._get(self.opponents, a, b)
+
+    def counts_for(self, player_ids: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Partner and opponent count matrices restricted to ``player_ids``, in that order."""
+        idx = np.array([self.index.get(uid, -1) for uid in player_ids], dtype=np.int64)
+        known = idx >= 0
+        safe = np.where(known, idx, 0)
+        mask = known[:, None] & known[None, :]
+        partners = np.where(mask, self.partners[np.ix_(safe, safe)], 0).astype(np.int64)
+        opponents = np.where(mask, self.opponents[np.ix_(safe, safe)], 0).astype(np.int64)
+        return partners, opponents
+
+
+def _as_pair_history(
+    players: List[CandidatePlayer],
+    partner_history: Optional[Dict[Tuple[str, str], int]],
+    history: Optional[PairHistory],
+) -> PairHistory:
+    if history is not None:
+        return history
+    return PairHistory.from_counts([p.user_id for p in players], partner_history)
+
+
+def _priority_scores_py(
+    match_counts: List[float],
+    rests: List[float],
+    ratings: List[float],
+) -> List[float]:
+    min_m, max_m = min(match_counts), max(match_counts)
+    min_r, max_r = min(rests), max(rests)
+    min_rt, max_rt = min(ratings), max(ratings)
+
+    scores = []
+    for matches_played, rest, rating in zip(match_counts, rests, ratings):
+        match_score = 1.0 - _normalize(matches_played, min_m, max_m)
+        rest_score = _normalize(rest, min_r, max_r)
+        rating_score = 1.0 - _normalize(rating, min_rt, max_rt)
+        scores.append((0.6 * match_score) + (0.3 * rest_score) + (0.1 * rating_score))
+    return scores
+
+
+def _normalize_column(values: np.ndarray) -> np.ndarray:
+    low, high = values.min(), values.max()
+    if high <= low:
+        return np.full(values.shape, 0.5)
+    return (values - low) / (high - low)
+
+
+def _priority_scores_np(
+    match_counts: List[float],
+    rests: List[float],
+    ratings: List[float],
+) -> np.ndarray:
+    match_score = 1.0 - _normalize_column(np.asarray(match_counts, dtype=np.float64))
+    rest_score = _normalize_column(np.asarray(rests, dtype=np.float64))
+    rating_score = 1.0 - _normalize_column(np.asarray(ratings, dtype=np.float64))
+    return (0.6 * match_score) + (0.3 * rest_score) + (0.1 * rating_score)
+
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k best scores, ordered like a stable descending sort."""
+    n = scores.shape[0]
+    if k < n:
+        part = np.argpartition(-scores, k - 1)[:k]
+        threshold = scores[part].min()
+        # argpartition picks arbitrarily among ties at the cut; keep the
+        # earliest ones so the result matches sorted(..., reverse=True).
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[: k - above.shape[0]]
+        idx = np.concatenate([above, ties])
+    else:
+        idx = np.arange(n)
+    return idx[np.lexsort((idx, -scores[idx]))]
+
+
 def select_fair_players(
     players: Iterable[CandidatePlayer],
     target_count: int = 4,
     now: Optional[datetime] = None,
+    vectorized: Optional[bool] = None,
 ) -> List[CandidatePlayer]:
     """Pick players with fair priority:
     - fewer matches played first
     - longer rest first
     - lower rating slight priority (to avoid starvation)
+
+    Pools of ``VECTORIZED_POOL_THRESHOLD`` players or more are scored with
+    NumPy and partial selection; ``vectorized`` forces either path. Both
+    paths return the same players in the same order.
     """
     now = now or datetime.utcnow()
     pool = list(players)
     if len(pool) < target_count:
         raise MatchmakingError(f"Not enough players for matchmaking. Need {target_count}, got {len(pool)}")
 
-    match_counts = [p.matches_played for p in pool]
+    match_counts = [float(p.matches_played) for p in pool]
     rests = [_minutes_since(p.last_played_at, now) for p in pool]
-    ratings = [p.rating for p in pool]
+    ratings = [float(p.rating) for p in pool]
 
-    min_m, max_m = min(match_counts), max(match_counts)
-    min_r, max_r = min(rests), max(rests)
-    min_rt, max_rt = min(ratings), max(ratings)
+    if vectorized is None:
+        vectorized = len(pool) >= VECTORIZED_POOL_THRESHOLD
 
-    def priority(p: CandidatePlayer) -> float:
-        match_score = 1.0 - _normalize(float(p.matches_played), float(min_m), float(max_m))
-        rest_score = _normalize(_minutes_since(p.last_played_at, now), min_r, max_r)
-        rating_score = 1.0 - _normalize(float(p.rating), float(min_rt), float(max_rt))
-        return (0.6 * match_score) + (0.3 * rest_score) + (0.1 * rating_score)
+    if vectorized:
+        scores = _priority_scores_np(match_counts, rests, ratings)
+        return [pool[i] for i in _top_k_indices(scores, target_count)]
 
-    ranked = sorted(pool, key=priority, reverse=True)
-    return ranked[:target_count]
+    scores = _priority_scores_py(match_counts, rests, ratings)
+    ranked = sorted(range(len(pool)), key=lambda i: scores[i], reverse=True)
+    return [pool[i] for i in ranked[:target_count]]
 
 
-def create_balanced_teams(
+def _best_split(
     selected_players: List[CandidatePlayer],
-    partner_history: Optional[Dict[Tuple[str, str], int]] = None,
-) -> Dict[str, object]:
-    """Create two balanced teams while minimizing repeated partners.
-
-    selected_players should normally be 4 players.
-    Returns:
-      {
-        "team_a": (user_id_1, user_id_2),
-        "team_b": (user_id_3, user_id_4),
-        "balance_gap": float,
-      }
-    """
-    if len(selected_players) != 4:
-        raise MatchmakingError("Balanced doubles requires exactly 4 players")
-
-    partner_history = partner_history or {}
-
+    history: PairHistory,
+) -> Optional[Dict[str, object]]:
     best = None
     ids = [p.user_id for p in selected_players]
     player_by_id = {p.user_id: p for p in selected_players}
@@ -103,13 +228,15 @@ def create_balanced_teams(
         rating_b = sum(player_by_id[x].rating for x in team_b)
         balance_gap = abs(rating_a - rating_b)
 
-        repeated_partners_penalty = (
-            partner_history.get(_pair_key(team_a[0], team_a[1]), 0)
-            + partner_history.get(_pair_key(team_b[0], team_b[1]), 0)
-        )
+        repeated_partners_penalty = history.partner_count(*team_a) + history.partner_count(*team_b)
+        repeated_opponents_penalty = sum(history.opponent_count(a, b) for a in team_a for b in team_b)
 
-        # main objective: avoid repeating partners, secondary: rating balance
-        score = (repeated_partners_penalty * 200.0) + balance_gap
+        # main objective: avoid repeating partners, then opponents, then rating balance
+        score = (
+            (repeated_partners_penalty * PARTNER_REPEAT_WEIGHT)
+            + (repeated_opponents_penalty * OPPONENT_REPEAT_WEIGHT)
+            + balance_gap
+        )
 
         candidate = {
             "team_a": team_a,
@@ -120,6 +247,29 @@ def create_balanced_teams(
         if best is None or candidate["score"] < best["score"]:
             best = candidate
 
+    return best
+
+
+def create_balanced_teams(
+    selected_players: List[CandidatePlayer],
+    partner_history: Optional[Dict[Tuple[str, str], int]] = None,
+    history: Optional[PairHistory] = None,
+) -> Dict[str, object]:
+    """Create two balanced teams while minimizing repeated partners and opponents.
+
+    selected_players should normally be 4 players. ``history`` takes
+    precedence over the partner-only ``partner_history`` mapping.
+    Returns:
+      {
+        "team_a": (user_id_1, user_id_2),
+        "team_b": (user_id_3, user_id_4),
+        "balance_gap": float,
+      }
+    """
+    if len(selected_players) != 4:
+        raise MatchmakingError("Balanced doubles requires exactly 4 players")
+
+    best = _best_split(selected_players, _as_pair_history(selected_players, partner_history, history))
     if best is None:
         raise MatchmakingError("Unable to build teams")
 
@@ -134,6 +284,82 @@ def generate_fair_doubles_match(
     players: Iterable[CandidatePlayer],
     partner_history: Optional[Dict[Tuple[str, str], int]] = None,
     now: Optional[datetime] = None,
+    history: Optional[PairHistory] = None,
 ) -> Dict[str, object]:
     selected = select_fair_players(players, target_count=4, now=now)
-    return create_balanced_teams(selected, partner_history=partner_history)
+    return create_balanced_teams(selected, partner_history=partner_history, history=history)
+
+
+def _assign_round_groups(
+    selected: List[CandidatePlayer],
+    history: PairHistory,
+    max_passes: int,
+) -> List[Tuple[List[CandidatePlayer], Dict[str, object]]]:
+    # Start from skill bands (rating-sorted chunks of 4), then improve the
+    # whole round with pairwise player swaps between courts.
+    ordered = sorted(selected, key=lambda p: (-p.rating, p.user_id))
+    groups = [ordered[i:i + 4] for i in range(0, len(ordered), 4)]
+    splits = [_best_split(g, history) for g in groups]
+
+    for _ in range(max_passes):
+        improved = False
+        for gi, gj in combinations(range(len(groups)), 2):
+            for i in range(4):
+                for j in range(4):
+                    group_i = list(groups[gi])
+                    group_j = list(groups[gj])
+                    group_i[i], group_j[j] = group_j[j], group_i[i]
+                    split_i = _best_split(group_i, history)
+                    split_j = _best_split(group_j, history)
+                    current = splits[gi]["score"] + splits[gj]["score"]
+                    if split_i["score"] + split_j["score"] < current - 1e-9:
+                        groups[gi], groups[gj] = group_i, group_j
+                        splits[gi], splits[gj] = split_i, split_j
+                        improved = True
+        if not improved:
+            break
+
+    return list(zip(groups, splits))
+
+
+def generate_fair_doubles_round(
+    players: Iterable[CandidatePlayer],
+    court_count: int,
+    partner_history: Optional[Dict[Tuple[str, str], int]] = None,
+    now: Optional[datetime] = None,
+    max_passes: int = 10,
+    history: Optional[PairHistory] = None,
+) -> List[Dict[str, object]]:
+    """Build one doubles match per free court from disjoint foursomes.
+
+    The 4 * courts fairest players are picked for the whole round at once,
+    then split into courts so that the summed team score (repeated partners,
+    repeated opponents and rating gap) across the round is minimized, instead of filling
+    courts greedily one at a time.
+
+    Returns a list of ``generate_fair_doubles_match``-shaped dicts, most
+    balanced court first. Fewer matches than ``court_count`` are returned
+    when the pool cannot fill every court.
+    """
+    pool = list(players)
+    if court_count < 1:
+        raise MatchmakingError("At least one court is required")
+
+    courts = min(court_count, len(pool) // 4)
+    if courts < 1:
+        raise MatchmakingError(f"Not enough players for matchmaking. Need 4, got {len(pool)}")
+
+    selected = select_fair_players(pool, target_count=courts * 4, now=now)
+    history = _as_pair_history(selected, partner_history, history)
+    assigned = _assign_round_groups(selected, history, max_passes=max_passes)
+
+    round_matches = [
+        {
+            "team_a": split["team_a"],
+            "team_b": split["team_b"],
+            "balance_gap": split["balance_gap"],
+        }
+        for _, split in assigned
+    ]
+    round_matches.sort(key=lambda m: (m["balance_gap"], m["team_a"]))
+    return round_matches
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+import numpy as np
+import structlog
+
+from app.services.matchmaking import MatchmakingError
+
+logger = structlog.get_logger()
+
+EXECUTOR_INLINE = "inline"
+EXECUTOR_PROCESS = "process"
+
+# Recent latencies kept per search kind for the percentiles in the metrics.
+LATENCY_WINDOW = 1024
+
+
+def _noop() -> None:
+    return None
+
+
+class _SearchMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.offloaded = 0
+        self.fallbacks = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.latency_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latency: Dict[str, float] = {}
+        if self.latency_ms:
+            arr = np.asarray(self.latency_ms, dtype=np.float64)
+            latency = {f"p{p}": round(float(np.percentile(arr, p)), 3) for p in (50, 95, 99)}
+            latency["max"] = round(float(arr.max()), 3)
+        return {
+            "calls": self.calls,
+            "offloaded": self.offloaded,
+            "fallbacks": self.fallbacks,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "latency_ms": latency,
+        }
+
+
+class MatchmakingExecutor:
+    """Runs matchmaking searches inline or in a process pool with a deadline.
+
+    In process mode, searches over at least ``min_players`` candidates are
+    sent to worker processes so they don't block the event loop. If a
+    search misses the deadline or the pool fails, the cheaper fallback
+    search runs in a thread instead. A worker still busy with a late search
+    cannot be cancelled, so if it is still running ``grace_ms`` later the
+    pool is replaced. The old workers are stopped one deadline after that,
+    so searches they were running for other callers still finish.
+    """
+
+    def __init__(self):
+        self.mode = EXECUTOR_INLINE
+        self.workers = 2
+        self.deadline_ms = 250
+        self.min_players = 24
+        self.grace_ms = 1000
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._watchers: Set[asyncio.Task] = set()
+        self._metrics: Dict[str, _SearchMetrics] = {}
+
+    def configure(
+        self, mode: str, workers: int, deadline_ms: int, min_players: int, grace_ms: int = 1000
+    ) -> None:
+        if mode not in (EXECUTOR_INLINE, EXECUTOR_PROCESS):
+            raise ValueError(f"Unknown matchmaking executor: {mode}")
+        self.shutdown()
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.deadline_ms = deadline_ms
+        self.min_players = min_players
+        self.grace_ms = grace_ms
+        if mode == EXECUTOR_PROCESS:
+            self._start_pool()
+
+    def _start_pool(self) -> None:
+        # Workers are spawned, not forked, so they don't inherit the event loop or open connections.
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        # Start the workers now rather than on the first request's deadline.
+        for _ in range(self.workers):
+            self._pool.submit(_noop)
+
+    def shutdown(self) -> None:
+        for task in list(self._watchers):
+            task.cancel()
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _replace_pool(self, pool: ProcessPoolExecutor) -> Optional[List[BaseProcess]]:
+        """Start a fresh pool in place of ``pool`` and return its workers, unless that was done already."""
+        if self._pool is not pool:
+            return None
+        # shutdown() drops the pool's handles on its workers, so take them first.
+        workers = list((getattr(pool, "_processes", None) or {}).values())
+        self._pool = None
+        self._start_pool()
+        # Searches already queued on the old pool keep running there.
+        pool.shutdown(wait=False)
+        return workers
+
+    @staticmethod
+    def _stop_workers(workers: List[BaseProcess]) -> None:
+        # Searches still running on these workers fail and fall back.
+        for process in workers:
+            process.terminate()
+
+    async def _replace_if_stuck(self, pool: ProcessPoolExecutor, late: Future) -> None:
+        await asyncio.sleep(self.grace_ms / 1000.0)
+        if late.done():
+            return
+        workers = self._replace_pool(pool)
+        if workers is None:
+            return
+        logger.warning("Matchmaking worker still busy after the grace period, replacing pool")
+        # Every other search on the old pool is finished or past its deadline by then.
+        await asyncio.sleep(self.deadline_ms / 1000.0)
+        self._stop_workers(workers)
+
+    def _watch(self, pool: ProcessPoolExecutor, late: Future) -> None:
+        task = asyncio.get_running_loop().create_task(self._replace_if_stuck(pool, late))
+        self._watchers.add(task)
+        task.add_done_callback(self._watchers.discard)
+
+    def _stats(self, kind: str) -> _SearchMetrics:
+        if kind not in self._metrics:
+            self._metrics[kind] = _SearchMetrics()
+        return self._metrics[kind]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers if self.mode == EXECUTOR_PROCESS else 0,
+            "deadline_ms": self.deadline_ms,
+            "min_players": self.min_players,
+            "searches": {kind: m.snapshot() for kind, m in self._metrics.items()},
+        }
+
+    async def run(
+        self,
+        kind: str,
+        search: Callable[..., Any],
+        fallback: Callable[..., Any],
+        pool_size: int,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        """Run ``search(*args, **kwargs)``, or ``fallback`` with the same arguments if it takes too long.
+
+        Both callables must be module-level functions so they can be sent to
+        a worker. ``MatchmakingError`` from the search is raised as is.
+        """
+        stats = self._stats(kind)
+        stats.calls += 1
+        began = time.perf_counter()
+        try:
+            if self.mode != EXECUTOR_PROCESS or self._pool is None or pool_size < self.min_players:
+                return search(*args, **kwargs)
+
+            stats.offloaded += 1
+            pool = self._pool
+            try:
+                future = pool.submit(partial(search, *args, **kwargs))
+                return await asyncio.wait_for(
+                    asyncio.wrap_future(future), timeout=self.deadline_ms / 1000.0
+                )
+            except MatchmakingError:
+                raise
+            except asyncio.TimeoutError:
+                stats.timeouts += 1
+                logger.warning("Matchmaking search missed its deadline", kind=kind)
+                self._watch(pool, future)
+            except BrokenProcessPool as e:
+                stats.errors += 1
+                logger.warning("Matchmaking pool broken, restarting", kind=kind, error=str(e))
+                workers = self._replace_pool(pool)
+                if workers is not None:
+                    self._stop_workers(workers)
+            except Exception as e:
+                stats.errors += 1
+                logger.warning("Matchmaking search failed in worker", kind=kind, error=str(e))
+
+            stats.fallbacks += 1
+            return await asyncio.to_thread(fallback, *args, **kwargs)
+        finally:
+            stats.latency_ms.append((time.perf_counter() - began) * 1000.0)
+
+
+matchmaking_executor = MatchmakingExecutor()
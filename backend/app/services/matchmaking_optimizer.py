@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.matchmaking import (
+    OPPONENT_REPEAT_WEIGHT,
+    PARTNER_REPEAT_WEIGHT,
+    CandidatePlayer,
+    MatchmakingError,
+    PairHistory,
+    _minutes_since,
+    _priority_scores_np,
+    _top_k_indices,
+    generate_fair_doubles_match,
+)
+
+MATCH_TYPE_SINGLE = "single"
+MATCH_TYPE_DOUBLE = "double"
+
+# Cost of one unit of selection priority (0..1 per player), in the same
+# units as the team score. Skipping a player with priority 1.0 for one
+# with 0.5 costs as much as one repeated partnership.
+PRIORITY_WEIGHT = 400.0
+
+DEFAULT_TOP_N = 24
+# Candidates searched when a constrained match or a preview misses its
+# deadline; unconstrained matches fall back to the greedy matchmaking.
+FALLBACK_TOP_N = 8
+
+
+@dataclass
+class MatchConstraints:
+    match_type: str = MATCH_TYPE_DOUBLE
+    # Pairs that, if picked, must be picked together on the same team.
+    locked_partners: List[Tuple[str, str]] = field(default_factory=list)
+    # Pairs that must not be in the same match.
+    avoid_pairs: List[Tuple[str, str]] = field(default_factory=list)
+    rating_min: Optional[float] = None
+    rating_max: Optional[float] = None
+    # Largest allowed rating difference between any two players of the match.
+    max_rating_spread: Optional[float] = None
+
+    @property
+    def team_size(self) -> int:
+        return 1 if self.match_type == MATCH_TYPE_SINGLE else 2
+
+
+class _Search:
+    def __init__(
+        self,
+        pool: List[CandidatePlayer],
+        priority: np.ndarray,
+        constraints: MatchConstraints,
+        history: PairHistory,
+        top_k: int,
+    ):
+        self.pool = pool
+        self.ids = [p.user_id for p in pool]
+        self.ratings = [float(p.rating) for p in pool]
+        self.priority = [float(x) for x in priority]
+        self.constraints = constraints
+        self.history = history
+        self.top_k = top_k
+        self.size = 2 * constraints.team_size
+
+        index = {uid: i for i, uid in enumerate(self.ids)}
+        n = len(pool)
+        self.avoid = [set() for _ in range(n)]
+        for a, b in constraints.avoid_pairs:
+            if a in index and b in index:
+                self.avoid[index[a]].add(index[b])
+                self.avoid[index[b]].add(index[a])
+
+        # locked[i] is the index of i's partner, or -1; players whose partner
+        # is not in the pool can never be picked.
+        self.locked = [-1] * n
+        self.allowed = [True] * n
+        if constraints.team_size == 2:
+            for a, b in constraints.locked_partners:
+                for x, y in ((a, b), (b, a)):
+                    if x not in index:
+                        continue
+                    i = index[x]
+                    if y not in index:
+                        self.allowed[i] = False
+                    elif self.locked[i] not in (-1, index[y]):
+                        raise MatchmakingError(f"Player {x} is locked with more than one partner")
+                    else:
+                        self.locked[i] = index[y]
+
+        # Pair costs in index space: what a pair costs as partners or as
+        # opponents, and the cheaper of the two, which every pair of a match
+        # pays at least.
+        partners, opponents = history.counts_for(self.ids)
+        partner_cost = partners * PARTNER_REPEAT_WEIGHT
+        opponent_cost = opponents * OPPONENT_REPEAT_WEIGHT
+        if self.size == 2:
+            pair_min = opponent_cost
+        else:
+            pair_min = np.minimum(partner_cost, opponent_cost)
+        self.partner_cost = partner_cost.tolist()
+        self.opponent_cost = opponent_cost.tolist()
+        self.pair_min = pair_min.tolist()
+
+        # best_rest[k][i]: highest priority sum of k players from i onwards.
+        self.best_rest = [[0.0] * (n + 1) for _ in range(self.size + 1)]
+        for k in range(1, self.size + 1):
+            for i in range(n - 1, -1, -1):
+                self.best_rest[k][i] = max(
+                    self.best_rest[k][i + 1],
+                    self.priority[i] + self.best_rest[k - 1][i + 1],
+                )
+
+        # Best results so far, sorted by (cost, team_a, team_b).
+        self.results: List[Tuple[float, Tuple[str, ...], Tuple[str, ...], Dict[str, object]]] = []
+
+    def _bound(self) -> float:
+        if len(self.results) < self.top_k:
+            return float("inf")
+        return self.results[-1][0]
+
+    def _splits(self, picked: Sequence[int]):
+        if self.size == 2:
+            yield (picked[0],), (picked[1],)
+            return
+        a, b, c, d = picked
+        for team_a, team_b in (((a, b), (c, d)), ((a, c), (b, d)), ((a, d), (b, c))):
+            yield team_a, team_b
+
+    def _team_score(self, team_a: Tuple[int, ...], team_b: Tuple[int, ...]) -> float:
+        score = abs(sum(self.ratings[i] for i in team_a) - sum(self.ratings[i] for i in team_b))
+        for team in (team_a, team_b):
+            if len(team) == 2:
+                score += self.partner_cost[team[0]][team[1]]
+        for i in team_a:
+            for j in team_b:
+                score += self.opponent_cost[i][j]
+        return score
+
+    def _evaluate(self, picked: Sequence[int], priority_sum: float) -> None:
+        priority_cost = -PRIORITY_WEIGHT * priority_sum
+        for team_a, team_b in self._splits(picked):
+            if any(self.locked[i] != -1 and self.locked[i] not in team for team in (team_a, team_b) for i in team):
+                continue
+            team_score = self._team_score(team_a, team_b)
+            cost = priority_cost + team_score
+            if cost >= self._bound():
+                continue
+
+            ids_a = tuple(sorted(self.ids[i] for i in team_a))
+            ids_b = tuple(sorted(self.ids[i] for i in team_b))
+            if ids_b < ids_a:
+                ids_a, ids_b = ids_b, ids_a
+            result = {
+                "team_a": ids_a,
+                "team_b": ids_b,
+                "balance_gap": abs(sum(self.ratings[i] for i in team_a) - sum(self.ratings[i] for i in team_b)),
+                "score": round(team_score, 4),
+                "cost": round(cost, 4),
+            }
+            bisect.insort(self.results, (cost, ids_a, ids_b, result), key=lambda e: e[:3])
+            del self.results[self.top_k:]
+
+    def run(self) -> List[Dict[str, object]]:
+        self._extend([], 0, 0.0, 0.0, float("inf"), float("-inf"))
+        return [e[3] for e in self.results]
+
+    def _extend(
+        self,
+        picked: List[int],
+        start: int,
+        priority_sum: float,
+        pair_sum: float,
+        low: float,
+        high: float,
+    ) -> None:
+        need = self.size - len(picked)
+        if need == 0:
+            self._evaluate(picked, priority_sum)
+            return
+
+        n = len(self.pool)
+        spread = self.constraints.max_rating_spread
+        for i in range(start, n - need + 1):
+            # Pair costs only grow as players are added, so this bounds every completion.
+            if pair_sum - PRIORITY_WEIGHT * (priority_sum + self.best_rest[need][i]) >= self._bound():
+                return
+            if not self.allowed[i] or self.avoid[i].intersection(picked):
+                continue
+            rating = self.ratings[i]
+            new_low, new_high = min(low, rating), max(high, rating)
+            if spread is not None and new_high - new_low > spread:
+                continue
+            # A locked partner that was skipped earlier can no longer be added.
+            partner = self.locked[i]
+            if partner != -1 and partner < i and partner not in picked:
+                continue
+            if any(self.locked[j] != -1 and start <= self.locked[j] < i for j in picked):
+                return
+            row = self.pair_min[i]
+            added = sum(row[j] for j in picked)
+            picked.append(i)
+            self._extend(picked, i + 1, priority_sum + self.priority[i], pair_sum + added, new_low, new_high)
+            picked.pop()
+
+
+def optimize_match(
+    players: Iterable[CandidatePlayer],
+    constraints: Optional[MatchConstraints] = None,
+    now: Optional[datetime] = None,
+    history: Optional[PairHistory] = None,
+    top_n: int = DEFAULT_TOP_N,
+    top_k: int = 1,
+) -> List[Dict[str, object]]:
+    """Choose the players and the teams of a match together.
+
+    The ``top_n`` highest-priority candidates that satisfy the rating band
+    are searched with branch and bound for the matches that minimize
+    team score (repeats and rating gap) minus ``PRIORITY_WEIGHT`` times
+    the players' selection priority. Returns up to ``top_k`` matches, best
+    first, each shaped like ``generate_fair_doubles_match`` plus ``score``
+    (team score) and ``cost``; singles teams hold one player.
+    """
+    constraints = constraints or MatchConstraints()
+    if constraints.match_type not in (MATCH_TYPE_SINGLE, MATCH_TYPE_DOUBLE):
+        raise MatchmakingError(f"Unknown match type: {constraints.match_type}")
+    now = now or datetime.utcnow()
+
+    pool = [
+        p
+        for p in players
+        if (constraints.rating_min is None or p.rating >= constraints.rating_min)
+        and (constraints.rating_max is None or p.rating <= constraints.rating_max)
+    ]
+    size = 2 * constraints.team_size
+    if len(pool) < size:
+        raise MatchmakingError(f"Not enough players for matchmaking. Need {size}, got {len(pool)}")
+
+    priority = _priority_scores_np(
+        [float(p.matches_played) for p in pool],
+        [_minutes_since(p.last_played_at, now) for p in pool],
+        [float(p.rating) for p in pool],
+    )
+    top = _top_k_indices(priority, min(max(top_n, size), len(pool)))
+    candidates = [pool[i] for i in top]
+    if history is None:
+        history = PairHistory(p.user_id for p in candidates)
+
+    results = _Search(candidates, priority[top], constraints, history, max(top_k, 1)).run()
+    if not results:
+        raise MatchmakingError("No match satisfies the constraints")
+    return results
+
+
+def best_match(
+    players: Iterable[CandidatePlayer],
+    constraints: Optional[MatchConstraints] = None,
+    now: Optional[datetime] = None,
+    history: Optional[PairHistory] = None,
+    top_n: int = DEFAULT_TOP_N,
+) -> Dict[str, object]:
+    return optimize_match(players, constraints=constraints, now=now, history=history, top_n=top_n)[0]
+
+
+def greedy_match(
+    players: Iterable[CandidatePlayer],
+    constraints: Optional[MatchConstraints] = None,
+    now: Optional[datetime] = None,
+    history: Optional[PairHistory] = None,
+) -> Dict[str, object]:
+    """Deadline fallback for ``best_match``: ``generate_fair_doubles_match``.
+
+    The greedy matchmaking knows no constraints, so a constrained match
+    searches only the ``FALLBACK_TOP_N`` first candidates instead.
+    """
+    if constraints is None or constraints == MatchConstraints():
+        return generate_fair_doubles_match(players, now=now, history=history)
+    return best_match(players, constraints=constraints, now=now, history=history, top_n=FALLBACK_TOP_N)
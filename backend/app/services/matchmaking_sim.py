@@ -0,0 +1,333 @@
+"""Offline matchmaking simulator and benchmark.
+
+Plays whole club nights against the matchmaking service with synthetic
+players, without a database or the HTTP API, and reports decision latency
+and fairness metrics. Run it from the backend directory:
+
+    python -m app.services.matchmaking_sim --players 200 --courts 8 --rounds 150
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.matchmaking import (
+    CandidatePlayer,
+    MatchmakingError,
+    PairHistory,
+    generate_fair_doubles_match,
+    generate_fair_doubles_round,
+)
+from app.services.matchmaking_optimizer import best_match
+
+ARRIVAL_PATTERNS = ("all", "staggered", "waves")
+STRATEGIES = ("court", "round")
+MATCHERS = ("greedy", "optimizer")
+
+
+@dataclass
+class SimulationConfig:
+    players: int = 32
+    courts: int = 4
+    # Matches played per court over the night.
+    rounds: int = 100
+    seed: int = 0
+    arrival: str = "staggered"
+    # Arrivals are spread over this window for "staggered" and "waves".
+    arrival_window_minutes: float = 60.0
+    game_minutes: float = 15.0
+    game_jitter_minutes: float = 4.0
+    skill_mean: float = 1000.0
+    skill_sd: float = 150.0
+    # "court": match a court as soon as it frees up, "round": fill all courts together.
+    strategy: str = "court"
+    # Single-court matcher: "greedy" picks players then teams, "optimizer" picks both at once.
+    matcher: str = "greedy"
+
+
+@dataclass
+class SimulationReport:
+    config: SimulationConfig
+    decisions: int = 0
+    matches: int = 0
+    latency_ms: Dict[str, float] = field(default_factory=dict)
+    games_played: Dict[str, float] = field(default_factory=dict)
+    rest_minutes: Dict[str, float] = field(default_factory=dict)
+    partner_repeat_rate: float = 0.0
+    opponent_repeat_rate: float = 0.0
+    mean_balance_gap: float = 0.0
+    idle_court_minutes: float = 0.0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class _SimPlayer:
+    user_id: str
+    skill: float
+    arrives_at: float
+    matches_played: int = 0
+    last_played_at: Optional[float] = None
+    busy_until: float = 0.0
+    rests: List[float] = field(default_factory=list)
+
+
+def _percentiles(values: Sequence[float], points: Sequence[int] = (50, 90, 95, 99)) -> Dict[str, float]:
+    if not values:
+        return {}
+    arr = np.asarray(values, dtype=np.float64)
+    out = {f"p{p}": round(float(np.percentile(arr, p)), 4) for p in points}
+    out["max"] = round(float(arr.max()), 4)
+    out["mean"] = round(float(arr.mean()), 4)
+    return out
+
+
+def _arrival_time(cfg: SimulationConfig, rng: random.Random, index: int) -> float:
+    if cfg.arrival == "all":
+        return 0.0
+    if cfg.arrival == "staggered":
+        return rng.uniform(0.0, cfg.arrival_window_minutes)
+    # "waves": three groups at the start, middle and end of the window
+    return (index % 3) * cfg.arrival_window_minutes / 2.0
+
+
+def _make_players(cfg: SimulationConfig, rng: random.Random) -> List[_SimPlayer]:
+    players = [
+        _SimPlayer(
+            user_id=f"sim-{i:04d}",
+            skill=rng.gauss(cfg.skill_mean, cfg.skill_sd),
+            arrives_at=_arrival_time(cfg, rng, i),
+        )
+        for i in range(cfg.players)
+    ]
+    # Enough players to start the first games straight away.
+    for p in players[: min(cfg.players, cfg.courts * 4)]:
+        p.arrives_at = 0.0
+    return players
+
+
+class _Simulation:
+    def __init__(self, cfg: SimulationConfig):
+        if cfg.arrival not in ARRIVAL_PATTERNS:
+            raise ValueError(f"arrival must be one of {ARRIVAL_PATTERNS}")
+        if cfg.strategy not in STRATEGIES:
+            raise ValueError(f"strategy must be one of {STRATEGIES}")
+        if cfg.matcher not in MATCHERS:
+            raise ValueError(f"matcher must be one of {MATCHERS}")
+        self.cfg = cfg
+        self.rng = random.Random(cfg.seed)
+        self.start = datetime(2026, 1, 1, 18, 0, 0)
+        self.players = _make_players(cfg, self.rng)
+        self.by_id = {p.user_id: p for p in self.players}
+        self.history = PairHistory(p.user_id for p in self.players)
+        self.latencies: List[float] = []
+        self.gaps: List[float] = []
+        self.partner_pairs = 0
+        self.partner_repeats = 0
+        self.opponent_pairs = 0
+        self.opponent_repeats = 0
+        self.idle_court_minutes = 0.0
+        self.matches = 0
+
+    def _candidates(self, t: float) -> List[CandidatePlayer]:
+        return [
+            CandidatePlayer(
+                user_id=p.user_id,
+                rating=p.skill,
+                matches_played=p.matches_played,
+                last_played_at=(
+                    self.start + timedelta(minutes=p.last_played_at) if p.last_played_at is not None else None
+                ),
+            )
+            for p in self.players
+            if p.arrives_at <= t and p.busy_until <= t
+        ]
+
+    def _play(self, result: dict, t: float) -> float:
+        team_a, team_b = result["team_a"], result["team_b"]
+        for team in (team_a, team_b):
+            self.partner_pairs += 1
+            self.partner_repeats += int(self.history.partner_count(*team) > 0)
+        for a in team_a:
+            for b in team_b:
+                self.opponent_pairs += 1
+                self.opponent_repeats += int(self.history.opponent_count(a, b) > 0)
+        self.history.add_match(team_a, team_b)
+        self.gaps.append(float(result["balance_gap"]))
+
+        duration = max(5.0, self.cfg.game_minutes + self.rng.uniform(-1.0, 1.0) * self.cfg.game_jitter_minutes)
+        end = t + duration
+        for uid in (*team_a, *team_b):
+            p = self.by_id[uid]
+            if p.last_played_at is not None:
+                p.rests.append(t - p.last_played_at)
+            p.matches_played += 1
+            p.busy_until = end
+            p.last_played_at = end
+        self.matches += 1
+        return end
+
+    def _next_event_after(self, t: float) -> Optional[float]:
+        upcoming = [p.arrives_at for p in self.players if p.arrives_at > t]
+        upcoming += [p.busy_until for p in self.players if p.busy_until > t]
+        return min(upcoming) if upcoming else None
+
+    def _decide(self, t: float, courts: int) -> List[dict]:
+        candidates = self._candidates(t)
+        if len(candidates) < 4:
+            return []
+        now = self.start + timedelta(minutes=t)
+        began = time.perf_counter()
+        try:
+            if courts == 1 and self.cfg.matcher == "optimizer":
+                results = [best_match(candidates, now=now, history=self.history)]
+            elif courts == 1:
+                results = [generate_fair_doubles_match(candidates, now=now, history=self.history)]
+            else:
+                results = generate_fair_doubles_round(candidates, court_count=courts, now=now, history=self.history)
+        except MatchmakingError:
+            results = []
+        self.latencies.append((time.perf_counter() - began) * 1000.0)
+        return results
+
+    def run_by_court(self) -> None:
+        remaining = {court: self.cfg.rounds for court in range(self.cfg.courts)}
+        free_at = [(0.0, court) for court in range(self.cfg.courts)]
+        heapq.heapify(free_at)
+
+        while free_at:
+            t, court = heapq.heappop(free_at)
+            results = self._decide(t, 1)
+            if not results:
+                retry = self._next_event_after(t)
+                if retry is None:
+                    continue
+                self.idle_court_minutes += retry - t
+                heapq.heappush(free_at, (retry, court))
+                continue
+            end = self._play(results[0], t)
+            remaining[court] -= 1
+            if remaining[court] > 0:
+                heapq.heappush(free_at, (end, court))
+
+    def run_by_round(self) -> None:
+        t = 0.0
+        for _ in range(self.cfg.rounds):
+            results = self._decide(t, self.cfg.courts)
+            if not results:
+                retry = self._next_event_after(t)
+                if retry is None:
+                    break
+                self.idle_court_minutes += (retry - t) * self.cfg.courts
+                t = retry
+                continue
+            ends = [self._play(r, t) for r in results]
+            end = max(ends)
+            self.idle_court_minutes += sum(end - e for e in ends) + (end - t) * (self.cfg.courts - len(results))
+            t = end
+
+    def report(self) -> SimulationReport:
+        present = [p for p in self.players if p.matches_played or p.arrives_at == 0.0]
+        games = np.asarray([p.matches_played for p in present], dtype=np.float64)
+        rests = [r for p in self.players for r in p.rests]
+        return SimulationReport(
+            config=self.cfg,
+            decisions=len(self.latencies),
+            matches=self.matches,
+            latency_ms=_percentiles(self.latencies),
+            games_played={
+                "mean": round(float(games.mean()), 4) if games.size else 0.0,
+                "variance": round(float(games.var()), 4) if games.size else 0.0,
+                "min": float(games.min()) if games.size else 0.0,
+                "max": float(games.max()) if games.size else 0.0,
+            },
+            rest_minutes=_percentiles(rests),
+            partner_repeat_rate=round(self.partner_repeats / self.partner_pairs, 4) if self.partner_pairs else 0.0,
+            opponent_repeat_rate=round(self.opponent_repeats / self.opponent_pairs, 4) if self.opponent_pairs else 0.0,
+            mean_balance_gap=round(float(np.mean(self.gaps)), 4) if self.gaps else 0.0,
+            idle_court_minutes=round(self.idle_court_minutes, 2),
+        )
+
+
+def simulate_session(cfg: SimulationConfig) -> SimulationReport:
+    """Simulate one session night and return its latency and fairness report."""
+    sim = _Simulation(cfg)
+    if cfg.strategy == "round":
+        sim.run_by_round()
+    else:
+        sim.run_by_court()
+    return sim.report()
+
+
+def _format_report(report: SimulationReport) -> str:
+    cfg = report.config
+    lines = [
+        f"players={cfg.players} courts={cfg.courts} rounds={cfg.rounds} strategy={cfg.strategy} "
+        f"arrival={cfg.arrival} matcher={cfg.matcher} seed={cfg.seed}",
+        f"  decisions={report.decisions} matches={report.matches} idle_court_minutes={report.idle_court_minutes}",
+        f"  latency_ms   {report.latency_ms}",
+        f"  games_played {report.games_played}",
+        f"  rest_minutes {report.rest_minutes}",
+        f"  partner_repeat_rate={report.partner_repeat_rate} opponent_repeat_rate={report.opponent_repeat_rate} "
+        f"mean_balance_gap={report.mean_balance_gap}",
+    ]
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Simulate club nights against the matchmaking service.")
+    parser.add_argument("--players", type=int, nargs="+", default=[32], help="pool sizes to simulate")
+    parser.add_argument("--courts", type=int, nargs="+", default=[4], help="court counts to simulate")
+    parser.add_argument("--rounds", type=int, default=100, help="matches per court")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--arrival", choices=ARRIVAL_PATTERNS, default="staggered")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="court")
+    parser.add_argument("--matcher", choices=MATCHERS, default="greedy")
+    parser.add_argument("--json", action="store_true", help="print one JSON report per line")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="fail if p95 decision latency exceeds this")
+    parser.add_argument("--max-partner-repeat", type=float, default=None, help="fail if partner repeat rate exceeds this")
+    parser.add_argument("--max-games-variance", type=float, default=None, help="fail if games-played variance exceeds this")
+    args = parser.parse_args(argv)
+
+    failures = []
+    for players in args.players:
+        for courts in args.courts:
+            cfg = SimulationConfig(
+                players=players,
+                courts=courts,
+                rounds=args.rounds,
+                seed=args.seed,
+                arrival=args.arrival,
+                strategy=args.strategy,
+                matcher=args.matcher,
+            )
+            report = simulate_session(cfg)
+            print(json.dumps(report.to_dict()) if args.json else _format_report(report))
+
+            label = f"players={players} courts={courts}"
+            p95 = report.latency_ms.get("p95", 0.0)
+            if args.max_p95_ms is not None and p95 > args.max_p95_ms:
+                failures.append(f"{label}: p95 latency {p95}ms > {args.max_p95_ms}ms")
+            if args.max_partner_repeat is not None and report.partner_repeat_rate > args.max_partner_repeat:
+                failures.append(f"{label}: partner repeat rate {report.partner_repeat_rate} > {args.max_partner_repeat}")
+            variance = report.games_played.get("variance", 0.0)
+            if args.max_games_variance is not None and variance > args.max_games_variance:
+                failures.append(f"{label}: games-played variance {variance} > {args.max_games_variance}")
+
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
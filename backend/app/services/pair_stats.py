@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.bulk import insert_increment
+from app.models.models import Match, PairStats
+from app.services.match_results import match_slots
+
+PARTNER = "partner"
+OPPONENT = "opponent"
+RELATIONS = (PARTNER, OPPONENT)
+
+# (club id, user id, other id, relation) -> [matches, wins]
+PairCounts = Dict[Tuple[str, str, str, str], List[int]]
+
+
+def count_pairs(counts: PairCounts, club_id: str, slots: Sequence[Optional[str]], winner_team: str) -> None:
+    """Add one match, its players in A1, A2, B1, B2 order, to ``counts``."""
+    team_a = [uid for uid in slots[:2] if uid]
+    team_b = [uid for uid in slots[2:] if uid]
+    for team, others, won in ((team_a, team_b, winner_team == "A"), (team_b, team_a, winner_team == "B")):
+        for uid in team:
+            pairs = [(other, PARTNER) for other in team if other != uid] + [(other, OPPONENT) for other in others]
+            for other, relation in pairs:
+                count = counts.setdefault((club_id, uid, other, relation), [0, 0])
+                count[0] += 1
+                count[1] += 1 if won else 0
+
+
+def pair_rows(counts: PairCounts) -> List[dict]:
+    """``pair_stats`` rows in key order, so concurrent writers lock them alike."""
+    return [
+        {"club_id": club_id, "user_id": uid, "other_id": other, "relation": relation, "matches": played, "wins": won}
+        for (club_id, uid, other, relation), (played, won) in sorted(counts.items())
+    ]
+
+
+async def record_pair_stats(db: AsyncSession, club_id: str, matches: Sequence[Match]) -> None:
+    """Add newly completed matches to the partner and opponent records of their players."""
+    counts: PairCounts = {}
+    for m in matches:
+        count_pairs(counts, club_id, match_slots(m), m.winner_team)
+    if not counts:
+        return
+    stmt = insert_increment(
+        db.get_bind().dialect.name,
+        PairStats.__table__,
+        ("club_id", "user_id", "other_id", "relation"),
+        ("matches", "wins"),
+    )
+    await db.execute(stmt, pair_rows(counts))
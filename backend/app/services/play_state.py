@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.redis import get_redis
+from app.models.models import Match, RegistrationStatus, SessionRegistration, User
+from app.services.matchmaking import CandidatePlayer, PairHistory
+
+logger = structlog.get_logger()
+
+# Play state only matters while a session is running; let stale keys expire.
+PLAY_STATE_TTL_SECONDS = 60 * 60 * 12
+
+_READY_FIELD = "_ready"
+
+# Applies one match event to a cached play state, once the match is
+# committed. Every event bumps the version first, even with the state
+# missing, so a rebuild that read the database before the event does not
+# store its snapshot (see _FILL_SCRIPT). A new match is counted only if
+# its mark is not there yet, as a rebuild that already saw it sets it.
+# Does nothing to a missing state so a partial one is never mistaken for
+# a full one.
+# KEYS: state, version. ARGV: ttl, timestamp, match id or '', number of
+# players, player ids..., fields to HINCRBY...
+_APPLY_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return 0
+end
+local ts = tonumber(ARGV[2])
+local n = tonumber(ARGV[4])
+for i = 5, 4 + n do
+  local field = 't:' .. ARGV[i]
+  local current = redis.call('HGET', KEYS[1], field)
+  if (not current) or tonumber(current) < ts then
+    redis.call('HSET', KEYS[1], field, ARGV[2])
+  end
+end
+if ARGV[3] == '' or redis.call('HSETNX', KEYS[1], 'x:' .. ARGV[3], 1) == 1 then
+  for i = 5 + n, #ARGV do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], 1)
+  end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# Stores a rebuilt state unless an event arrived since the version was read
+# before the rebuild, or another rebuild got there first.
+# KEYS: state, version. ARGV: version read, ttl, field, value, ...
+_FILL_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[2]) or '0') ~= tonumber(ARGV[1]) then
+  return 0
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  return 0
+end
+for i = 3, #ARGV, 2 do
+  redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+@dataclass
+class PlayState:
+    """How much and how recently each player of a session has played."""
+
+    match_counts: Dict[str, int] = field(default_factory=dict)
+    last_played_at: Dict[str, datetime] = field(default_factory=dict)
+    partner_counts: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    opponent_counts: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    match_ids: Set[str] = field(default_factory=set)
+
+    def pair_history(self, player_ids: Iterable[str]) -> PairHistory:
+        return PairHistory.from_counts(player_ids, self.partner_counts, self.opponent_counts)
+
+
+def _key(session_id: str) -> str:
+    return f"play_state:{session_id}"
+
+
+def _version_key(session_id: str) -> str:
+    return f"play_state_version:{session_id}"
+
+
+def _to_ts(dt: datetime) -> float:
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _from_ts(value: str) -> datetime:
+    return datetime.fromtimestamp(float(value), tz=timezone.utc).replace(tzinfo=None)
+
+
+def _teams(
+    a1: str, a2: Optional[str], b1: str, b2: Optional[str]
+) -> Tuple[List[str], List[str]]:
+    return [a1] + ([a2] if a2 else []), [b1] + ([b2] if b2 else [])
+
+
+def match_teams(match: Match) -> Tuple[List[str], List[str]]:
+    return _teams(
+        match.team_a_player_1_id,
+        match.team_a_player_2_id,
+        match.team_b_player_1_id,
+        match.team_b_player_2_id,
+    )
+
+
+def _partner_keys(teams: Iterable[List[str]]) -> List[Tuple[str, str]]:
+    return [tuple(sorted(team)) for team in teams if len(team) == 2]
+
+
+def _opponent_keys(teams: Tuple[List[str], List[str]]) -> List[Tuple[str, str]]:
+    return [tuple(sorted((a, b))) for a in teams[0] for b in teams[1]]
+
+
+def _apply(state: PlayState, teams: Tuple[List[str], List[str]], played_at: Optional[datetime]) -> None:
+    for uid in teams[0] + teams[1]:
+        state.match_counts[uid] = state.match_counts.get(uid, 0) + 1
+        if played_at and (uid not in state.last_played_at or played_at > state.last_played_at[uid]):
+            state.last_played_at[uid] = played_at
+    for key in _partner_keys(teams):
+        state.partner_counts[key] = state.partner_counts.get(key, 0) + 1
+    for key in _opponent_keys(teams):
+        state.opponent_counts[key] = state.opponent_counts.get(key, 0) + 1
+
+
+async def rebuild_play_state(db: AsyncSession, session_id: str) -> PlayState:
+    """Recompute the play state of a session from its matches."""
+    rows = (
+        await db.execute(
+            select(
+                Match.id,
+                Match.team_a_player_1_id,
+                Match.team_a_player_2_id,
+                Match.team_b_player_1_id,
+                Match.team_b_player_2_id,
+                Match.created_at,
+                Match.started_at,
+                Match.completed_at,
+            ).where(Match.session_id == session_id)
+        )
+    ).all()
+
+    state = PlayState()
+    for match_id, a1, a2, b1, b2, created_at, started_at, completed_at in rows:
+        _apply(state, _teams(a1, a2, b1, b2), completed_at or started_at or created_at)
+        state.match_ids.add(match_id)
+    return state
+
+
+def _serialize(state: PlayState) -> Dict[str, str]:
+    mapping = {_READY_FIELD: "1"}
+    for uid, count in state.match_counts.items():
+        mapping[f"m:{uid}"] = str(count)
+    for uid, played_at in state.last_played_at.items():
+        mapping[f"t:{uid}"] = repr(_to_ts(played_at))
+    for (a, b), count in state.partner_counts.items():
+        mapping[f"p:{a}:{b}"] = str(count)
+    for (a, b), count in state.opponent_counts.items():
+        mapping[f"o:{a}:{b}"] = str(count)
+    for match_id in state.match_ids:
+        mapping[f"x:{match_id}"] = "1"
+    return mapping
+
+
+def _deserialize(raw: Dict[str, str]) -> PlayState:
+    state = PlayState()
+    for name, value in raw.items():
+        kind, _, rest = name.partition(":")
+        if kind == "m":
+            state.match_counts[rest] = int(value)
+        elif kind == "t":
+            state.last_played_at[rest] = _from_ts(value)
+        elif kind == "p":
+            a, _, b = rest.partition(":")
+            state.partner_counts[(a, b)] = int(value)
+        elif kind == "o":
+            a, _, b = rest.partition(":")
+            state.opponent_counts[(a, b)] = int(value)
+        elif kind == "x":
+            state.match_ids.add(rest)
+    return state
+
+
+async def load_play_state(db: AsyncSession, session_id: str) -> PlayState:
+    """Read the cached play state, rebuilding it from the database on a miss."""
+    try:
+        r = await get_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.hgetall(_key(session_id))
+            pipe.get(_version_key(session_id))
+            raw, version = await pipe.execute()
+        if raw.get(_READY_FIELD):
+            return _deserialize(raw)
+    except Exception as e:
+        logger.warning("Play state cache unavailable", session_id=session_id, error=str(e))
+        return await rebuild_play_state(db, session_id)
+
+    # The version is read before the matches, so any event the rebuild
+    # might miss has bumped it by the time the state is stored.
+    state = await rebuild_play_state(db, session_id)
+    try:
+        fields = [item for pair in _serialize(state).items() for item in pair]
+        await r.eval(
+            _FILL_SCRIPT,
+            2,
+            _key(session_id),
+            _version_key(session_id),
+            int(version or 0),
+            PLAY_STATE_TTL_SECONDS,
+            *fields,
+        )
+    except Exception as e:
+        logger.warning("Failed to cache play state", session_id=session_id, error=str(e))
+    return state
+
+
+async def load_session_candidates(db: AsyncSession, session_id: str) -> Tuple[List[CandidatePlayer], PlayState]:
+    """Matchmaking candidates for every confirmed or attended player of a session."""
+    users = (
+        await db.execute(
+            select(User)
+            .join(SessionRegistration, SessionRegistration.user_id == User.id)
+            .where(
+                SessionRegistration.session_id == session_id,
+                SessionRegistration.status.in_([RegistrationStatus.CONFIRMED, RegistrationStatus.ATTENDED]),
+            )
+        )
+    ).scalars().all()
+
+    state = await load_play_state(db, session_id)
+    candidates = [
+        CandidatePlayer(
+            user_id=user.id,
+            rating=user.rating,
+            matches_played=state.match_counts.get(user.id, 0),
+            last_played_at=state.last_played_at.get(user.id),
+        )
+        for user in users
+    ]
+    return candidates, state
+
+
+async def _apply_cached(
+    session_id: str, players: List[str], played_at: datetime, match_id: str = "", incr_fields: Sequence[str] = ()
+) -> None:
+    try:
+        r = await get_redis()
+        await r.eval(
+            _APPLY_SCRIPT,
+            2,
+            _key(session_id),
+            _version_key(session_id),
+            PLAY_STATE_TTL_SECONDS,
+            repr(_to_ts(played_at)),
+            match_id,
+            len(players),
+            *players,
+            *incr_fields,
+        )
+    except Exception as e:
+        logger.warning("Failed to update play state, dropping cache", session_id=session_id, error=str(e))
+        await invalidate_play_state(session_id)
+
+
+async def record_match_created(match: Match) -> None:
+    """Count a new match for its players, partners and opponents. Call after it is committed."""
+    teams = match_teams(match)
+    players = teams[0] + teams[1]
+    incr_fields = (
+        [f"m:{uid}" for uid in players]
+        + [f"p:{a}:{b}" for a, b in _partner_keys(teams)]
+        + [f"o:{a}:{b}" for a, b in _opponent_keys(teams)]
+    )
+    await _apply_cached(match.session_id, players, match.created_at, match.id, incr_fields)
+
+
+async def record_match_played(match: Match, played_at: datetime) -> None:
+    """Move the players' last-played time forward after a start or completion. Call after it is committed."""
+    teams = match_teams(match)
+    await _apply_cached(match.session_id, teams[0] + teams[1], played_at)
+
+
+async def invalidate_play_state(session_id: str) -> None:
+    try:
+        r = await get_redis()
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.delete(_key(session_id))
+            pipe.incr(_version_key(session_id))
+            pipe.expire(_version_key(session_id), PLAY_STATE_TTL_SECONDS)
+            await pipe.execute()
+    except Exception:
+        pass  # the key expires on its own
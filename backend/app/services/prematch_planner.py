@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from dataclasses import replace
+from datetime import datetime
+from functools import partial
+from typing import Iterable, List, Optional, Set
+
+import structlog
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import AsyncSessionLocal
+from app.models.models import PreMatch, RegistrationStatus, Session, SessionRegistration
+from app.services.matchmaking import (
+    CandidatePlayer,
+    MatchmakingError,
+    PairHistory,
+    generate_fair_doubles_round,
+)
+from app.services.matchmaking_executor import matchmaking_executor
+from app.services.play_state import load_session_candidates
+
+logger = structlog.get_logger()
+
+# How many rounds of every court are planned ahead.
+LOOKAHEAD_ROUNDS = 3
+
+PREMATCH_QUEUED = "queued"
+PREMATCH_ACTIVATED = "activated"
+
+
+def project_rounds(
+    candidates: Iterable[CandidatePlayer],
+    court_count: int,
+    rounds: int,
+    history: PairHistory,
+    now: Optional[datetime] = None,
+    max_passes: int = 10,
+) -> List[List[dict]]:
+    """Plan ``rounds`` consecutive rounds, assuming every planned match is played.
+
+    After each round the selected players get one more match and a fresh
+    last-played time, and their pairings are added to ``history``, so later
+    rounds rotate in whoever sat out.
+    """
+    now = now or datetime.utcnow()
+    projected = {c.user_id: replace(c) for c in candidates}
+    planned: List[List[dict]] = []
+
+    for _ in range(rounds):
+        try:
+            round_matches = generate_fair_doubles_round(
+                list(projected.values()),
+                court_count=court_count,
+                now=now,
+                max_passes=max_passes,
+                history=history,
+            )
+        except MatchmakingError:
+            break
+
+        for m in round_matches:
+            history.add_match(m["team_a"], m["team_b"])
+            for uid in (*m["team_a"], *m["team_b"]):
+                projected[uid].matches_played += 1
+                projected[uid].last_played_at = now
+        planned.append(round_matches)
+
+    return planned
+
+
+async def refresh_queue(db: AsyncSession, session_id: str, rounds: int = LOOKAHEAD_ROUNDS) -> List[PreMatch]:
+    """Replace the queued pre-matches of a session with a freshly planned lookahead."""
+    session = (await db.execute(select(Session).where(Session.id == session_id))).scalar_one_or_none()
+    if not session:
+        return []
+
+    candidates, state = await load_session_candidates(db, session_id)
+    history = state.pair_history(c.user_id for c in candidates)
+    planned = await matchmaking_executor.run(
+        "lookahead",
+        project_rounds,
+        partial(project_rounds, max_passes=0),
+        len(candidates),
+        candidates,
+        session.number_of_courts or max(len(candidates) // 4, 1),
+        rounds,
+        history,
+    )
+
+    await db.execute(
+        delete(PreMatch).where(PreMatch.session_id == session_id, PreMatch.status == PREMATCH_QUEUED)
+    )
+
+    queue: List[PreMatch] = []
+    for round_matches in planned:
+        for m in round_matches:
+            queue.append(
+                PreMatch(
+                    session_id=session_id,
+                    match_order=len(queue) + 1,
+                    team_a_player_1_id=m["team_a"][0],
+                    team_a_player_2_id=m["team_a"][1],
+                    team_b_player_1_id=m["team_b"][0],
+                    team_b_player_2_id=m["team_b"][1],
+                    status=PREMATCH_QUEUED,
+                )
+            )
+    db.add_all(queue)
+    await db.flush()
+    return queue
+
+
+async def list_queue(db: AsyncSession, session_id: str) -> List[PreMatch]:
+    return (
+        await db.execute(
+            select(PreMatch)
+            .where(PreMatch.session_id == session_id, PreMatch.status == PREMATCH_QUEUED)
+            .order_by(PreMatch.match_order.asc())
+        )
+    ).scalars().all()
+
+
+def _prematch_players(pre: PreMatch) -> List[str]:
+    return [
+        uid
+        for uid in (pre.team_a_player_1_id, pre.team_a_player_2_id, pre.team_b_player_1_id, pre.team_b_player_2_id)
+        if uid
+    ]
+
+
+async def activate_next(
+    db: AsyncSession,
+    session_id: str,
+    busy_players: Set[str],
+    scan_limit: int = 8,
+) -> Optional[PreMatch]:
+    """Pop the first queued pre-match whose players are all free and still registered.
+
+    Normally this is the head of the queue; only a few entries are looked at
+    so a court turnover never falls back into a full matchmaking run here.
+    Entries left behind may share players with the one popped; callers
+    re-plan them with ``refresh_queue_after_commit``.
+    """
+    head = (
+        await db.execute(
+            select(PreMatch)
+            .where(PreMatch.session_id == session_id, PreMatch.status == PREMATCH_QUEUED)
+            .order_by(PreMatch.match_order.asc())
+            .limit(scan_limit)
+            .with_for_update(skip_locked=True)
+        )
+    ).scalars().all()
+    if not head:
+        return None
+
+    wanted = {uid for pre in head for uid in _prematch_players(pre)}
+    registered = set(
+        (
+            await db.execute(
+                select(SessionRegistration.user_id).where(
+                    SessionRegistration.session_id == session_id,
+                    SessionRegistration.user_id.in_(wanted),
+                    SessionRegistration.status.in_([RegistrationStatus.CONFIRMED, RegistrationStatus.ATTENDED]),
+                )
+            )
+        ).scalars().all()
+    )
+
+    for pre in head:
+        players = _prematch_players(pre)
+        if all(uid in registered and uid not in busy_players for uid in players):
+            pre.status = PREMATCH_ACTIVATED
+            pre.activated_at = datetime.utcnow()
+            await db.flush()
+            return pre
+    return None
+
+
+async def refresh_queue_after_commit(session_id: str) -> None:
+    """Re-plan a session's queue after its registrations, matches or results changed.
+
+    Pass it to ``after_commit`` so it reads the change that triggered it;
+    it runs in its own transaction, and only for sessions that already use
+    the queue.
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            has_queue = (
+                await db.execute(
+                    select(PreMatch.id)
+                    .where(PreMatch.session_id == session_id, PreMatch.status == PREMATCH_QUEUED)
+                    .limit(1)
+                )
+            ).first()
+            if not has_queue:
+                return
+            await refresh_queue(db, session_id)
+            await db.commit()
+    except Exception as e:
+        logger.warning("Failed to refresh match queue", session_id=session_id, error=str(e))
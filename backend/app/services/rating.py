@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import math
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Match arrays use one row per match and four slots per row, in the order
+# team A player 1, team A player 2, team B player 1, team B player 2.
+# Singles leave the second slot of each team empty.
+TEAM_A_SLOTS = np.array([True, True, False, False])
+
+RATING_FLOOR = 100.0
+DEFAULT_RATING = 1000.0
+DEFAULT_DEVIATION = 350.0
+DEFAULT_VOLATILITY = 0.06
+
+DEFAULT_RATING_ENGINE = "elo"
+
+
+class RatingError(Exception):
+    pass
+
+
+@dataclass
+class RatingTable:
+    """Rating state of N players as parallel arrays, addressed by dense index."""
+
+    rating: np.ndarray
+    deviation: np.ndarray
+    volatility: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows: List[Tuple[float, float, float]]) -> "RatingTable":
+        arr = np.asarray(rows, dtype=np.float64).reshape(-1, 3)
+        return cls(rating=arr[:, 0].copy(), deviation=arr[:, 1].copy(), volatility=arr[:, 2].copy())
+
+
+def _team_means(values: np.ndarray, present: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    weights = present.astype(np.float64)
+    a = (values * weights * TEAM_A_SLOTS).sum(axis=1) / (weights * TEAM_A_SLOTS).sum(axis=1)
+    b = (values * weights * ~TEAM_A_SLOTS).sum(axis=1) / (weights * ~TEAM_A_SLOTS).sum(axis=1)
+    return a, b
+
+
+class RatingEngine(ABC):
+    name = ""
+
+    @abstractmethod
+    def rate(
+        self,
+        rating: np.ndarray,
+        deviation: np.ndarray,
+        volatility: np.ndarray,
+        present: np.ndarray,
+        a_won: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Rate M independent matches at once.
+
+        All arrays are (M, 4) except ``a_won`` which is (M,). Returns the new
+        rating, deviation and volatility arrays; empty slots are unchanged.
+        """
+
+
+class EloEngine(RatingEngine):
+    """Team Elo: each player moves by the team's expected-score surprise."""
+
+    name = "elo"
+
+    def __init__(self, k_factor: float = 32.0):
+        self.k_factor = k_factor
+
+    def rate(self, rating, deviation, volatility, present, a_won):
+        team_a, team_b = _team_means(rating, present)
+        expected_a = 1.0 / (1.0 + np.power(10.0, (team_b - team_a) / 400.0))
+        delta_a = self.k_factor * (a_won.astype(np.float64) - expected_a)
+
+        delta = np.where(TEAM_A_SLOTS, delta_a[:, None], -delta_a[:, None])
+        new_rating = np.where(present, np.maximum(RATING_FLOOR, rating + delta), rating)
+        return new_rating, deviation.copy(), volatility.copy()
+
+
+class Glicko2Engine(RatingEngine):
+    """Glicko-2 with each player rated against the opposing team as one composite opponent."""
+
+    name = "glicko2"
+    _SCALE = 173.7178
+
+    def __init__(
+        self,
+        tau: float = 0.5,
+        min_deviation: float = 30.0,
+        max_deviation: float = DEFAULT_DEVIATION,
+        epsilon: float = 1e-6,
+    ):
+        self.tau = tau
+        self.min_deviation = min_deviation
+        self.max_deviation = max_deviation
+        self.epsilon = epsilon
+
+    def _volatility(self, delta, phi, v, sigma):
+        # Illinois iteration from the Glicko-2 paper, run on whole arrays.
+        tau2 = self.tau ** 2
+        a = np.log(sigma ** 2)
+        delta2, phi2 = delta ** 2, phi ** 2
+
+        def f(x):
+            ex = np.exp(x)
+            return ex * (delta2 - phi2 - v - ex) / (2.0 * (phi2 + v + ex) ** 2) - (x - a) / tau2
+
+        big_a = a.copy()
+        big_b = np.where(delta2 > phi2 + v, np.log(np.maximum(delta2 - phi2 - v, 1e-300)), a - self.tau)
+        needs_step = delta2 <= phi2 + v
+        k = np.ones_like(a)
+        for _ in range(100):
+            step = needs_step & (f(a - k * self.tau) < 0)
+            if not step.any():
+                break
+            k = np.where(step, k + 1, k)
+        big_b = np.where(needs_step, a - k * self.tau, big_b)
+
+        f_a, f_b = f(big_a), f(big_b)
+        for _ in range(100):
+            active = np.abs(big_b - big_a) > self.epsilon
+            if not active.any():
+                break
+            big_c = big_a + (big_a - big_b) * f_a / (f_b - f_a)
+            f_c = f(big_c)
+            swap = f_c * f_b <= 0
+            big_a = np.where(active, np.where(swap, big_b, big_a), big_a)
+            f_a = np.where(active, np.where(swap, f_b, f_a / 2.0), f_a)
+            big_b = np.where(active, big_c, big_b)
+            f_b = np.where(active, f_c, f_b)
+
+        return np.exp(big_a / 2.0)
+
+    def rate(self, rating, deviation, volatility, present, a_won):
+        mu = (rating - 1500.0) / self._SCALE
+        phi = deviation / self._SCALE
+
+        team_mu_a, team_mu_b = _team_means(mu, present)
+        team_phi2_a, team_phi2_b = _team_means(phi ** 2, present)
+        opp_mu = np.where(TEAM_A_SLOTS, team_mu_b[:, None], team_mu_a[:, None])
+        opp_phi = np.sqrt(np.where(TEAM_A_SLOTS, team_phi2_b[:, None], team_phi2_a[:, None]))
+        score = np.where(TEAM_A_SLOTS, a_won[:, None], ~a_won[:, None]).astype(np.float64)
+
+        g = 1.0 / np.sqrt(1.0 + 3.0 * opp_phi ** 2 / math.pi ** 2)
+        expected = 1.0 / (1.0 + np.exp(-g * (mu - opp_mu)))
+        v = 1.0 / (g ** 2 * expected * (1.0 - expected))
+        delta = v * g * (score - expected)
+
+        sigma = self._volatility(delta, phi, v, volatility)
+        phi_star = np.sqrt(phi ** 2 + sigma ** 2)
+        new_phi = 1.0 / np.sqrt(1.0 / phi_star ** 2 + 1.0 / v)
+        new_mu = mu + new_phi ** 2 * g * (score - expected)
+
+        new_rating = np.maximum(RATING_FLOOR, new_mu * self._SCALE + 1500.0)
+        new_deviation = np.clip(new_phi * self._SCALE, self.min_deviation, self.max_deviation)
+        return (
+            np.where(present, new_rating, rating),
+            np.where(present, new_deviation, deviation),
+            np.where(present, sigma, volatility),
+        )
+
+
+RATING_ENGINES: Dict[str, RatingEngine] = {
+    EloEngine.name: EloEngine(),
+    Glicko2Engine.name: Glicko2Engine(),
+}
+
+
+def get_rating_engine(name: str = DEFAULT_RATING_ENGINE) -> RatingEngine:
+    try:
+        return RATING_ENGINES[name or DEFAULT_RATING_ENGINE]
+    except KeyError:
+        raise RatingError(f"Unknown rating engine: {name}")
+
+
+def split_into_waves(slots: np.ndarray) -> List[np.ndarray]:
+    """Group matches so no player appears twice in a group, keeping each player's match order.
+
+    ``slots`` is (M, 4) of player indices with -1 for empty slots. Matches in
+    one wave can be rated together; waves must be applied in order.
+    """
+    last_wave: Dict[int, int] = {}
+    waves: List[List[int]] = []
+    for row, players in enumerate(slots.tolist()):
+        wave = 1 + max((last_wave.get(p, -1) for p in players if p >= 0), default=-1)
+        if wave == len(waves):
+            waves.append([])
+        waves[wave].append(row)
+        for p in players:
+            if p >= 0:
+                last_wave[p] = wave
+    return [np.asarray(w, dtype=np.int64) for w in waves]
+
+
+def apply_matches(
+    engine: RatingEngine,
+    table: RatingTable,
+    slots: np.ndarray,
+    a_won: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Apply M matches in order to ``table`` in place.
+
+    Returns the (M, 4) ratings before and after each match, with NaN in
+    empty slots and in matches that could not be rated.
+    """
+    slots = np.asarray(slots, dtype=np.int64).reshape(-1, 4)
+    a_won = np.asarray(a_won, dtype=bool).reshape(-1)
+    before = np.full(slots.shape, np.nan)
+    after = np.full(slots.shape, np.nan)
+
+    # A side with nobody in the table (e.g. guests outside a club) cannot be rated.
+    rateable = (slots[:, :2] >= 0).any(axis=1) & (slots[:, 2:] >= 0).any(axis=1)
+
+    for wave in split_into_waves(np.where(rateable[:, None], slots, -1)):
+        wave = wave[rateable[wave]]
+        if wave.size == 0:
+            continue
+        idx = slots[wave]
+        present = idx >= 0
+        safe = np.where(present, idx, 0)
+        rating, deviation, volatility = engine.rate(
+            table.rating[safe],
+            table.deviation[safe],
+            table.volatility[safe],
+            present,
+            a_won[wave],
+        )
+        before[wave] = np.where(present, table.rating[safe], np.nan)
+        after[wave] = np.where(present, rating, np.nan)
+        table.rating[idx[present]] = rating[present]
+        table.deviation[idx[present]] = deviation[present]
+        table.volatility[idx[present]] = volatility[present]
+
+    return before, after
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import math
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+BUCKETS = ("day", "week")
+
+
+def rating_change_rows(
+    match_id: str,
+    club_id: str,
+    recorded_at: datetime,
+    user_ids: Sequence[Optional[str]],
+    ratings: Sequence[float],
+    club_ratings: Sequence[float],
+) -> List[dict]:
+    """``rating_changes`` rows of one match from its slot-ordered players and new ratings.
+
+    Ratings are NaN where a slot was not rated, as ``apply_matches`` returns them.
+    """
+    rows = []
+    for uid, rating, club_rating in zip(user_ids, ratings, club_ratings):
+        if not uid or math.isnan(rating):
+            continue
+        rows.append(
+            {
+                "match_id": match_id,
+                "user_id": uid,
+                "club_id": club_id,
+                "recorded_at": recorded_at,
+                "rating": float(rating),
+                "club_rating": None if math.isnan(club_rating) else float(club_rating),
+            }
+        )
+    return rows
+
+
+def bucket_start(moment: datetime, bucket: str) -> date:
+    """The day ``moment`` falls on, or the Monday of its week."""
+    day = moment.date()
+    return day - timedelta(days=day.weekday()) if bucket == "week" else day
+
+
+def downsample(
+    samples: Iterable[Tuple[datetime, float]], bucket: str = "day", max_points: int = 120
+) -> List[Tuple[date, float, int]]:
+    """Chart points from time-ordered ``(recorded_at, rating)`` samples.
+
+    Each point is a bucket's start, the last rating in it and its number of
+    matches. With more buckets than ``max_points``, runs of neighbouring
+    buckets are merged into their last one, so the latest rating always
+    stays the final point.
+    """
+    points: List[List] = []
+    for moment, rating in samples:
+        start = bucket_start(moment, bucket)
+        if points and points[-1][0] == start:
+            points[-1][1] = rating
+            points[-1][2] += 1
+        else:
+            points.append([start, rating, 1])
+
+    if len(points) > max_points:
+        size = -(-len(points) // max_points)
+        runs = [points[max(end - size, 0):end] for end in range(len(points), 0, -size)]
+        points = [[run[-1][0], run[-1][1], sum(p[2] for p in run)] for run in reversed(runs)]
+    return [(start, rating, matches) for start, rating, matches in points]
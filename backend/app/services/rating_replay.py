@@ -0,0 +1,350 @@
+"""Recompute ratings, rating history, win/loss counters and per-player aggregates from match history.
+
+Completed matches are streamed in completion order through a server-side
+cursor, rated chunk by chunk on in-memory arrays, and the final state is
+written back with bulk UPDATEs in one transaction. Memory grows with the
+number of users and club members, not with the number of matches.
+
+Run it from the backend directory, ideally while no matches are being
+completed (results recorded during the replay are overwritten):
+
+    python -m app.services.rating_replay --chunk-size 20000
+
+``--monthly-only`` rebuilds just the monthly per-player rollups and leaves
+ratings, counters, history and pair stats alone.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Float, Integer, String, delete, insert, select
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.bulk import bulk_update
+from app.core.utils import month_start
+from app.models.models import (
+    Club,
+    ClubMember,
+    Match,
+    MatchStatus,
+    PairStats,
+    PlayerMonthlyStats,
+    RatingChange,
+    Session,
+    User,
+)
+from app.services.pair_stats import PairCounts, count_pairs, pair_rows
+from app.services.rating import (
+    DEFAULT_DEVIATION,
+    DEFAULT_RATING,
+    DEFAULT_VOLATILITY,
+    TEAM_A_SLOTS,
+    RatingTable,
+    apply_matches,
+    get_rating_engine,
+)
+from app.services.rating_history import rating_change_rows
+
+DEFAULT_CHUNK_SIZE = 20000
+WRITE_BATCH_SIZE = 5000
+
+# (club id, user id, month) -> [matches, wins]
+MonthlyCounts = Dict[Tuple[str, str, date], List[int]]
+
+
+@dataclass
+class ReplayReport:
+    matches: int = 0
+    users: int = 0
+    members: int = 0
+    monthly_rows: int = 0
+    rating_changes: int = 0
+    pair_rows: int = 0
+    seconds: float = 0.0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class _Counters:
+    def __init__(self, size: int):
+        self.table = RatingTable(
+            rating=np.full(size, DEFAULT_RATING),
+            deviation=np.full(size, DEFAULT_DEVIATION),
+            volatility=np.full(size, DEFAULT_VOLATILITY),
+        )
+        self.played = np.zeros(size, dtype=np.int64)
+        self.wins = np.zeros(size, dtype=np.int64)
+
+    def count(self, slots: np.ndarray, a_won: np.ndarray) -> None:
+        present = slots >= 0
+        won = present & (TEAM_A_SLOTS == a_won[:, None])
+        np.add.at(self.played, slots[present], 1)
+        np.add.at(self.wins, slots[won], 1)
+
+
+def _runs(codes: np.ndarray) -> List[Tuple[int, int]]:
+    """Start/end of each run of equal consecutive values."""
+    if codes.size == 0:
+        return []
+    cuts = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    bounds = np.concatenate(([0], cuts, [codes.size]))
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def _match_stream(conn: Connection, chunk_size: int):
+    stmt = (
+        select(
+            Match.team_a_player_1_id,
+            Match.team_a_player_2_id,
+            Match.team_b_player_1_id,
+            Match.team_b_player_2_id,
+            Match.winner_team,
+            Session.club_id,
+            Match.completed_at,
+            Match.id,
+        )
+        .join(Session, Session.id == Match.session_id)
+        .where(Match.status == MatchStatus.COMPLETED, Match.winner_team.in_(["A", "B"]))
+        .order_by(Match.completed_at.asc(), Match.id.asc())
+    )
+    result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(stmt)
+    return result.partitions(chunk_size)
+
+
+def _write_rows(conn: Connection, table, key: str, types: Dict[str, object], rows: List[dict]) -> None:
+    """UPDATE many rows by primary key, one statement per batch."""
+    for stmt, params in bulk_update(conn.dialect.name, table, key, types, rows, batch_size=WRITE_BATCH_SIZE):
+        conn.execute(stmt, params)
+
+
+def _count_months(monthly: MonthlyCounts, rows: Sequence[tuple]) -> None:
+    for row in rows:
+        if not row[6]:
+            continue
+        month = month_start(row[6])
+        for slot, uid in enumerate(row[:4]):
+            if uid:
+                count = monthly.setdefault((row[5], uid, month), [0, 0])
+                count[0] += 1
+                count[1] += 1 if (slot < 2) == (row[4] == "A") else 0
+
+
+def _write_months(conn: Connection, monthly: MonthlyCounts) -> None:
+    conn.execute(delete(PlayerMonthlyStats))
+    rows = [
+        {"club_id": club_id, "user_id": uid, "month": month, "matches": played, "wins": won}
+        for (club_id, uid, month), (played, won) in monthly.items()
+    ]
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        conn.execute(insert(PlayerMonthlyStats.__table__), rows[start:start + WRITE_BATCH_SIZE])
+
+
+def replay_ratings(conn: Connection, chunk_size: int = DEFAULT_CHUNK_SIZE, dry_run: bool = False) -> ReplayReport:
+    """Replay all completed matches on ``conn`` and overwrite the stored ratings.
+
+    The caller owns the transaction; nothing is committed here.
+    """
+    began = time.perf_counter()
+    report = ReplayReport()
+
+    user_ids = list(conn.execute(select(User.id)).scalars())
+    user_index = {uid: i for i, uid in enumerate(user_ids)}
+    member_rows = conn.execute(select(ClubMember.id, ClubMember.club_id, ClubMember.user_id)).all()
+    member_index = {(club_id, uid): i for i, (_, club_id, uid) in enumerate(member_rows)}
+    engine_names = dict(conn.execute(select(Club.id, Club.rating_engine)).all())
+
+    engine_codes: Dict[str, int] = {}
+    engines = []
+    users = _Counters(len(user_ids))
+    members = _Counters(len(member_rows))
+    monthly: MonthlyCounts = {}
+    pairs: PairCounts = {}
+    if not dry_run:
+        # History rows are written chunk by chunk as the replay goes.
+        conn.execute(delete(RatingChange))
+
+    for rows in _match_stream(conn, chunk_size):
+        user_slots = np.array(
+            [[user_index.get(uid, -1) if uid else -1 for uid in row[:4]] for row in rows],
+            dtype=np.int64,
+        ).reshape(-1, 4)
+        member_slots = np.array(
+            [[member_index.get((row[5], uid), -1) if uid else -1 for uid in row[:4]] for row in rows],
+            dtype=np.int64,
+        ).reshape(-1, 4)
+        a_won = np.array([row[4] == "A" for row in rows], dtype=bool)
+
+        codes = np.empty(len(rows), dtype=np.int64)
+        for i, row in enumerate(rows):
+            name = engine_names.get(row[5]) or ""
+            if name not in engine_codes:
+                engine_codes[name] = len(engines)
+                engines.append(get_rating_engine(name))
+            codes[i] = engine_codes[name]
+
+        # Clubs may use different engines; rate each same-engine run in order.
+        user_after = np.full(user_slots.shape, np.nan)
+        member_after = np.full(member_slots.shape, np.nan)
+        for start, end in _runs(codes):
+            engine = engines[codes[start]]
+            _, user_after[start:end] = apply_matches(engine, users.table, user_slots[start:end], a_won[start:end])
+            _, member_after[start:end] = apply_matches(
+                engine, members.table, member_slots[start:end], a_won[start:end]
+            )
+
+        history = [
+            change
+            for i, row in enumerate(rows)
+            if row[6]
+            for change in rating_change_rows(row[7], row[5], row[6], row[:4], user_after[i], member_after[i])
+        ]
+        report.rating_changes += len(history)
+        if history and not dry_run:
+            conn.execute(insert(RatingChange.__table__), history)
+
+        users.count(user_slots, a_won)
+        members.count(member_slots, a_won)
+        for row in rows:
+            count_pairs(pairs, row[5], row[:4], row[4])
+        _count_months(monthly, rows)
+        report.matches += len(rows)
+
+    report.users = len(user_ids)
+    report.members = len(member_rows)
+    report.monthly_rows = len(monthly)
+    report.pair_rows = len(pairs)
+
+    if not dry_run:
+        _write_rows(
+            conn,
+            User.__table__,
+            "id",
+            {
+                "id": String,
+                "rating": Float,
+                "rating_deviation": Float,
+                "rating_volatility": Float,
+                "wins": Integer,
+                "losses": Integer,
+                "total_matches": Integer,
+            },
+            [
+                {
+                    "id": uid,
+                    "rating": float(users.table.rating[i]),
+                    "rating_deviation": float(users.table.deviation[i]),
+                    "rating_volatility": float(users.table.volatility[i]),
+                    "wins": int(users.wins[i]),
+                    "losses": int(users.played[i] - users.wins[i]),
+                    "total_matches": int(users.played[i]),
+                }
+                for i, uid in enumerate(user_ids)
+            ],
+        )
+        _write_rows(
+            conn,
+            ClubMember.__table__,
+            "id",
+            {
+                "id": Integer,
+                "rating_in_club": Float,
+                "rating_deviation_in_club": Float,
+                "rating_volatility_in_club": Float,
+                "wins_in_club": Integer,
+                "matches_in_club": Integer,
+            },
+            [
+                {
+                    "id": member_id,
+                    "rating_in_club": float(members.table.rating[i]),
+                    "rating_deviation_in_club": float(members.table.deviation[i]),
+                    "rating_volatility_in_club": float(members.table.volatility[i]),
+                    "wins_in_club": int(members.wins[i]),
+                    "matches_in_club": int(members.played[i]),
+                }
+                for i, (member_id, _, _) in enumerate(member_rows)
+            ],
+        )
+        _write_months(conn, monthly)
+        conn.execute(delete(PairStats))
+        all_pairs = pair_rows(pairs)
+        for start in range(0, len(all_pairs), WRITE_BATCH_SIZE):
+            conn.execute(insert(PairStats.__table__), all_pairs[start:start + WRITE_BATCH_SIZE])
+
+    report.seconds = round(time.perf_counter() - began, 3)
+    return report
+
+
+def rebuild_monthly_stats(conn: Connection, chunk_size: int = DEFAULT_CHUNK_SIZE, dry_run: bool = False) -> ReplayReport:
+    """Recount the monthly rollups from completed matches and overwrite them.
+
+    The caller owns the transaction; nothing is committed here.
+    """
+    began = time.perf_counter()
+    report = ReplayReport()
+    monthly: MonthlyCounts = {}
+    for rows in _match_stream(conn, chunk_size):
+        _count_months(monthly, rows)
+        report.matches += len(rows)
+    report.monthly_rows = len(monthly)
+    if not dry_run:
+        _write_months(conn, monthly)
+    report.seconds = round(time.perf_counter() - began, 3)
+    return report
+
+
+def run_replay(
+    engine: Engine, chunk_size: int = DEFAULT_CHUNK_SIZE, dry_run: bool = False, monthly_only: bool = False
+) -> ReplayReport:
+    """Run a replay, or only the monthly rebuild, in its own transaction on a consistent snapshot."""
+    replay = rebuild_monthly_stats if monthly_only else replay_ratings
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn = conn.execution_options(isolation_level="REPEATABLE READ")
+        with conn.begin():
+            return replay(conn, chunk_size=chunk_size, dry_run=dry_run)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recompute ratings and win/loss counters from match history.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="matches fetched per chunk")
+    parser.add_argument("--dry-run", action="store_true", help="replay without writing results")
+    parser.add_argument("--monthly-only", action="store_true", help="only rebuild the monthly match rollups")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    from app.core.database import sync_engine
+
+    report = run_replay(sync_engine, chunk_size=args.chunk_size, dry_run=args.dry_run, monthly_only=args.monthly_only)
+    if not args.dry_run and not args.monthly_only:
+        import asyncio
+
+        from app.services.leaderboard import invalidate_leaderboards
+
+        # Club leaderboards still hold the old ratings.
+        asyncio.run(invalidate_leaderboards())
+    if args.json:
+        print(json.dumps(report.to_dict()))
+    elif args.monthly_only:
+        print(
+            f"rebuilt {report.monthly_rows} monthly rows from {report.matches} matches "
+            f"in {report.seconds}s{' (dry run)' if args.dry_run else ''}"
+        )
+    else:
+        print(
+            f"replayed {report.matches} matches for {report.users} users and {report.members} club members "
+            f"in {report.seconds}s{' (dry run)' if args.dry_run else ''}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import structlog
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.bulk import insert_ignore
+from app.core.redis import get_redis
+from app.models.models import Match, MatchPoint
+from app.services.scoring import POINT, UNDO, LiveScore, ScoringError, fold_events
+
+logger = structlog.get_logger()
+
+# A match is scored within an evening; abandoned streams expire on their own.
+POINT_STREAM_TTL_SECONDS = 60 * 60 * 12
+FLUSH_BATCH_SIZE = 1000
+
+_DIRTY_KEY = "match_points:dirty"
+
+# Appends one tap to a match's stream under the next sequence number and
+# marks the match for flushing. Returns 0 when the sequence counter is
+# missing so the caller can seed it from the database first.
+# KEYS: stream, seq, dirty set. ARGV: ttl, match id, kind, team, recorded by, timestamp
+_APPEND_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+  return 0
+end
+local seq = redis.call('INCR', KEYS[2])
+redis.call('XADD', KEYS[1], '*', 'seq', seq, 'kind', ARGV[3], 'team', ARGV[4], 'by', ARGV[5], 'ts', ARGV[6])
+redis.call('SADD', KEYS[3], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return seq
+"""
+
+Event = Tuple[int, str, Optional[str]]
+
+
+def _stream_key(match_id: str) -> str:
+    return f"match_points:{match_id}"
+
+
+def _seq_key(match_id: str) -> str:
+    return f"match_points_seq:{match_id}"
+
+
+def _cursor_key(match_id: str) -> str:
+    return f"match_points_flushed:{match_id}"
+
+
+def _to_ts(dt: datetime) -> float:
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _from_ts(value: str) -> datetime:
+    return datetime.fromtimestamp(float(value), tz=timezone.utc).replace(tzinfo=None)
+
+
+def _point_row(match_id: str, fields: Dict[str, str]) -> dict:
+    return {
+        "match_id": match_id,
+        "seq": int(fields["seq"]),
+        "kind": fields["kind"],
+        "team": fields["team"] or None,
+        "recorded_by": fields["by"] or None,
+        "created_at": _from_ts(fields["ts"]),
+    }
+
+
+async def _stored_events(db: AsyncSession, match_id: str) -> List[Event]:
+    rows = (
+        await db.execute(
+            select(MatchPoint.seq, MatchPoint.kind, MatchPoint.team)
+            .where(MatchPoint.match_id == match_id)
+            .order_by(MatchPoint.seq)
+        )
+    ).all()
+    return [tuple(row) for row in rows]
+
+
+async def _stream_rows(match_id: str) -> Optional[List[dict]]:
+    """Rows still held in the match's stream; None when Redis is unavailable."""
+    try:
+        r = await get_redis()
+        entries = await r.xrange(_stream_key(match_id))
+    except Exception as e:
+        logger.warning("Score stream unavailable", match_id=match_id, error=str(e))
+        return None
+    return [_point_row(match_id, fields) for _, fields in entries]
+
+
+def _merge(stored: List[Event], streamed: List[dict]) -> List[Event]:
+    events = {seq: (seq, kind, team) for seq, kind, team in stored}
+    for row in streamed:
+        events.setdefault(row["seq"], (row["seq"], row["kind"], row["team"]))
+    return [events[seq] for seq in sorted(events)]
+
+
+async def load_events(db: AsyncSession, match_id: str) -> List[Event]:
+    """All taps of a match in order.
+
+    The stream keeps every tap until the match is completed, so the
+    database is only read when the stream does not start at the first tap.
+    """
+    streamed = await _stream_rows(match_id) or []
+    if streamed and streamed[0]["seq"] == 1:
+        return _merge([], streamed)
+    return _merge(await _stored_events(db, match_id), streamed)
+
+
+def live_score(events: List[Event]) -> LiveScore:
+    return fold_events((kind, team) for _, kind, team in events)
+
+
+async def _append_cached(db: AsyncSession, match_id: str, kind: str, team: Optional[str], user_id: str) -> int:
+    r = await get_redis()
+    keys = (_stream_key(match_id), _seq_key(match_id), _DIRTY_KEY)
+    args = (POINT_STREAM_TTL_SECONDS, match_id, kind, team or "", user_id, repr(_to_ts(datetime.utcnow())))
+    seq = await r.eval(_APPEND_SCRIPT, len(keys), *keys, *args)
+    if not seq:
+        stored = (
+            await db.execute(select(func.max(MatchPoint.seq)).where(MatchPoint.match_id == match_id))
+        ).scalar_one_or_none()
+        await r.set(_seq_key(match_id), stored or 0, nx=True, ex=POINT_STREAM_TTL_SECONDS)
+        seq = await r.eval(_APPEND_SCRIPT, len(keys), *keys, *args)
+    return int(seq)
+
+
+async def _append_stored(db: AsyncSession, match_id: str, seq: int, kind: str, team: Optional[str], user_id: str) -> None:
+    try:
+        async with db.begin_nested():
+            db.add(MatchPoint(match_id=match_id, seq=seq, kind=kind, team=team, recorded_by=user_id))
+    except IntegrityError:
+        raise ScoringError("Score changed concurrently, retry")
+
+
+async def record_point(
+    db: AsyncSession, match_id: str, kind: str, team: Optional[str], user_id: str
+) -> Tuple[int, LiveScore]:
+    """Append a tap and return its sequence number with the resulting score.
+
+    Taps go to the match's Redis stream and reach the database through
+    ``flush_points``; without Redis each tap is inserted directly.
+    """
+    events = await load_events(db, match_id)
+    score = live_score(events)
+    if kind == POINT and score.winner_team:
+        raise ScoringError("Match already decided")
+    if kind == UNDO and not score.rallies:
+        raise ScoringError("No point to undo")
+
+    try:
+        seq = await _append_cached(db, match_id, kind, team, user_id)
+    except Exception as e:
+        logger.warning("Score stream unavailable, writing point through", match_id=match_id, error=str(e))
+        seq = (events[-1][0] if events else 0) + 1
+        await _append_stored(db, match_id, seq, kind, team, user_id)
+
+    return seq, live_score(events + [(seq, kind, team)])
+
+
+async def _existing_matches(db: AsyncSession, match_ids: List[str]) -> set:
+    return set((await db.execute(select(Match.id).where(Match.id.in_(match_ids)))).scalars())
+
+
+async def flush_points(session_factory: Callable[[], AsyncSession], batch_size: int = FLUSH_BATCH_SIZE) -> int:
+    """Copy buffered taps of every dirty match to the database in one insert.
+
+    Matches are taken off the dirty set before their streams are read, so a
+    tap arriving meanwhile marks its match again. Returns the rows written.
+    """
+    r = await get_redis()
+    match_ids = sorted(await r.smembers(_DIRTY_KEY))
+    if not match_ids:
+        return 0
+    await r.srem(_DIRTY_KEY, *match_ids)
+
+    try:
+        cursors = dict(zip(match_ids, await r.mget([_cursor_key(mid) for mid in match_ids])))
+        async with r.pipeline(transaction=False) as pipe:
+            for mid in match_ids:
+                pipe.xrange(_stream_key(mid), min=f"({cursors[mid]}" if cursors[mid] else "-", count=batch_size)
+            streams = await pipe.execute()
+
+        rows: List[dict] = []
+        new_cursors: Dict[str, str] = {}
+        backlog: List[str] = []
+        for mid, entries in zip(match_ids, streams):
+            if not entries:
+                continue
+            rows.extend(_point_row(mid, fields) for _, fields in entries)
+            new_cursors[mid] = entries[-1][0]
+            if len(entries) == batch_size:
+                backlog.append(mid)
+
+        if rows:
+            async with session_factory() as db:
+                # Points of matches deleted in the meantime are dropped.
+                existing = await _existing_matches(db, list(new_cursors))
+                rows = [row for row in rows if row["match_id"] in existing]
+                if rows:
+                    stmt = insert_ignore(db.get_bind().dialect.name, MatchPoint.__table__, ("match_id", "seq"))
+                    await db.execute(stmt, rows)
+                await db.commit()
+
+        if new_cursors:
+            async with r.pipeline(transaction=False) as pipe:
+                for mid, cursor in new_cursors.items():
+                    pipe.set(_cursor_key(mid), cursor, ex=POINT_STREAM_TTL_SECONDS)
+                await pipe.execute()
+        if backlog:
+            await r.sadd(_DIRTY_KEY, *backlog)
+    except Exception:
+        await r.sadd(_DIRTY_KEY, *match_ids)
+        raise
+    return len(rows)
+
+
+async def run_point_flusher(session_factory: Callable[[], AsyncSession], interval_seconds: float) -> None:
+    """Flush buffered taps every ``interval_seconds`` until cancelled."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await flush_points(session_factory)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Failed to flush score points", error=str(e))
+
+
+async def finalize_points(db: AsyncSession, match_id: str) -> Optional[LiveScore]:
+    """Persist a match's remaining taps and return its final score; None if it had no taps."""
+    streamed = await _stream_rows(match_id) or []
+    stored = await _stored_events(db, match_id)
+    known = {seq for seq, _, _ in stored}
+    missing = [row for row in streamed if row["seq"] not in known]
+    if missing:
+        stmt = insert_ignore(db.get_bind().dialect.name, MatchPoint.__table__, ("match_id", "seq"))
+        await db.execute(stmt, missing)
+
+    events = _merge(stored, streamed)
+    return live_score(events) if events else None
+
+
+async def discard_point_stream(match_id: str) -> None:
+    """Drop a completed match's stream. Call after its points are committed."""
+    try:
+        r = await get_redis()
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.delete(_stream_key(match_id), _seq_key(match_id), _cursor_key(match_id))
+            pipe.srem(_DIRTY_KEY, match_id)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("Failed to discard score stream", match_id=match_id, error=str(e))
@@ -0,0 +1,94 @@
+"""Badminton rally scoring, folded from a stream of point events."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Tuple
+
+POINTS_TO_WIN_SET = 21
+POINT_CAP = 30
+SETS_TO_WIN = 2
+
+POINT = "point"
+UNDO = "undo"
+TEAMS = ("A", "B")
+
+
+class ScoringError(Exception):
+    pass
+
+
+@dataclass
+class LiveScore:
+    """Set by set score of a match; the last set is the one being played."""
+
+    sets: List[List[int]] = field(default_factory=lambda: [[0, 0]])
+    winner_team: Optional[str] = None
+    rallies: int = 0
+
+    @property
+    def sets_won(self) -> Tuple[int, int]:
+        won = [0, 0]
+        for a, b in self.sets:
+            if _set_over(a, b):
+                won[0 if a > b else 1] += 1
+        return won[0], won[1]
+
+    def score_string(self) -> str:
+        """The ``"21-19,18-21"`` form stored in ``Match.score``; unstarted sets are left out."""
+        return ",".join(f"{a}-{b}" for a, b in self.sets if a or b)
+
+    def set_scores(self) -> dict:
+        """The JSON stored in ``Match.set_scores``."""
+        return {
+            "sets": [{"team_a": a, "team_b": b} for a, b in self.sets if a or b],
+            "winner_team": self.winner_team,
+        }
+
+
+def _set_over(a: int, b: int) -> bool:
+    high, low = max(a, b), min(a, b)
+    return high >= POINT_CAP or (high >= POINTS_TO_WIN_SET and high - low >= 2)
+
+
+def rallies_from_events(events: Iterable[Tuple[str, str]]) -> List[str]:
+    """Winning team of every rally that stands, given ``(kind, team)`` events in order.
+
+    An undo event takes back the most recent rally still standing.
+    """
+    rallies: List[str] = []
+    for kind, team in events:
+        if kind == UNDO:
+            if rallies:
+                rallies.pop()
+        elif kind == POINT:
+            rallies.append(team)
+        else:
+            raise ScoringError(f"Unknown score event: {kind}")
+    return rallies
+
+
+def score_rallies(rallies: Iterable[str]) -> LiveScore:
+    """Play rallies through the set and match rules.
+
+    Rallies after the match has been decided are ignored.
+    """
+    score = LiveScore()
+    for team in rallies:
+        if score.winner_team:
+            break
+        if team not in TEAMS:
+            raise ScoringError(f"Unknown team: {team}")
+        current = score.sets[-1]
+        current[TEAMS.index(team)] += 1
+        score.rallies += 1
+        if _set_over(*current):
+            won_a, won_b = score.sets_won
+            if won_a >= SETS_TO_WIN or won_b >= SETS_TO_WIN:
+                score.winner_team = "A" if won_a > won_b else "B"
+            else:
+                score.sets.append([0, 0])
+    return score
+
+
+def fold_events(events: Iterable[Tuple[str, str]]) -> LiveScore:
+    return score_rallies(rallies_from_events(events))
@@ -56,6 +56,9 @@ class SocketManager:
     async def broadcast_match_update(self, session_id: str, payload: Dict[str, Any]) -> None:
         await self.sio.emit("match_updated", payload, room=f"session:{session_id}")
 
+    async def broadcast_matches_updated(self, session_id: str, payload: Dict[str, Any]) -> None:
+        await self.sio.emit("matches_updated", payload, room=f"session:{session_id}")
+
     async def broadcast_player_joined(self, session_id: str, payload: Dict[str, Any]) -> None:
         await self.sio.emit("player_joined", payload, room=f"session:{session_id}")
 
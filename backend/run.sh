@@ -3,7 +3,7 @@ set -e
 
 echo "🔄 $(date) - Starting setup..."
 
-echo "🗄️  Creating database tables..."
+echo "🗄️  Creating and upgrading database tables..."
 python3 << 'PYEOF'
 import asyncio
 import os
@@ -24,8 +24,5 @@ async def setup():
 asyncio.run(setup())
 PYEOF
 
-echo "🔧 Running migrations (if any)..."
-python scripts/run_migrations_direct.py || echo "⚠️  Migration script completed with warnings"
-
 echo "🚀 Starting application..."
 uvicorn app.main:app --host 0.0.0.0 --port ${PORT:-8000}
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import SQLModel
+
+from app.models.models import Club, Match, MatchPlayer, Session, User
+from app.services.match_players import match_player_rows, needs_backfill, run_backfill
+
+DONE = datetime(2026, 3, 1, 20, 0, 0)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _seed(engine):
+    with OrmSession(engine) as db:
+        for uid in ("p1", "p2", "p3", "p4"):
+            db.add(User(id=uid, line_user_id=uid, display_name=uid))
+        db.add(Club(id="c", name="C", slug="c", owner_id="p1"))
+        db.flush()
+        db.add(Session(id="s", club_id="c", title="t", start_time=DONE, created_by="p1"))
+        db.flush()
+        db.add(
+            Match(
+                id="doubles",
+                session_id="s",
+                team_a_player_1_id="p1",
+                team_a_player_2_id="p2",
+                team_b_player_1_id="p3",
+                team_b_player_2_id="p4",
+                status="completed",
+                completed_at=DONE,
+            )
+        )
+        db.add(Match(id="singles", session_id="s", team_a_player_1_id="p2", team_b_player_1_id="p4", status="ongoing"))
+        db.commit()
+
+
+def test_backfill_copies_players_once(engine):
+    _seed(engine)
+    with engine.connect() as conn:
+        assert needs_backfill(conn)
+
+    assert run_backfill(engine) == 6
+    assert run_backfill(engine) == 0
+
+    with OrmSession(engine) as db:
+        rows = {
+            (r.match_id, r.user_id): (r.team, r.club_id, r.completed_at)
+            for r in db.execute(select(MatchPlayer)).scalars()
+        }
+    assert rows[("doubles", "p2")] == ("A", "c", DONE)
+    assert rows[("doubles", "p3")] == ("B", "c", DONE)
+    assert rows[("singles", "p4")] == ("B", "c", None)
+    with engine.connect() as conn:
+        assert not needs_backfill(conn)
+
+
+def test_rows_skip_empty_slots():
+    match = Match(id="m", session_id="s", team_a_player_1_id="p1", team_b_player_1_id="p2")
+
+    rows = match_player_rows("c", match)
+
+    assert [(r["user_id"], r["team"]) for r in rows] == [("p1", "A"), ("p2", "B")]
+    assert {r["club_id"] for r in rows} == {"c"}
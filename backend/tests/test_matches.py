@@ -60,3 +60,106 @@ async def test_create_match_and_update_score(client, auth_headers, second_user_h
     )
     assert score.status_code == 200
     assert score.json()["winner_team"] == "A"
+
+
+@pytest.mark.asyncio
+async def test_auto_fill_opens_courts_without_a_court_count(
+    client, auth_headers, second_user_headers, third_user_headers, fourth_user_headers
+):
+    club = await client.post(
+        "/api/v1/clubs",
+        json={"name": "Fill Club", "slug": "fill-club", "description": "desc", "is_public": True},
+        headers=auth_headers,
+    )
+    assert club.status_code == 201
+    club_id = club.json()["id"]
+    track_club(club_id)
+
+    for headers in [second_user_headers, third_user_headers, fourth_user_headers]:
+        await client.post(f"/api/v1/clubs/{club_id}/join", headers=headers)
+
+    session = await client.post(
+        f"/api/v1/clubs/{club_id}/sessions",
+        json={"title": "Fill Session", "start_time": "2026-02-20T20:00:00", "max_participants": 8},
+        headers=auth_headers,
+    )
+    assert session.status_code == 201
+    assert session.json()["number_of_courts"] is None
+    session_id = session.json()["id"]
+    track_session(session_id)
+
+    await client.post(f"/api/v1/sessions/{session_id}/open", headers=auth_headers)
+    for headers in [auth_headers, second_user_headers, third_user_headers, fourth_user_headers]:
+        response = await client.post(f"/api/v1/sessions/{session_id}/register", headers=headers)
+        assert response.status_code == 200
+
+    filled = await client.post(f"/api/v1/sessions/{session_id}/matches/auto-fill", headers=auth_headers)
+    assert filled.status_code == 201
+    assert [m["court_number"] for m in filled.json()] == [1]
+
+    again = await client.post(f"/api/v1/sessions/{session_id}/matches/auto-fill", headers=auth_headers)
+    assert again.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_status_completion_applies_the_result(
+    client, auth_headers, second_user_headers, third_user_headers, fourth_user_headers
+):
+    club = await client.post(
+        "/api/v1/clubs",
+        json={"name": "Status Club", "slug": "status-club", "description": "desc", "is_public": True},
+        headers=auth_headers,
+    )
+    assert club.status_code == 201
+    club_id = club.json()["id"]
+    track_club(club_id)
+
+    for headers in [second_user_headers, third_user_headers, fourth_user_headers]:
+        await client.post(f"/api/v1/clubs/{club_id}/join", headers=headers)
+
+    session = await client.post(
+        f"/api/v1/clubs/{club_id}/sessions",
+        json={"title": "Status Session", "start_time": "2026-02-20T20:00:00", "max_participants": 8},
+        headers=auth_headers,
+    )
+    assert session.status_code == 201
+    session_id = session.json()["id"]
+    track_session(session_id)
+
+    await client.post(f"/api/v1/sessions/{session_id}/open", headers=auth_headers)
+    players = [auth_headers, second_user_headers, third_user_headers, fourth_user_headers]
+    for headers in players:
+        response = await client.post(f"/api/v1/sessions/{session_id}/register", headers=headers)
+        assert response.status_code == 200
+
+    before = [(await client.get("/api/v1/auth/me", headers=headers)).json() for headers in players]
+    match = await client.post(
+        f"/api/v1/sessions/{session_id}/matches",
+        json={
+            "court_number": 1,
+            "team_a_player_1_id": before[0]["id"],
+            "team_a_player_2_id": before[1]["id"],
+            "team_b_player_1_id": before[2]["id"],
+            "team_b_player_2_id": before[3]["id"],
+        },
+        headers=auth_headers,
+    )
+    assert match.status_code == 201
+    match_id = match.json()["id"]
+
+    await client.patch(
+        f"/api/v1/matches/{match_id}/score",
+        json={"score": "21-15", "winner_team": "A"},
+        headers=auth_headers,
+    )
+    done = await client.patch(f"/api/v1/matches/{match_id}/status", json={"status": "completed"}, headers=auth_headers)
+    assert done.status_code == 200
+    assert done.json()["status"] == "completed"
+    assert done.json()["winner_team"] == "A"
+
+    # Ratings and win counts move just as they do for /complete.
+    after = [(await client.get("/api/v1/auth/me", headers=headers)).json() for headers in players]
+    for i, (old, new) in enumerate(zip(before, after)):
+        assert new["total_matches"] == old["total_matches"] + 1
+        assert new["wins"] == old["wins"] + (1 if i < 2 else 0)
+        assert (new["rating"] > old["rating"]) == (i < 2)
@@ -214,6 +214,10 @@ async def test_matchmaking_16_players_fair():
         
         # ต้องมี 4 คู่ (แบดมินตันคู่ = 4 คนต่อคู่, 16 คน = 4 คู่)
         assert len(matches) == 4, f"Expected 4 matches, got {len(matches)}"
+
+        # session ไม่ได้กำหนดจำนวนคอร์ท: แต่ละคู่เปิดคอร์ทใหม่ของตัวเอง
+        courts = sorted(match["court_number"] for match in matches)
+        assert courts == [1, 2, 3, 4], f"Expected courts 1-4, got {courts}"
         
         # ตรวจสอบว่าทุกคนมีคู่
         matched_players = set()
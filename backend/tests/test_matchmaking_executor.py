@@ -0,0 +1,90 @@
+import asyncio
+import math
+import time
+
+import pytest
+
+from app.services.matchmaking import MatchmakingError
+from app.services.matchmaking_executor import EXECUTOR_INLINE, EXECUTOR_PROCESS, MatchmakingExecutor
+
+
+def _greedy(*args):
+    return "greedy"
+
+
+def _no_match(*args):
+    raise MatchmakingError("Need at least 4 players")
+
+
+@pytest.mark.asyncio
+async def test_inline_mode_runs_the_search_directly():
+    executor = MatchmakingExecutor()
+    executor.configure(EXECUTOR_INLINE, workers=1, deadline_ms=1, min_players=0)
+
+    assert await executor.run("match", math.factorial, _greedy, 100, 5) == 120
+    stats = executor.metrics()["searches"]["match"]
+    assert stats["calls"] == 1
+    assert stats["offloaded"] == 0
+    assert stats["fallbacks"] == 0
+
+
+@pytest.mark.asyncio
+async def test_process_mode_falls_back_after_the_deadline():
+    executor = MatchmakingExecutor()
+    executor.configure(EXECUTOR_PROCESS, workers=1, deadline_ms=10000, min_players=10, grace_ms=100)
+    try:
+        assert await executor.run("round", math.factorial, _greedy, 50, 5) == 120
+        # Small pools stay inline.
+        assert await executor.run("round", math.factorial, _greedy, 4, 6) == 720
+
+        executor.deadline_ms = 50
+        began = time.perf_counter()
+        assert await executor.run("round", time.sleep, _greedy, 50, 2) == "greedy"
+        assert time.perf_counter() - began < 1.5
+
+        # The late search still runs after the grace period, so its pool is replaced.
+        await asyncio.sleep(0.3)
+        executor.deadline_ms = 10000
+        began = time.perf_counter()
+        assert await executor.run("round", math.factorial, _greedy, 50, 4) == 24
+        assert time.perf_counter() - began < 1.5
+
+        stats = executor.metrics()["searches"]["round"]
+        assert stats["calls"] == 4
+        assert stats["offloaded"] == 3
+        assert stats["timeouts"] == 1
+        assert stats["fallbacks"] == 1
+        assert stats["latency_ms"]["max"] >= 50
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_a_late_search_does_not_fail_the_others():
+    executor = MatchmakingExecutor()
+    executor.configure(EXECUTOR_PROCESS, workers=2, deadline_ms=10000, min_players=10, grace_ms=100)
+    try:
+        # Wait for both workers to come up.
+        await asyncio.gather(*(executor.run("round", math.factorial, _greedy, 50, 5) for _ in range(2)))
+
+        executor.deadline_ms = 1000
+        late = asyncio.create_task(executor.run("round", time.sleep, _greedy, 50, 3))
+        await asyncio.sleep(0.5)
+        # Still running when the first search misses its deadline, done before its own.
+        assert await executor.run("round", time.sleep, _greedy, 50, 0.8) is None
+        assert await late == "greedy"
+
+        stats = executor.metrics()["searches"]["round"]
+        assert stats["timeouts"] == 1
+        assert stats["fallbacks"] == 1
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_matchmaking_errors_are_not_hidden_by_the_fallback():
+    executor = MatchmakingExecutor()
+    executor.configure(EXECUTOR_INLINE, workers=1, deadline_ms=1, min_players=0)
+
+    with pytest.raises(MatchmakingError):
+        await executor.run("match", _no_match, _greedy, 100)
@@ -0,0 +1,148 @@
+import random
+from datetime import datetime, timedelta
+from itertools import combinations
+
+import pytest
+
+from app.services.matchmaking import (
+    OPPONENT_REPEAT_WEIGHT,
+    PARTNER_REPEAT_WEIGHT,
+    CandidatePlayer,
+    MatchmakingError,
+    PairHistory,
+    _minutes_since,
+    _priority_scores_np,
+    create_balanced_teams,
+    generate_fair_doubles_match,
+    select_fair_players,
+)
+from app.services.matchmaking_optimizer import (
+    PRIORITY_WEIGHT,
+    MatchConstraints,
+    best_match,
+    greedy_match,
+    optimize_match,
+)
+
+
+NOW = datetime(2026, 2, 20, 20, 0, 0)
+
+
+def _players(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [
+        CandidatePlayer(
+            user_id=f"p{i:03d}",
+            rating=rng.gauss(1000, 150),
+            matches_played=rng.randint(0, 3),
+            last_played_at=NOW - timedelta(minutes=rng.randint(0, 50)),
+        )
+        for i in range(count)
+    ]
+
+
+def _history(players, matches: int, seed: int = 2) -> PairHistory:
+    rng = random.Random(seed)
+    history = PairHistory(p.user_id for p in players)
+    ids = [p.user_id for p in players]
+    for _ in range(matches):
+        a = rng.sample(ids, 4)
+        history.add_match(tuple(a[:2]), tuple(a[2:]))
+    return history
+
+
+def _brute_force_cost(players, history) -> float:
+    priority = _priority_scores_np(
+        [float(p.matches_played) for p in players],
+        [_minutes_since(p.last_played_at, NOW) for p in players],
+        [float(p.rating) for p in players],
+    )
+    by_id = {p.user_id: (p, float(priority[i])) for i, p in enumerate(players)}
+    best = float("inf")
+    for four in combinations(by_id, 4):
+        base = -PRIORITY_WEIGHT * sum(by_id[uid][1] for uid in four)
+        a, b, c, d = four
+        for team_a, team_b in (((a, b), (c, d)), ((a, c), (b, d)), ((a, d), (b, c))):
+            gap = abs(sum(by_id[x][0].rating for x in team_a) - sum(by_id[x][0].rating for x in team_b))
+            partners = history.partner_count(*team_a) + history.partner_count(*team_b)
+            opponents = sum(history.opponent_count(x, y) for x in team_a for y in team_b)
+            best = min(best, base + gap + partners * PARTNER_REPEAT_WEIGHT + opponents * OPPONENT_REPEAT_WEIGHT)
+    return best
+
+
+def test_branch_and_bound_finds_the_exhaustive_optimum():
+    players = _players(14)
+    history = _history(players, 30)
+
+    result = best_match(players, now=NOW, history=history, top_n=14)
+
+    assert result["cost"] == pytest.approx(_brute_force_cost(players, history), abs=1e-3)
+
+
+def test_four_candidates_give_the_greedy_match():
+    players = _players(20)
+    history = _history(players, 20)
+
+    result = best_match(players, now=NOW, history=history, top_n=4)
+    greedy = create_balanced_teams(select_fair_players(players, now=NOW), history=history)
+
+    assert {result["team_a"], result["team_b"]} == {greedy["team_a"], greedy["team_b"]}
+
+
+def test_top_k_returns_distinct_matches_best_first():
+    results = optimize_match(_players(16), now=NOW, top_k=5)
+
+    assert len(results) == 5
+    assert [r["cost"] for r in results] == sorted(r["cost"] for r in results)
+    assert len({(r["team_a"], r["team_b"]) for r in results}) == 5
+
+
+def test_locked_partners_play_on_the_same_team():
+    players = _players(16)
+    ids = [p.user_id for p in players]
+    locked = (ids[0], ids[15])
+
+    for result in optimize_match(players, MatchConstraints(locked_partners=[locked]), now=NOW, top_k=10):
+        team_a, team_b = set(result["team_a"]), set(result["team_b"])
+        for team in (team_a, team_b):
+            assert not (team & set(locked)) or set(locked) <= team
+
+
+def test_avoid_pairs_and_skill_band_are_respected():
+    players = _players(16)
+    ratings = {p.user_id: p.rating for p in players}
+    unconstrained = best_match(players, now=NOW)
+    avoid = (unconstrained["team_a"][0], unconstrained["team_b"][0])
+
+    constraints = MatchConstraints(avoid_pairs=[avoid], rating_min=850, max_rating_spread=250)
+    for result in optimize_match(players, constraints, now=NOW, top_k=10):
+        chosen = result["team_a"] + result["team_b"]
+        assert not set(avoid) <= set(chosen)
+        assert min(ratings[uid] for uid in chosen) >= 850
+        assert max(ratings[uid] for uid in chosen) - min(ratings[uid] for uid in chosen) <= 250
+
+
+def test_singles_pick_two_players():
+    result = best_match(_players(10), MatchConstraints(match_type="single"), now=NOW)
+
+    assert len(result["team_a"]) == 1
+    assert len(result["team_b"]) == 1
+
+
+def test_impossible_constraints_raise():
+    players = _players(8)
+    with pytest.raises(MatchmakingError):
+        best_match(players, MatchConstraints(max_rating_spread=0.001), now=NOW)
+    with pytest.raises(MatchmakingError):
+        best_match(players, MatchConstraints(rating_min=5000), now=NOW)
+
+
+def test_greedy_fallback_is_the_plain_matchmaking_unless_constrained():
+    players = _players(30)
+    history = _history(players, 40)
+
+    assert greedy_match(players, MatchConstraints(), now=NOW, history=history) == generate_fair_doubles_match(
+        players, now=NOW, history=history
+    )
+    singles = greedy_match(players, MatchConstraints(match_type="single"), now=NOW, history=history)
+    assert len(singles["team_a"]) == len(singles["team_b"]) == 1
@@ -0,0 +1,101 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.matchmaking import (
+    CandidatePlayer,
+    MatchmakingError,
+    PairHistory,
+    create_balanced_teams,
+    generate_fair_doubles_round,
+    select_fair_players,
+)
+
+
+NOW = datetime(2026, 2, 20, 20, 0, 0)
+
+
+def _players(count: int):
+    return [
+        CandidatePlayer(
+            user_id=f"p{i:03d}",
+            rating=900.0 + (i * 37) % 300,
+            matches_played=i % 3,
+            last_played_at=NOW - timedelta(minutes=(i * 7) % 45),
+        )
+        for i in range(count)
+    ]
+
+
+def test_round_uses_disjoint_players_on_every_court():
+    result = generate_fair_doubles_round(_players(30), court_count=6, now=NOW)
+
+    assert len(result) == 6
+    used = [uid for m in result for uid in (*m["team_a"], *m["team_b"])]
+    assert len(used) == 24
+    assert len(set(used)) == 24
+
+
+def test_round_is_capped_by_pool_size():
+    result = generate_fair_doubles_round(_players(9), court_count=4, now=NOW)
+    assert len(result) == 2
+
+
+def test_round_avoids_repeated_partners_when_possible():
+    players = [CandidatePlayer(user_id=f"p{i}", rating=1000.0) for i in range(8)]
+    history = {("p0", "p1"): 3, ("p2", "p3"): 3}
+
+    result = generate_fair_doubles_round(players, court_count=2, partner_history=history, now=NOW)
+
+    teams = {tuple(sorted(t)) for m in result for t in (m["team_a"], m["team_b"])}
+    assert ("p0", "p1") not in teams
+    assert ("p2", "p3") not in teams
+
+
+def test_round_requires_four_players():
+    with pytest.raises(MatchmakingError):
+        generate_fair_doubles_round(_players(3), court_count=2, now=NOW)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_vectorized_selection_matches_python_path(seed):
+    rng = random.Random(seed)
+    pool = [
+        CandidatePlayer(
+            user_id=f"p{i:03d}",
+            rating=float(rng.choice([900, 1000, 1100, 1234.5])),
+            matches_played=rng.randint(0, 4),
+            last_played_at=None if rng.random() < 0.2 else NOW - timedelta(minutes=rng.choice([0, 5, 12, 30])),
+        )
+        for i in range(rng.randint(8, 300))
+    ]
+
+    for target in (4, 8, len(pool)):
+        expected = select_fair_players(pool, target_count=target, now=NOW, vectorized=False)
+        actual = select_fair_players(pool, target_count=target, now=NOW, vectorized=True)
+        assert [p.user_id for p in actual] == [p.user_id for p in expected]
+
+
+def test_pair_history_counts_partners_and_opponents_symmetrically():
+    history = PairHistory(["a", "b", "c", "d"])
+    history.add_match(("a", "b"), ("c", "d"))
+    history.add_match(("a", "c"), ("b", "d"))
+
+    assert history.partner_count("b", "a") == 1
+    assert history.opponent_count("a", "d") == 2
+    assert history.opponent_count("d", "a") == 2
+    assert history.partner_count("a", "zz") == 0
+
+
+def test_balanced_teams_avoid_repeated_opponents():
+    players = [CandidatePlayer(user_id=uid, rating=1000.0) for uid in "abcd"]
+    history = PairHistory("abcd")
+    # a+b vs c+d and a+c vs b+d already played; only a+d vs b+c is fresh
+    history.add_match(("a", "b"), ("c", "d"))
+    history.add_match(("a", "c"), ("b", "d"))
+    history.partners[:] = 0
+
+    result = create_balanced_teams(players, history=history)
+
+    assert {result["team_a"], result["team_b"]} == {("a", "d"), ("b", "c")}
@@ -0,0 +1,29 @@
+import pytest
+
+from app.services.matchmaking_sim import SimulationConfig, main, simulate_session
+
+
+@pytest.mark.parametrize("strategy", ["court", "round"])
+def test_simulation_reports_fairness_and_latency(strategy):
+    report = simulate_session(SimulationConfig(players=24, courts=3, rounds=20, strategy=strategy))
+
+    assert report.matches == 60
+    assert report.latency_ms["p95"] >= 0.0
+    # every player present from the start keeps within one game of the others
+    assert report.games_played["max"] - report.games_played["min"] <= 1
+    assert 0.0 <= report.partner_repeat_rate <= 1.0
+    assert report.rest_minutes["p50"] > 0.0
+
+
+def test_simulation_is_deterministic_for_a_seed():
+    cfg = SimulationConfig(players=40, courts=4, rounds=10, seed=7, arrival="waves")
+    first = simulate_session(cfg)
+    second = simulate_session(cfg)
+
+    assert first.games_played == second.games_played
+    assert first.partner_repeat_rate == second.partner_repeat_rate
+
+
+def test_cli_fails_when_a_threshold_is_exceeded(capsys):
+    assert main(["--players", "16", "--courts", "2", "--rounds", "10", "--max-partner-repeat", "0"]) == 1
+    assert "FAIL" in capsys.readouterr().err
@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import SQLModel
+
+from app.core.migrations import ADDED_COLUMNS, upgrade_schema
+from app.models.models import Club, ClubMember, Match, Session, User
+
+CREATED = datetime(2026, 3, 1, 19, 0, 0)
+DONE = datetime(2026, 3, 1, 20, 0, 0)
+
+BASELINE_COURTS = """
+CREATE TABLE courts (
+    id INTEGER PRIMARY KEY,
+    session_id VARCHAR NOT NULL,
+    court_number INTEGER NOT NULL,
+    status VARCHAR NOT NULL DEFAULT 'available',
+    auto_matching_enabled BOOLEAN NOT NULL DEFAULT 1,
+    current_match_id VARCHAR,
+    created_at DATETIME,
+    closed_at DATETIME
+)
+"""
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _to_baseline(engine):
+    """Drop what the upgrade adds, as on a database made before it."""
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX {index.name}"))
+        for table, columns in ADDED_COLUMNS.items():
+            for name in columns:
+                conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {name}"))
+
+
+def test_upgrade_adds_missing_columns_once(engine):
+    with OrmSession(engine) as db:
+        db.add(User(id="u", line_user_id="u", display_name="U"))
+        db.add(User(id="v", line_user_id="v", display_name="V"))
+        db.add(Club(id="c", name="C", slug="c", owner_id="u"))
+        db.flush()
+        db.add(Session(id="s", club_id="c", title="t", start_time=CREATED, created_by="u"))
+        db.flush()
+        db.add(
+            Match(
+                id="m", session_id="s", team_a_player_1_id="u", team_b_player_1_id="v", created_at=CREATED, completed_at=DONE
+            )
+        )
+        db.commit()
+    _to_baseline(engine)
+
+    with engine.begin() as conn:
+        added = upgrade_schema(conn)
+    columns = [f"{t}.{c}" for t, names in ADDED_COLUMNS.items() for c in names]
+    indexes = [ix.name for table in SQLModel.metadata.sorted_tables for ix in table.indexes]
+    assert sorted(added) == sorted(columns + indexes)
+    with engine.begin() as conn:
+        assert upgrade_schema(conn) == []
+
+    with OrmSession(engine) as db:
+        user = db.get(User, "u")
+        assert (user.rating_deviation, user.rating_volatility) == (350.0, 0.06)
+        assert db.execute(select(Match.updated_at)).scalar_one() == DONE
+        db.add(ClubMember(club_id="c", user_id="u"))
+        db.commit()
+        assert db.execute(select(Club.rating_engine)).scalar_one() == "elo"
+
+
+def test_upgrade_leaves_current_schema_alone(engine):
+    with engine.begin() as conn:
+        assert upgrade_schema(conn) == []
+        assert "rating_engine" in {c["name"] for c in inspect(conn).get_columns("clubs")}
+
+
+def test_unique_constraint_waits_for_duplicates_to_go(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE courts"))
+        conn.execute(text(BASELINE_COURTS))
+        conn.execute(text("INSERT INTO courts (session_id, court_number) VALUES ('s', 1), ('s', 1)"))
+
+    with engine.begin() as conn:
+        assert upgrade_schema(conn) == ["ix_courts_session_status_number"]
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM courts WHERE id = 2"))
+    with engine.begin() as conn:
+        assert upgrade_schema(conn) == ["uq_session_court"]
+
+    with pytest.raises(IntegrityError), engine.begin() as conn:
+        conn.execute(text("INSERT INTO courts (session_id, court_number) VALUES ('s', 1)"))
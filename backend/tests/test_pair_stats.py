@@ -0,0 +1,31 @@
+from app.services.pair_stats import OPPONENT, PARTNER, count_pairs, pair_rows
+
+
+def test_doubles_count_partners_and_opponents_both_ways():
+    counts = {}
+    count_pairs(counts, "c", ["a1", "a2", "b1", "b2"], "A")
+
+    assert counts[("c", "a1", "a2", PARTNER)] == [1, 1]
+    assert counts[("c", "a2", "a1", PARTNER)] == [1, 1]
+    assert counts[("c", "b1", "b2", PARTNER)] == [1, 0]
+    assert counts[("c", "a1", "b2", OPPONENT)] == [1, 1]
+    assert counts[("c", "b2", "a1", OPPONENT)] == [1, 0]
+    assert len(counts) == 4 + 8
+
+
+def test_singles_and_repeat_matches_accumulate():
+    counts = {}
+    count_pairs(counts, "c", ["x", None, "y", None], "B")
+    count_pairs(counts, "c", ["y", None, "x", None], "A")
+
+    assert counts == {("c", "x", "y", OPPONENT): [2, 0], ("c", "y", "x", OPPONENT): [2, 2]}
+
+
+def test_rows_come_in_key_order():
+    counts = {}
+    count_pairs(counts, "c", ["b", None, "a", None], "A")
+
+    assert [(r["user_id"], r["other_id"], r["matches"], r["wins"]) for r in pair_rows(counts)] == [
+        ("a", "b", 1, 0),
+        ("b", "a", 1, 1),
+    ]
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from app.services.rating import (
+    RATING_FLOOR,
+    EloEngine,
+    Glicko2Engine,
+    RatingError,
+    RatingTable,
+    apply_matches,
+    get_rating_engine,
+    split_into_waves,
+)
+
+
+def _table(ratings, deviation=350.0, volatility=0.06):
+    return RatingTable.from_rows([(r, deviation, volatility) for r in ratings])
+
+
+def test_elo_moves_both_teams_by_the_same_amount():
+    table = _table([1000, 1000, 1000, 1000])
+    before, after = apply_matches(EloEngine(), table, np.array([[0, 1, 2, 3]]), np.array([True]))
+
+    delta = after - before
+    assert delta[0, 0] == pytest.approx(16.0)
+    assert delta[0, 1] == pytest.approx(16.0)
+    assert delta[0, 2] == pytest.approx(-16.0)
+    assert delta.sum() == pytest.approx(0.0)
+
+
+def test_elo_respects_the_rating_floor():
+    table = _table([RATING_FLOOR + 1, RATING_FLOOR + 1])
+    apply_matches(EloEngine(), table, np.array([[0, -1, 1, -1]]), np.array([False]))
+
+    assert table.rating[0] == RATING_FLOOR
+
+
+def test_glicko2_winner_gains_and_deviation_shrinks():
+    table = _table([1500, 1500, 1500, 1500])
+    apply_matches(Glicko2Engine(), table, np.array([[0, 1, 2, 3]]), np.array([False]))
+
+    assert table.rating[2] > 1500 > table.rating[0]
+    assert (table.deviation < 350.0).all()
+
+
+def test_waves_keep_each_players_match_order():
+    slots = np.array(
+        [
+            [0, 1, 2, 3],
+            [4, 5, 6, 7],
+            [0, 4, 2, 6],
+            [1, 5, 3, 7],
+            [8, 9, 10, 11],
+        ]
+    )
+    waves = split_into_waves(slots)
+
+    assert [w.tolist() for w in waves] == [[0, 1, 4], [2, 3]]
+
+
+def test_batched_matches_equal_one_by_one():
+    rng = np.random.default_rng(3)
+    slots = np.array([rng.permutation(12)[:4] for _ in range(40)])
+    a_won = rng.random(40) < 0.5
+
+    batched = _table(np.linspace(800, 1400, 12))
+    apply_matches(Glicko2Engine(), batched, slots, a_won)
+
+    serial = _table(np.linspace(800, 1400, 12))
+    for row, won in zip(slots, a_won):
+        apply_matches(Glicko2Engine(), serial, row[None, :], np.array([won]))
+
+    assert np.allclose(batched.rating, serial.rating)
+    assert np.allclose(batched.deviation, serial.deviation)
+
+
+def test_match_without_an_opponent_in_the_table_is_skipped():
+    table = _table([1000, 1000])
+    before, after = apply_matches(EloEngine(), table, np.array([[0, 1, -1, -1]]), np.array([True]))
+
+    assert np.isnan(after).all()
+    assert table.rating.tolist() == [1000, 1000]
+
+
+def test_unknown_engine_is_rejected():
+    assert get_rating_engine("glicko2").name == "glicko2"
+    with pytest.raises(RatingError):
+        get_rating_engine("trueskill")
@@ -0,0 +1,41 @@
+import math
+from datetime import date, datetime, timedelta
+
+from app.services.rating_history import downsample, rating_change_rows
+
+START = datetime(2026, 3, 2, 19, 0, 0)  # a Monday
+
+
+def test_daily_buckets_keep_the_last_rating_and_count_matches():
+    samples = [(START, 1010.0), (START + timedelta(hours=1), 1020.0), (START + timedelta(days=2), 1005.0)]
+
+    assert downsample(samples) == [(date(2026, 3, 2), 1020.0, 2), (date(2026, 3, 4), 1005.0, 1)]
+
+
+def test_weekly_buckets_start_on_monday():
+    samples = [(START + timedelta(days=d), 1000.0 + d) for d in (0, 6, 7, 13)]
+
+    assert downsample(samples, bucket="week") == [(date(2026, 3, 2), 1006.0, 2), (date(2026, 3, 9), 1013.0, 2)]
+
+
+def test_long_histories_are_thinned_to_max_points_ending_on_the_latest():
+    samples = [(START + timedelta(days=d), float(d)) for d in range(1000)]
+
+    points = downsample(samples, max_points=30)
+
+    assert len(points) <= 30
+    assert points[-1] == (date(2026, 3, 2) + timedelta(days=999), 999.0, points[-1][2])
+    assert sum(matches for _, _, matches in points) == 1000
+    assert [p[0] for p in points] == sorted(p[0] for p in points)
+
+
+def test_rows_skip_empty_and_unrated_slots():
+    rows = rating_change_rows(
+        "m", "c", START, ["a", None, "b", "guest"], [1016.0, math.nan, 984.0, 990.0], [1016.0, math.nan, 984.0, math.nan]
+    )
+
+    assert [(r["user_id"], r["rating"], r["club_rating"]) for r in rows] == [
+        ("a", 1016.0, 1016.0),
+        ("b", 984.0, 984.0),
+        ("guest", 990.0, None),
+    ]
@@ -0,0 +1,339 @@
+import random
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import Float, Integer, String, create_engine, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import SQLModel
+
+from app.core.bulk import bulk_update, insert_increment
+from app.models.models import Club, ClubMember, Match, PairStats, PlayerMonthlyStats, RatingChange, Session, User
+from app.services.match_results import apply_match_results, complete_matches, record_monthly_stats
+from app.services.pair_stats import record_pair_stats
+from app.services.rating import RatingTable, apply_matches, get_rating_engine
+from app.services.rating_replay import run_replay
+
+
+START = datetime(2026, 3, 1, 19, 0, 0)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _seed(engine, match_count=60):
+    rng = random.Random(7)
+    users = [f"u{i:02d}" for i in range(10)]
+    played = []
+    with OrmSession(engine) as db:
+        for uid in users:
+            db.add(User(id=uid, line_user_id=uid, display_name=uid, rating=1234.0, wins=99))
+        db.add(Club(id="elo-club", name="E", slug="e", owner_id="u00", rating_engine="elo"))
+        db.add(Club(id="g-club", name="G", slug="g", owner_id="u00", rating_engine="glicko2"))
+        db.flush()
+        # u09 is a guest of the Elo club.
+        for uid in users[:9]:
+            db.add(ClubMember(club_id="elo-club", user_id=uid))
+        for uid in users:
+            db.add(ClubMember(club_id="g-club", user_id=uid, rating_in_club=1500.0))
+        for club_id in ("elo-club", "g-club"):
+            db.add(Session(id=f"s-{club_id}", club_id=club_id, title="t", start_time=START, created_by="u00"))
+        db.flush()
+        for i in range(match_count):
+            club_id = "elo-club" if i % 3 else "g-club"
+            a1, a2, b1, b2 = rng.sample(users, 4)
+            winner = rng.choice("AB")
+            db.add(
+                Match(
+                    session_id=f"s-{club_id}",
+                    team_a_player_1_id=a1,
+                    team_a_player_2_id=a2,
+                    team_b_player_1_id=b1,
+                    team_b_player_2_id=b2,
+                    winner_team=winner,
+                    status="completed",
+                    completed_at=START + timedelta(minutes=i),
+                )
+            )
+            played.append((club_id, [a1, a2, b1, b2], winner == "A"))
+        db.add(
+            Match(
+                session_id="s-elo-club",
+                team_a_player_1_id="u00",
+                team_b_player_1_id="u01",
+                status="scheduled",
+            )
+        )
+        db.commit()
+    return users, played
+
+
+def test_replay_matches_applying_each_result_in_order(engine):
+    users, played = _seed(engine)
+    report = run_replay(engine, chunk_size=7)
+
+    assert report.matches == len(played)
+    assert report.users == len(users)
+
+    index = {uid: i for i, uid in enumerate(users)}
+    expected = RatingTable.from_rows([(1000.0, 350.0, 0.06)] * len(users))
+    wins = dict.fromkeys(users, 0)
+    for club_id, slots, a_won in played:
+        engine_name = "elo" if club_id == "elo-club" else "glicko2"
+        apply_matches(
+            get_rating_engine(engine_name),
+            expected,
+            np.array([[index[uid] for uid in slots]]),
+            np.array([a_won]),
+        )
+        for uid in (slots[:2] if a_won else slots[2:]):
+            wins[uid] += 1
+
+    with OrmSession(engine) as db:
+        stored = {u.id: u for u in db.execute(select(User)).scalars()}
+    for uid in users:
+        assert stored[uid].rating == pytest.approx(expected.rating[index[uid]])
+        assert stored[uid].wins == wins[uid]
+        assert stored[uid].wins + stored[uid].losses == stored[uid].total_matches
+
+
+def test_replay_skips_guests_in_club_ratings(engine):
+    _, played = _seed(engine)
+    run_replay(engine)
+
+    elo_matches = [slots for club_id, slots, _ in played if club_id == "elo-club"]
+    with OrmSession(engine) as db:
+        members = {
+            (cm.club_id, cm.user_id): cm for cm in db.execute(select(ClubMember)).scalars()
+        }
+    for uid in ("u00", "u05"):
+        assert members[("elo-club", uid)].matches_in_club == sum(uid in slots for slots in elo_matches)
+    assert ("elo-club", "u09") not in members
+
+
+def test_replay_rebuilds_monthly_rollups(engine):
+    _, played = _seed(engine)
+    with OrmSession(engine) as db:
+        db.add(PlayerMonthlyStats(club_id="g-club", user_id="u00", month=date(2020, 1, 1), matches=7))
+        db.commit()
+
+    report = run_replay(engine)
+
+    with OrmSession(engine) as db:
+        stored = {
+            (r.club_id, r.user_id, r.month): (r.matches, r.wins)
+            for r in db.execute(select(PlayerMonthlyStats)).scalars()
+        }
+    assert report.monthly_rows == len(stored)
+    assert all(month == date(2026, 3, 1) for _, _, month in stored)
+    for club_id, uid in (("elo-club", "u09"), ("g-club", "u03")):
+        games = [(slots, a_won) for c, slots, a_won in played if c == club_id and uid in slots]
+        wins = sum((slots.index(uid) < 2) == a_won for slots, a_won in games)
+        assert stored[(club_id, uid, date(2026, 3, 1))] == (len(games), wins)
+
+
+def test_monthly_only_rebuild_leaves_ratings_alone(engine):
+    _seed(engine)
+    full = run_replay(engine, dry_run=True)
+    with OrmSession(engine) as db:
+        db.add(PlayerMonthlyStats(club_id="g-club", user_id="u00", month=date(2020, 1, 1), matches=7))
+        db.commit()
+
+    report = run_replay(engine, chunk_size=7, monthly_only=True)
+
+    with OrmSession(engine) as db:
+        months = {r.month for r in db.execute(select(PlayerMonthlyStats)).scalars()}
+        assert {u.rating for u in db.execute(select(User)).scalars()} == {1234.0}
+        assert db.execute(select(RatingChange)).first() is None
+    assert (report.matches, report.monthly_rows) == (full.matches, full.monthly_rows)
+    assert months == {date(2026, 3, 1)}
+
+
+def test_replay_rewrites_rating_history_ending_at_current_ratings(engine):
+    users, played = _seed(engine)
+    report = run_replay(engine, chunk_size=7)
+    run_replay(engine, chunk_size=11)
+
+    with OrmSession(engine) as db:
+        changes = db.execute(select(RatingChange).order_by(RatingChange.recorded_at)).scalars().all()
+        ratings = {u.id: u.rating for u in db.execute(select(User)).scalars()}
+    assert len(changes) == report.rating_changes == 4 * len(played)
+    latest = {c.user_id: c.rating for c in changes}
+    assert latest == pytest.approx(ratings)
+    assert all(c.club_rating is None for c in changes if c.club_id == "elo-club" and c.user_id == "u09")
+
+
+def test_replay_rebuilds_pair_stats(engine):
+    _, played = _seed(engine)
+    run_replay(engine)
+
+    with OrmSession(engine) as db:
+        stored = {
+            (p.club_id, p.user_id, p.other_id, p.relation): (p.matches, p.wins)
+            for p in db.execute(select(PairStats)).scalars()
+        }
+    together = [(a_won, slots) for c, slots, a_won in played if c == "g-club" and {"u01", "u02"} <= set(slots)]
+    partners = [(a_won, slots) for a_won, slots in together if (slots.index("u01") < 2) == (slots.index("u02") < 2)]
+    assert stored.get(("g-club", "u01", "u02", "partner"), (0, 0))[0] == len(partners)
+    assert stored.get(("g-club", "u02", "u01", "opponent"), (0, 0))[0] == len(together) - len(partners)
+
+
+def _snapshot(engine):
+    with OrmSession(engine) as db:
+        return {
+            "users": {
+                u.id: (round(u.rating, 6), u.wins, u.losses, u.total_matches)
+                for u in db.execute(select(User)).scalars()
+            },
+            "members": {
+                (m.club_id, m.user_id): (round(m.rating_in_club, 6), m.matches_in_club)
+                for m in db.execute(select(ClubMember)).scalars()
+            },
+            "monthly": {
+                (r.club_id, r.user_id, r.month): (r.matches, r.wins)
+                for r in db.execute(select(PlayerMonthlyStats)).scalars()
+            },
+            "pairs": {
+                (p.club_id, p.user_id, p.other_id, p.relation): (p.matches, p.wins)
+                for p in db.execute(select(PairStats)).scalars()
+            },
+            "history": sorted(
+                (c.match_id, c.user_id, round(c.rating, 6)) for c in db.execute(select(RatingChange)).scalars()
+            ),
+        }
+
+
+@pytest.mark.asyncio
+async def test_completing_matches_one_by_one_matches_a_replay(tmp_path):
+    path = tmp_path / "live.db"
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    users = [f"u{i}" for i in range(6)]
+    rng = random.Random(3)
+    with OrmSession(engine) as db:
+        for uid in users:
+            db.add(User(id=uid, line_user_id=uid, display_name=uid))
+        db.add(Club(id="c", name="C", slug="c", owner_id="u0"))
+        db.flush()
+        for uid in users:
+            db.add(ClubMember(club_id="c", user_id=uid))
+        db.add(Session(id="s", club_id="c", title="t", start_time=START, created_by="u0"))
+        db.flush()
+        for i in range(12):
+            a1, a2, b1, b2 = rng.sample(users, 4)
+            db.add(
+                Match(
+                    id=f"m{i:02d}",
+                    session_id="s",
+                    team_a_player_1_id=a1,
+                    team_a_player_2_id=a2,
+                    team_b_player_1_id=b1,
+                    team_b_player_2_id=b2,
+                    status="ongoing",
+                )
+            )
+        db.commit()
+
+    # The writes the API makes for each completed match, whether by /complete or a status change.
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    try:
+        for i in range(12):
+            async with AsyncSession(async_engine) as db:
+                completed = await complete_matches(db, {f"m{i:02d}": rng.choice("AB")}, START + timedelta(minutes=i))
+                await apply_match_results(db, "c", completed)
+                await record_monthly_stats(db, "c", completed)
+                await record_pair_stats(db, "c", completed)
+                await db.commit()
+    finally:
+        await async_engine.dispose()
+
+    live = _snapshot(engine)
+    run_replay(engine)
+    replayed = _snapshot(engine)
+    engine.dispose()
+
+    assert len(live["history"]) == 4 * 12
+    assert live == replayed
+
+
+def test_dry_run_leaves_ratings_untouched(engine):
+    _seed(engine)
+    report = run_replay(engine, dry_run=True)
+
+    assert report.matches > 0
+    with OrmSession(engine) as db:
+        assert {u.rating for u in db.execute(select(User)).scalars()} == {1234.0}
+
+
+def test_bulk_update_overwrites_and_increments_across_batches(engine):
+    with OrmSession(engine) as db:
+        for i in range(5):
+            db.add(User(id=f"b{i}", line_user_id=f"b{i}", display_name=f"b{i}", wins=10, total_matches=20))
+        db.commit()
+
+    rows = [{"id": f"b{i}", "rating": 900.0 + i, "wins": i, "total_matches": 1} for i in range(5)]
+    types = {"id": String, "rating": Float, "wins": Integer, "total_matches": Integer}
+    with engine.begin() as conn:
+        statements = list(
+            bulk_update("sqlite", User.__table__, "id", types, rows, increment=("wins", "total_matches"), batch_size=2)
+        )
+        assert len(statements) == 3
+        for stmt, params in statements:
+            conn.execute(stmt, params)
+
+    with OrmSession(engine) as db:
+        stored = {u.id: (u.rating, u.wins, u.total_matches) for u in db.execute(select(User)).scalars()}
+    assert stored == {f"b{i}": (900.0 + i, 10 + i, 21) for i in range(5)}
+
+
+def test_bulk_update_is_one_statement_per_batch_on_postgres():
+    rows = [{"id": f"b{i}", "rating": 900.0, "wins": 1} for i in range(3)]
+    types = {"id": String, "rating": Float, "wins": Integer}
+
+    [(stmt, params)] = bulk_update("postgresql", User.__table__, "id", types, rows, increment=("wins",))
+
+    assert params is None
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "FROM (VALUES" in sql
+    assert "wins=(users.wins + v.wins)" in sql
+
+
+def test_bulk_update_leaves_rows_outside_where_alone(engine):
+    with OrmSession(engine) as db:
+        db.add(User(id="w0", line_user_id="w0", display_name="w0", wins=1))
+        db.add(User(id="w1", line_user_id="w1", display_name="w1", wins=5))
+        db.commit()
+
+    table = User.__table__
+    rows = [{"id": "w0", "rating": 1.0}, {"id": "w1", "rating": 1.0}]
+    with engine.begin() as conn:
+        for stmt, params in bulk_update("sqlite", table, "id", {"id": String, "rating": Float}, rows, where=table.c.wins < 3):
+            conn.execute(stmt, params)
+
+    with OrmSession(engine) as db:
+        assert db.get(User, "w0").rating == 1.0
+        assert db.get(User, "w1").rating != 1.0
+
+
+def test_insert_increment_adds_to_existing_rows(engine):
+    with OrmSession(engine) as db:
+        db.add(User(id="m0", line_user_id="m0", display_name="m0"))
+        db.add(Club(id="c", name="C", slug="c", owner_id="m0"))
+        db.commit()
+
+    stmt = insert_increment("sqlite", PlayerMonthlyStats.__table__, ("club_id", "user_id", "month"), ("matches", "wins"))
+    row = {"club_id": "c", "user_id": "m0", "month": date(2026, 3, 1), "matches": 2, "wins": 1}
+    with engine.begin() as conn:
+        conn.execute(stmt, [row])
+        conn.execute(stmt, [row, {**row, "month": date(2026, 4, 1)}])
+
+    with OrmSession(engine) as db:
+        stored = {r.month: (r.matches, r.wins) for r in db.execute(select(PlayerMonthlyStats)).scalars()}
+    assert stored == {date(2026, 3, 1): (4, 2), date(2026, 4, 1): (2, 1)}
@@ -0,0 +1,61 @@
+import pytest
+
+from app.services.scoring import POINT, UNDO, ScoringError, fold_events, score_rallies
+
+
+def _set(a: int, b: int):
+    """Rallies of a set that ends ``a``-``b``, the winner taking the last point."""
+    winner, loser = ("A", "B") if a > b else ("B", "A")
+    high, low = max(a, b), min(a, b)
+    return [winner, loser] * low + [winner] * (high - low)
+
+
+def test_straight_sets_decide_the_match():
+    score = score_rallies(_set(21, 15) + _set(21, 3))
+
+    assert score.sets == [[21, 15], [21, 3]]
+    assert score.winner_team == "A"
+    assert score.score_string() == "21-15,21-3"
+
+
+def test_set_goes_on_past_21_until_two_clear_and_caps_at_30():
+    deuce = score_rallies(_set(20, 20))
+    assert deuce.sets == [[20, 20]]
+
+    assert score_rallies(_set(20, 20) + ["B", "B"]).sets == [[20, 22], [0, 0]]
+    assert score_rallies(_set(29, 29) + ["A"]).sets == [[30, 29], [0, 0]]
+
+
+def test_third_set_and_set_scores_payload():
+    score = score_rallies(_set(21, 19) + _set(18, 21) + _set(15, 21))
+
+    assert score.winner_team == "B"
+    assert score.set_scores() == {
+        "sets": [
+            {"team_a": 21, "team_b": 19},
+            {"team_a": 18, "team_b": 21},
+            {"team_a": 15, "team_b": 21},
+        ],
+        "winner_team": "B",
+    }
+
+
+def test_undo_takes_back_the_last_standing_rally():
+    events = [(POINT, "A"), (POINT, "B"), (UNDO, None), (UNDO, None), (POINT, "B"), (UNDO, None), (UNDO, None)]
+
+    assert fold_events(events).sets == [[0, 0]]
+    assert fold_events(events + [(POINT, "B")]).sets == [[0, 1]]
+
+
+def test_rallies_after_the_match_is_decided_are_ignored():
+    score = score_rallies(_set(21, 0) + _set(21, 0) + ["B"] * 5)
+
+    assert score.sets == [[21, 0], [21, 0]]
+    assert score.rallies == 42
+
+
+def test_unknown_events_raise():
+    with pytest.raises(ScoringError):
+        fold_events([("serve", "A")])
+    with pytest.raises(ScoringError):
+        score_rallies(["C"])
@@ -54,3 +54,31 @@ async def test_register_for_open_session(client, auth_headers, second_user_heade
     reg = await client.post(f"/api/v1/sessions/{session_id}/register", headers=second_user_headers)
     assert reg.status_code == 200
     assert reg.json()["status"] in ["confirmed", "waitlisted"]
+
+
+@pytest.mark.asyncio
+async def test_delete_session_with_courts(client, auth_headers):
+    club = await client.post(
+        "/api/v1/clubs",
+        json={"name": "Court Club", "slug": "court-club", "description": "desc", "is_public": True},
+        headers=auth_headers,
+    )
+    assert club.status_code == 201
+    club_id = club.json()["id"]
+    track_club(club_id)
+
+    session = await client.post(
+        f"/api/v1/clubs/{club_id}/sessions",
+        json={"title": "Court Session", "start_time": "2026-02-20T18:00:00", "max_participants": 8, "number_of_courts": 2},
+        headers=auth_headers,
+    )
+    assert session.status_code == 201
+    session_id = session.json()["id"]
+
+    courts = await client.get(f"/api/v1/sessions/{session_id}/courts", headers=auth_headers)
+    assert [c["court_number"] for c in courts.json()] == [1, 2]
+
+    deleted = await client.delete(f"/api/v1/sessions/{session_id}", headers=auth_headers)
+    assert deleted.status_code == 200
+    missing = await client.get(f"/api/v1/sessions/{session_id}", headers=auth_headers)
+    assert missing.status_code == 404
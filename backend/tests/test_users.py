@@ -0,0 +1,46 @@
+import pytest
+import pytest_asyncio
+from conftest import TEST_SECRET
+
+
+@pytest_asyncio.fixture
+async def profile_headers(client):
+    response = await client.post(
+        "/api/v1/auth/test-login",
+        json={"name": "Profile Tester"},
+        headers={"X-Test-Secret": TEST_SECRET}
+    )
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.mark.asyncio
+async def test_update_current_user(client, profile_headers):
+    updated = await client.patch(
+        "/api/v1/users/me",
+        json={"display_name": "Renamed Admin", "phone": "0800000000"},
+        headers=profile_headers,
+    )
+    assert updated.status_code == 200
+    assert updated.json()["display_name"] == "Renamed Admin"
+    assert "hashed_password" not in updated.json()
+
+    me = (await client.get("/api/v1/auth/me", headers=profile_headers)).json()
+    assert (me["display_name"], me["phone"]) == ("Renamed Admin", "0800000000")
+
+    # Fields left out keep their values.
+    updated = await client.patch("/api/v1/users/me", json={"full_name": "Full Name"}, headers=profile_headers)
+    assert updated.status_code == 200
+    assert (updated.json()["display_name"], updated.json()["full_name"]) == ("Renamed Admin", "Full Name")
+
+
+@pytest.mark.asyncio
+async def test_update_current_user_keeps_a_display_name(client, profile_headers):
+    response = await client.patch("/api/v1/users/me", json={"display_name": None}, headers=profile_headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_update_current_user_requires_auth(client):
+    response = await client.patch("/api/v1/users/me", json={"display_name": "Nobody"})
+    assert response.status_code == 401